@@ -0,0 +1,185 @@
+"""
+追加写入已有的结果文件
+把新的数据行流式追加到现有订单录入结果、工件导入结果文件数据表XML的末尾并更新<dimension>，
+已有的行只按块透传不解析，包中其余成员（page工作表、样式等）原样复制，
+耗时随新增行数增长，而不随文件中累积的行数增长
+"""
+
+import os
+import re
+import zipfile
+
+import sheet_xml
+from partition import EXCEL_MAX_ROWS
+from progress import chunk_bounds
+from writers import ORDER_LAYOUT, WORKPIECE_LAYOUT, load_template_package
+
+# 读写数据表XML时每块的字节数
+BLOCK_SIZE = 1024 * 1024
+# 透传已有行时在内存中保留的末尾字节数，须大于一行XML的长度，用于取出最后一行的样式
+WINDOW_SIZE = 256 * 1024
+_SHEET_DATA_END = b"</sheetData>"
+
+
+def _data_sheet_names(base_name):
+    """结果文件中数据表可能的名称：本工具的数据表名，以及模板填充方式所用导入模板的数据表名"""
+    names = [base_name]
+    try:
+        template_name = load_template_package(base_name).sheet_name
+    except ValueError:
+        # 找不到导入模板时只按本工具的数据表名查找
+        template_name = None
+    if template_name and template_name not in names:
+        names.append(template_name)
+    return names
+
+
+def target_sheet(zf, base_name):
+    """追加到哪个工作表：与base_name（或导入模板数据表）同名的表，按工作表拆分过时取最后一个拆分表"""
+    sheets = sheet_xml.sheet_paths(zf)
+    candidates = _data_sheet_names(base_name)
+    for candidate in candidates:
+        names = [name for name in sheets
+                 if name == candidate or re.fullmatch(rf"{re.escape(candidate)}_\d+", name)]
+        if names:
+            return names[-1]
+    raise ValueError(f"文件中没有 {' 或 '.join(candidates)} 工作表，不是本工具生成的结果文件")
+
+
+def _read_until(f, buffer, marker, start=0):
+    """从流中读入数据直到buffer的start之后出现marker，返回(buffer, marker位置)，读完仍未出现时位置为-1"""
+    index = buffer.find(marker, start)
+    while index < 0:
+        block = f.read(BLOCK_SIZE)
+        if not block:
+            break
+        buffer += block
+        index = buffer.find(marker, max(start, len(buffer) - len(block) - len(marker)))
+    return buffer, index
+
+
+def _scan_last_row(zf, path):
+    """没有<dimension>时先扫描一遍数据表，找出最后一行的行号"""
+    last, window = 0, b""
+    with zf.open(path) as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            window = (window + block)[-WINDOW_SIZE:]
+            row_num, _ = sheet_xml.last_row(window)
+            last = max(last, row_num)
+    return last
+
+
+class SheetAppender:
+    """把一个DataFrame追加到结果文件中某个数据表的末尾"""
+
+    def __init__(self, zf, sheet_name):
+        self.zf = zf
+        self.sheet_name = sheet_name
+        self.path = sheet_xml.sheet_paths(zf)[sheet_name]
+
+    def _header(self, f):
+        """读入sheetData开始标签和表头行，返回(开始标签之前的部分, 开始标签, 之后已读入的部分, 表头{列字母: 列名})"""
+        buffer, start = _read_until(f, b"", b"<sheetData")
+        if start < 0:
+            raise ValueError(f"{self.sheet_name} 工作表的XML不完整")
+        buffer, tag_end = _read_until(f, buffer, b">", start)
+        head, open_tag, rest = buffer[:start], buffer[start:tag_end + 1], buffer[tag_end + 1:]
+        if open_tag.endswith(b"/>"):
+            # 空数据表：补上结束标签，按没有表头处理
+            return head, b"<sheetData>", _SHEET_DATA_END + rest, {}
+        rest, _ = _read_until(f, rest, b"</row>")
+        _, header_row = sheet_xml.last_row(rest[:rest.find(b"</row>") + len(b"</row>")])
+        values = sheet_xml.row_values(header_row)
+        shared = [int(index) for index in re.findall(rb'<c\b[^>]*\bt="s"[^>]*><v>(\d+)</v>', header_row)]
+        if shared:
+            values = sheet_xml.row_values(header_row, sheet_xml.read_shared_strings(self.zf, max(shared) + 1))
+        return head, open_tag, rest, values
+
+    def column_letters(self, header, columns):
+        """按表头文字找出各列写入的列字母，缺少的列报错"""
+        letters = {name: letter for letter, name in header.items() if name}
+        missing = [column for column in columns if column not in letters]
+        if missing:
+            raise ValueError(f"{self.sheet_name} 工作表中没有以下列: {', '.join(map(str, missing))}")
+        return [letters[column] for column in columns]
+
+    def write(self, out, df, chunk_rows=None, on_chunk=None):
+        """把追加后的数据表XML写入目标流out，返回(原有最后一行, 新的最后一行)"""
+        with self.zf.open(self.path) as f:
+            head, open_tag, rest, header = self._header(f)
+            columns = self.column_letters(header, df.columns)
+            last_column, existing_last = sheet_xml.dimension_end(head)
+            if existing_last is None:
+                existing_last = _scan_last_row(self.zf, self.path)
+            new_last = existing_last + len(df)
+            if new_last > EXCEL_MAX_ROWS:
+                raise ValueError(f"追加后共 {new_last} 行，超过Excel单表上限 {EXCEL_MAX_ROWS} 行，请改为生成新文件")
+            last_column = max([last_column or "A"] + columns, key=lambda letter: (len(letter), letter))
+
+            out.write(sheet_xml.set_dimension(head, f"A1:{last_column}{new_last}"))
+            out.write(open_tag)
+            # 已有的行按块透传，只保留末尾一段用于找最后一行和</sheetData>
+            window = rest
+            while True:
+                end = window.find(_SHEET_DATA_END)
+                if end >= 0:
+                    break
+                block = f.read(BLOCK_SIZE)
+                if not block:
+                    raise ValueError(f"{self.sheet_name} 工作表的XML不完整")
+                window += block
+                if len(window) > 2 * WINDOW_SIZE:
+                    keep = len(window) - WINDOW_SIZE
+                    out.write(window[:keep])
+                    window = window[keep:]
+            body, tail = window[:end], window[end + len(_SHEET_DATA_END):]
+
+            row_num, row_xml = sheet_xml.last_row(body)
+            if row_num != existing_last:
+                raise ValueError(f"{self.sheet_name} 工作表的数据范围与实际行数不符（{existing_last}/{row_num}），"
+                                 f"请先用Excel打开并保存一次")
+            # 新行沿用原最后一个数据行的样式和行属性（只有表头时不带样式）
+            styles, row_attrs = ({}, "") if row_num <= 1 else (
+                sheet_xml.row_cell_styles(row_xml), sheet_xml.row_attributes(row_xml))
+            out.write(body)
+            for start, stop in chunk_bounds(len(df), chunk_rows):
+                rows = df.iloc[start:stop].itertuples(index=False, name=None)
+                out.write(sheet_xml.rows_xml(rows, existing_last + 1 + start, columns, styles, row_attrs))
+                if on_chunk:
+                    on_chunk(stop - start)
+            out.write(_SHEET_DATA_END + tail)
+            for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+                out.write(block)
+        return existing_last, new_last
+
+
+def append_frame(path, df, base_name, chunk_rows=None, on_chunk=None):
+    """
+    把df追加到结果文件path中base_name数据表的末尾，返回追加后的数据行数（不含表头）
+    先写同目录下的临时文件再替换原文件，中途出错时原文件不变
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(path) as source, zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as out:
+            appender = SheetAppender(source, target_sheet(source, base_name))
+            for info in source.infolist():
+                if info.filename == appender.path:
+                    with out.open(info.filename, "w", force_zip64=True) as f:
+                        _, new_last = appender.write(f, df, chunk_rows, on_chunk)
+                else:
+                    sheet_xml.copy_member(source, out, info)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return new_last - 1
+
+
+def append_order(path, df, chunk_rows=None, on_chunk=None):
+    """追加订单录入数据"""
+    return append_frame(path, df, ORDER_LAYOUT[0], chunk_rows, on_chunk)
+
+
+def append_workpiece(path, df, chunk_rows=None, on_chunk=None):
+    """追加工件导入数据"""
+    return append_frame(path, df, WORKPIECE_LAYOUT[0], chunk_rows, on_chunk)
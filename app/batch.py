@@ -0,0 +1,101 @@
+"""
+多文件批量转换
+多个订单总表在有上限的进程池中并发转换，每完成一个就立即写入结果压缩包，
+转换结果不在内存中堆积；每个工作进程只转换一个文件即退出，并受内存上限约束
+"""
+
+import multiprocessing
+import os
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from catalog import MISSES_PREFIX, misses_csv
+from isolation import limit_memory
+from partition import part_filename
+from pipeline import convert_source
+
+# 同时转换的文件数上限
+MAX_BATCH_WORKERS = int(os.environ.get("YMDD_BATCH_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def _timed_convert(data, hidden_bytes, row_filter, output_args):
+    """在工作进程中转换并计时（已按文件并行，单个文件内部不再开进程）"""
+    began = time.perf_counter()
+    result = convert_source(data, hidden_bytes, row_filter, workers=1, write_workers=1, **output_args)
+    result['seconds'] = time.perf_counter() - began
+    return result
+
+
+def _unique_stems(names):
+    """由上传文件名生成压缩包内不重复的目录名"""
+    stems = []
+    seen = {}
+    for name in names:
+        stem = os.path.splitext(os.path.basename(name))[0] or "订单总表"
+        if stem in seen:
+            seen[stem] += 1
+            stem = f"{stem}_{seen[stem]}"
+        else:
+            seen[stem] = 0
+        stems.append(stem)
+    return stems
+
+
+def convert_batch(sources, hidden_bytes, row_filter=None, timestamp="", on_update=None,
+                  max_workers=MAX_BATCH_WORKERS, **output_args):
+    """
+    并发转换多个订单总表，结果边完成边写入临时压缩包
+    sources为[(文件名, 内容字节)]，output_args为convert_source的输出参数（格式、拆分、分组等），
+    on_update(statuses)在每个文件状态变化时回调，
+    返回(压缩包临时文件路径, 各文件状态列表)，压缩包由调用方负责删除
+    """
+    stems = _unique_stems([name for name, _ in sources])
+    statuses = [
+        {'文件': name, '状态': '等待中', '订单数': None, '工件数': None, '耗时(秒)': None, '错误': ''}
+        for name, _ in sources
+    ]
+    if on_update:
+        on_update(statuses)
+
+    fd, zip_path = tempfile.mkstemp(suffix=".zip", prefix="ymdd_batch_")
+    os.close(fd)
+    mp_context = multiprocessing.get_context("spawn")
+    workers = max(1, min(max_workers, len(sources)))
+    # xlsx、parquet本身已是压缩格式，直接存储即可；csv需要压缩
+    compression = zipfile.ZIP_DEFLATED if output_args.get('output_format') == "csv" else zipfile.ZIP_STORED
+    with zipfile.ZipFile(zip_path, "w", compression=compression) as zf, \
+            ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=limit_memory,
+                                max_tasks_per_child=1) as pool:
+        futures = {
+            pool.submit(_timed_convert, data, hidden_bytes, row_filter, output_args): idx
+            for idx, (_, data) in enumerate(sources)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            status = statuses[idx]
+            try:
+                result = future.result()
+            except Exception as e:
+                status['状态'] = '失败'
+                status['错误'] = str(e)
+            else:
+                stem = stems[idx]
+                for prefix, key in (('订单录入结果', 'order'), ('工件导入结果', 'workpiece')):
+                    parts = result[key]['parts']
+                    for index, part in enumerate(parts):
+                        filename = part_filename(prefix, timestamp, index, len(parts), result['extension'],
+                                                 result['labels'][index])
+                        zf.writestr(f"{stem}/{filename}", part)
+                misses = misses_csv(result['catalog_misses'])
+                if misses:
+                    zf.writestr(f"{stem}/{MISSES_PREFIX}_{timestamp}.csv", misses)
+                status['状态'] = '完成'
+                status['订单数'] = result['order']['count']
+                status['工件数'] = result['workpiece']['count']
+                status['耗时(秒)'] = round(result['seconds'], 2)
+            if on_update:
+                on_update(statuses)
+
+    return zip_path, statuses
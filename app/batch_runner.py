@@ -0,0 +1,182 @@
+"""
+可断点续转的批量转换（命令行）
+把大量归档的订单总表转换到一个结果目录，每个文件转换完成后立即更新检查点清单，
+中断后用resume命令继续：已完成且内容未变的文件直接跳过，失败、未完成或内容有变化的重新转换
+用法:
+    python app/batch_runner.py run 结果目录 源文件或目录... [--format xlsx]
+    python app/batch_runner.py resume 结果目录
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from batch import MAX_BATCH_WORKERS
+from isolation import init_pool_worker
+from manifest import BatchManifest, file_sha256, STATUS_DONE, STATUS_FAILED
+from watcher import SOURCE_EXTENSIONS, convert_to_outbox, is_source_file
+
+
+def collect_sources(paths):
+    """展开命令行给出的文件和目录（目录只取第一层的订单总表），按路径排序去重"""
+    sources = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if is_source_file(name):
+                    sources.add(os.path.abspath(os.path.join(path, name)))
+        elif path.lower().endswith(SOURCE_EXTENSIONS):
+            sources.add(os.path.abspath(path))
+    return sorted(sources)
+
+
+def _hidden_bytes(options):
+    """需要隐藏表格时获取一次，所有文件共用"""
+    from writers import needs_hidden_template
+    if not needs_hidden_template(options.get('output_format', 'xlsx'), options.get('writer_name')):
+        return None
+    from template_client import get_template_client
+    return get_template_client().fetch()[0]
+
+
+def run_manifest(manifest, workers=MAX_BATCH_WORKERS):
+    """
+    按清单转换所有未完成的文件，每完成一个就写回清单
+    Ctrl-C时不再开始新文件，等转换中的文件完成并记录后返回；返回是否全部成功
+    """
+    out_dir = os.path.dirname(manifest.path)
+    todo = []
+    for source in manifest.entries:
+        if not os.path.exists(source):
+            manifest.record(source, status=STATUS_FAILED, error="源文件不存在")
+            print(f"❌ 源文件不存在: {source}")
+            continue
+        sha256 = file_sha256(source)
+        if manifest.is_complete(source, sha256):
+            continue
+        todo.append((source, sha256))
+
+    skipped = len(manifest.entries) - len(todo)
+    if skipped:
+        print(f"⏭️ 跳过已完成的 {skipped} 个文件")
+    if not todo:
+        return manifest.summary()[STATUS_FAILED] == 0
+
+    print(f"🚀 开始转换 {len(todo)} 个文件（{max(1, min(workers, len(todo)))} 个进程）...", flush=True)
+    hidden_bytes = _hidden_bytes(manifest.options)
+    mp_context = multiprocessing.get_context("spawn")
+    interrupted = False
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(todo))), mp_context=mp_context,
+                             initializer=init_pool_worker, max_tasks_per_child=1) as pool:
+        futures = {}
+        for source, sha256 in todo:
+            future = pool.submit(convert_to_outbox, source, out_dir, hidden_bytes, manifest.options)
+            futures[future] = (source, sha256, time.perf_counter())
+        remaining = set(futures)
+        done_count = 0
+        while remaining:
+            try:
+                finished, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+            except KeyboardInterrupt:
+                # 已开始的文件照常完成并记录，未开始的取消，下次resume时继续
+                interrupted = True
+                print("\n⚠️ 已中断：等待转换中的文件完成后退出，之后可用resume继续", flush=True)
+                for future in remaining:
+                    future.cancel()
+                remaining = {f for f in remaining if not f.cancelled()}
+                continue
+            for future in finished:
+                source, sha256, began = futures[future]
+                name = os.path.basename(source)
+                done_count += 1
+                try:
+                    result_dir, order_count, workpiece_count = future.result()
+                except Exception as e:
+                    manifest.record(source, status=STATUS_FAILED, sha256=sha256, outputs=[], error=str(e))
+                    print(f"❌ [{done_count}/{len(todo)}] {name}: {e}", flush=True)
+                    continue
+                outputs = [
+                    os.path.relpath(os.path.join(result_dir, output), out_dir)
+                    for output in sorted(os.listdir(result_dir))
+                ]
+                manifest.record(
+                    source, status=STATUS_DONE, sha256=sha256, outputs=outputs, error="",
+                    orders=order_count, workpieces=workpiece_count,
+                    seconds=round(time.perf_counter() - began, 2),
+                )
+                print(f"✅ [{done_count}/{len(todo)}] {name}: 订单 {order_count} 条，工件 {workpiece_count} 条",
+                      flush=True)
+    return not interrupted and manifest.summary()[STATUS_FAILED] == 0
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="可断点续转的批量转换")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="新建清单并开始批量转换")
+    run.add_argument("out_dir", help="结果目录，清单和各文件的结果都保存在这里")
+    run.add_argument("sources", nargs="+", help="订单总表文件或所在目录")
+    run.add_argument("--format", dest="output_format", choices=("xlsx", "csv", "parquet"), default="xlsx",
+                     help="结果文件格式")
+    run.add_argument("--writer", dest="writer_name", choices=("auto", "openpyxl", "xlsxwriter", "template"),
+                     help="xlsx的写入方式，默认取YMDD_WRITER")
+    run.add_argument("--cell-types", dest="cell_type", choices=("text", "typed"),
+                     help="日期写为文本（text，默认）或Excel日期（typed）")
+    run.add_argument("--max-rows", type=int, help="每份最多工件行数，超过时按生产单号拆分")
+    run.add_argument("--partition-by", dest="partition_key", choices=("type", "week", "month", "prefix"),
+                     help="按模具类型、交期周、交期月或生产单号前缀分组，每组一套文件")
+    run.add_argument("--prefix-length", type=int, help="按生产单号前缀分组时取前几位")
+    run.add_argument("--consolidate", action="store_true", default=None,
+                     help="合并生产任务号、件号、工件编码都相同的工件行，数量相加")
+    run.add_argument("--catalog", metavar="PATH", help="产品主数据（xlsx/csv/parquet），补全项目编号和工件编码")
+    run.add_argument("--split-mode", choices=("files", "sheets"), help="拆分为多个文件或多个工作表")
+    run.add_argument("--workers", type=int, default=MAX_BATCH_WORKERS, help="同时转换的文件数")
+
+    resume = commands.add_parser("resume", help="按结果目录中的清单继续未完成的转换")
+    resume.add_argument("out_dir", help="之前run使用的结果目录")
+    resume.add_argument("--workers", type=int, default=MAX_BATCH_WORKERS, help="同时转换的文件数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "run":
+        sources = collect_sources(args.sources)
+        if not sources:
+            print("❌ 没有找到订单总表文件")
+            return 1
+        os.makedirs(args.out_dir, exist_ok=True)
+        options = {
+            'output_format': args.output_format,
+            'writer_name': args.writer_name,
+            'max_rows': args.max_rows,
+            'split_mode': args.split_mode,
+            'cell_type': args.cell_type,
+            'partition_key': args.partition_key,
+            'prefix_length': args.prefix_length,
+            'consolidate': args.consolidate,
+            'catalog': os.path.abspath(args.catalog) if args.catalog else None,
+        }
+        manifest = BatchManifest.create(args.out_dir, sources, options)
+        print(f"📋 已创建清单 {manifest.path}，共 {len(sources)} 个文件")
+    else:
+        try:
+            manifest = BatchManifest.load(args.out_dir)
+        except FileNotFoundError:
+            print(f"❌ {args.out_dir} 中没有转换清单，请先用run开始批量转换")
+            return 1
+        print(f"📋 继续清单 {manifest.path}，共 {len(manifest.entries)} 个文件")
+
+    success = run_manifest(manifest, args.workers)
+    counts = manifest.summary()
+    print(f"\n📊 完成 {counts[STATUS_DONE]} 个，失败 {counts[STATUS_FAILED]} 个，"
+          f"未完成 {len(manifest.entries) - counts[STATUS_DONE] - counts[STATUS_FAILED]} 个")
+    return 0 if success else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
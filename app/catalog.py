@@ -0,0 +1,190 @@
+"""
+产品主数据补全
+从产品主数据（xlsx、csv或parquet）中查出订单录入的项目编号和工件导入的工件编码，
+替换原来直接复制的制品名称。主数据每个进程只读取一次，建成哈希索引后缓存，
+补全时对整列做一次索引查找，耗时与转换的行数基本无关；查不到的键汇总后一次性报告
+"""
+
+import hashlib
+import os
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from converter import ACCESSORY_PART_NAME
+
+# 默认的产品主数据文件路径，空表示不补全
+CATALOG_PATH = os.environ.get("YMDD_CATALOG", "")
+CATALOG_EXTENSIONS = (".xlsx", ".csv", ".parquet")
+# 主数据的键列和编码列
+PRODUCT_COLUMN = '制品名称'
+PART_COLUMN = '部件名称'
+PROJECT_CODE_COLUMN = '项目编号'
+PART_CODE_COLUMN = '工件编码'
+CATALOG_COLUMNS = (PRODUCT_COLUMN, PART_COLUMN, PROJECT_CODE_COLUMN, PART_CODE_COLUMN)
+# 查不到的键导出文件的文件名前缀
+MISSES_PREFIX = "主数据未匹配"
+# 制品名称和部件名称拼成一个键时的分隔符
+_KEY_SEPARATOR = "\x1f"
+
+# {缓存键: CatalogIndex}，文件按(路径, 修改时间, 大小)缓存，上传内容按哈希缓存
+_catalog_cache = {}
+
+
+def _part_keys(products, parts):
+    """把制品名称、部件名称两列拼成一列键"""
+    return products.astype(str).str.strip() + _KEY_SEPARATOR + parts.astype(str).str.strip()
+
+
+class CatalogIndex:
+    """产品主数据的哈希索引：制品名称 → 项目编号，(制品名称, 部件名称) → 工件编码"""
+
+    def __init__(self, df_catalog):
+        missing = [column for column in CATALOG_COLUMNS if column not in df_catalog.columns]
+        if missing:
+            raise ValueError(f"产品主数据缺少以下列: {', '.join(missing)}")
+        df = df_catalog[list(CATALOG_COLUMNS)].astype("string").apply(lambda column: column.str.strip())
+        df = df[df[PRODUCT_COLUMN].fillna("") != ""]
+
+        # 同一个键出现多次时以第一行为准，编码为空的行不参与索引
+        projects = df[df[PROJECT_CODE_COLUMN].fillna("") != ""].drop_duplicates(PRODUCT_COLUMN)
+        self.project_index = pd.Index(projects[PRODUCT_COLUMN].to_numpy(dtype=object))
+        self.project_codes = projects[PROJECT_CODE_COLUMN].to_numpy(dtype=object)
+
+        parts = df[df[PART_CODE_COLUMN].fillna("") != ""]
+        keys = _part_keys(parts[PRODUCT_COLUMN], parts[PART_COLUMN].fillna(""))
+        first = ~keys.duplicated()
+        self.part_index = pd.Index(keys[first].to_numpy(dtype=object))
+        self.part_codes = parts[PART_CODE_COLUMN][first].to_numpy(dtype=object)
+        self.rows = len(df_catalog)
+
+    @staticmethod
+    def _lookup(index, codes, keys):
+        """整列查找，返回(编码数组, 是否查到)，查不到的位置编码为None"""
+        positions = index.get_indexer(keys)
+        found = positions >= 0
+        values = np.full(len(keys), None, dtype=object)
+        values[found] = codes[positions[found]]
+        return values, found
+
+    def project_codes_for(self, products):
+        return self._lookup(self.project_index, self.project_codes, products.astype(str).str.strip().to_numpy())
+
+    def part_codes_for(self, products, parts):
+        return self._lookup(self.part_index, self.part_codes, _part_keys(products, parts).to_numpy())
+
+
+def read_catalog(source, name=None):
+    """按扩展名读取产品主数据（source为文件路径或字节内容，字节内容需给出文件名），各列读为文本"""
+    name = name or str(source)
+    extension = os.path.splitext(name)[1].lower()
+    data = BytesIO(source) if isinstance(source, bytes) else source
+    if extension == ".xlsx":
+        return pd.read_excel(data, dtype=str)
+    if extension == ".csv":
+        return pd.read_csv(data, dtype=str, encoding="utf-8-sig")
+    if extension == ".parquet":
+        return pd.read_parquet(data).astype("string")
+    raise ValueError(f"不支持的产品主数据格式: {name}，可选: {', '.join(CATALOG_EXTENSIONS)}")
+
+
+def load_catalog(source, name=None):
+    """
+    读取产品主数据并建立索引，同一进程内只读取一次
+    source为文件路径（修改后重新读取），或上传的字节内容（按内容哈希缓存，需给出文件名）
+    """
+    if isinstance(source, bytes):
+        key = ("bytes", hashlib.sha256(source).hexdigest())
+    else:
+        stat = os.stat(source)
+        key = (os.path.abspath(source), stat.st_mtime_ns, stat.st_size)
+    catalog = _catalog_cache.get(key)
+    if catalog is None:
+        catalog = CatalogIndex(read_catalog(source, name))
+        _catalog_cache.clear()
+        _catalog_cache[key] = catalog
+    return catalog
+
+
+def resolve_catalog(catalog=None):
+    """把convert_source的catalog参数（None、路径或CatalogIndex）解析为CatalogIndex，不补全时返回None"""
+    if catalog is None:
+        catalog = CATALOG_PATH
+    if not catalog:
+        return None
+    if isinstance(catalog, CatalogIndex):
+        return catalog
+    return load_catalog(catalog)
+
+
+def _count_misses(frame, columns, count_name):
+    """查不到的键及其出现的行数，按行数从多到少排列"""
+    counts = frame.groupby(columns, sort=False).size().sort_values(ascending=False, kind="stable")
+    return [dict(zip(columns, key if isinstance(key, tuple) else (key,)), **{count_name: int(count)})
+            for key, count in counts.items()]
+
+
+def enrich_order(df_order, catalog):
+    """用产品主数据补全订单录入的项目编号，查不到的保持原值（制品名称）；返回(订单数据, [{制品名称, 订单数}])"""
+    df_order = df_order.copy()
+    codes, found = catalog.project_codes_for(df_order['项目名称'])
+    df_order['项目编号'] = df_order['项目编号'].where(~found, codes)
+    misses = _count_misses(pd.DataFrame({PRODUCT_COLUMN: df_order['项目名称'][~found]}), [PRODUCT_COLUMN], '订单数')
+    return df_order, misses
+
+
+def enrich_workpiece(df_workpiece, catalog):
+    """
+    用产品主数据补全工件导入的工件编码，查不到的保持原值（制品名称），配件行不参与补全；
+    返回(工件数据, [{制品名称, 部件名称, 工件行数}])
+    """
+    df_workpiece = df_workpiece.copy()
+    part_rows = df_workpiece['工件名称'] != ACCESSORY_PART_NAME
+    parts = df_workpiece[part_rows]
+    codes, found = catalog.part_codes_for(parts['工件编码'], parts['工件名称'])
+    df_workpiece.loc[part_rows, '工件编码'] = parts['工件编码'].where(~found, codes)
+    misses = _count_misses(
+        pd.DataFrame({PRODUCT_COLUMN: parts['工件编码'][~found], PART_COLUMN: parts['工件名称'][~found]}),
+        [PRODUCT_COLUMN, PART_COLUMN], '工件行数')
+    return df_workpiece, misses
+
+
+def enrich_frames(df_order, df_workpiece, catalog):
+    """
+    补全订单录入和工件导入数据，返回(订单数据, 工件数据, 查不到的键)
+    查不到的键为{'projects': [{制品名称, 订单数}], 'parts': [{制品名称, 部件名称, 工件行数}]}
+    """
+    df_order, project_misses = enrich_order(df_order, catalog)
+    df_workpiece, part_misses = enrich_workpiece(df_workpiece, catalog)
+    return df_order, df_workpiece, {'projects': project_misses, 'parts': part_misses}
+
+
+def describe_misses(misses, limit=5):
+    """查不到的键的中文摘要，全部查到时返回空字符串"""
+    texts = []
+    if misses.get('projects'):
+        examples = "、".join(item[PRODUCT_COLUMN] for item in misses['projects'][:limit])
+        texts.append(f"{len(misses['projects'])} 个制品名称查不到项目编号（如 {examples}）")
+    if misses.get('parts'):
+        examples = "、".join(f"{item[PRODUCT_COLUMN]}/{item[PART_COLUMN]}" for item in misses['parts'][:limit])
+        rows = sum(item['工件行数'] for item in misses['parts'])
+        texts.append(f"{len(misses['parts'])} 个制品/部件查不到工件编码，涉及 {rows} 行工件（如 {examples}）")
+    return "；".join(texts)
+
+
+def misses_frame(misses):
+    """查不到的键汇总为一张表（缺少的编码、制品名称、部件名称、行数），用于界面展示和导出"""
+    rows = [{'缺少': PROJECT_CODE_COLUMN, PRODUCT_COLUMN: item[PRODUCT_COLUMN], PART_COLUMN: '',
+             '行数': item['订单数']} for item in misses.get('projects', [])]
+    rows += [{'缺少': PART_CODE_COLUMN, PRODUCT_COLUMN: item[PRODUCT_COLUMN], PART_COLUMN: item[PART_COLUMN],
+              '行数': item['工件行数']} for item in misses.get('parts', [])]
+    return pd.DataFrame(rows, columns=['缺少', PRODUCT_COLUMN, PART_COLUMN, '行数'])
+
+
+def misses_csv(misses):
+    """查不到的键导出为csv（UTF-8-BOM）的内容，全部查到时返回None"""
+    df_misses = misses_frame(misses or {})
+    if df_misses.empty:
+        return None
+    return df_misses.to_csv(index=False).encode("utf-8-sig")
@@ -0,0 +1,362 @@
+"""
+订单转换核心逻辑
+与界面无关：网页版和exe都调用这里的函数生成订单录入、工件导入两个工作簿
+"""
+
+import os
+from copy import copy
+from io import BytesIO
+
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.styles import NamedStyle
+from openpyxl.utils import get_column_letter
+from openpyxl.utils.dataframe import dataframe_to_rows
+
+from progress import chunk_bounds
+from settings import CONSOLIDATE
+
+# 订单录入表列宽
+ORDER_COLUMN_WIDTHS = {
+    'A': 35, 'B': 35, 'C': 15, 'D': 35, 'E': 12,
+    'F': 15, 'G': 20, 'H': 12, 'I': 8
+}
+# 工件信息表列宽
+WORKPIECE_COLUMN_WIDTHS = {
+    'A': 15, 'B': 50, 'C': 35, 'D': 20, 'E': 8, 'F': 10, 'G': 12
+}
+HEADER_ROW_HEIGHT = 25
+DATA_ROW_HEIGHT = 20
+# 有内容时各生成一行配件工件的列（件号即列名），以及生成“部件名称+底座”工件的列
+ACCESSORY_COLUMNS = ('母型合金', '母型合金板', '母型套中套', '合金针')
+BASE_COLUMN = '底座'
+# 配件工件的工件名称
+ACCESSORY_PART_NAME = '其他配件'
+# 单元格类型：text 日期写为“YYYY-MM-DD”文本（原有方式）；typed 写为Excel日期（yyyy-mm-dd格式），数量为整数
+CELL_TYPES = ("text", "typed")
+CELL_TYPE = os.environ.get("YMDD_CELL_TYPES", "text")
+# typed模式下日期单元格的数字格式
+DATE_NUMBER_FORMAT = 'yyyy-mm-dd'
+CONSOLIDATE_KEYS = ('生产任务号', '件号', '工件编码')
+# 转换必需的源列
+REQUIRED_COLUMNS = ('下单日期', '制品名称', '部件名称', '生产单号', '交期', '类型', 'Unnamed: 7', '数量')
+
+
+def _iter_chunk_rows(df, chunk_rows=None, on_chunk=None):
+    """分块逐行遍历数据，每块结束时回调on_chunk(本块行数)"""
+    for start, end in chunk_bounds(len(df), chunk_rows):
+        yield from df.iloc[start:end].iterrows()
+        if on_chunk:
+            on_chunk(end - start)
+
+
+def _date_value(value, cell_type):
+    """text模式格式化为日期文本，typed模式保留为日期，由写入后端写成带日期格式的Excel日期"""
+    if cell_type == "typed":
+        return value.date()
+    return value.strftime('%Y-%m-%d')
+
+
+def build_order_frame(df_source, chunk_rows=None, on_chunk=None, cell_type=None):
+    """按生产单号去重，生成订单录入数据；cell_type见CELL_TYPES，默认取YMDD_CELL_TYPES"""
+    cell_type = cell_type or CELL_TYPE
+    if cell_type not in CELL_TYPES:
+        raise ValueError(f"未知的单元格类型: {cell_type}，可选: {', '.join(CELL_TYPES)}")
+    df_unique = df_source.drop_duplicates(subset=['生产单号'], keep='first')
+
+    order_data = []
+    for index, row in _iter_chunk_rows(df_unique, chunk_rows, on_chunk):
+        new_row = {
+            '项目名称': str(row['制品名称']),
+            '项目编号': str(row['制品名称']),
+            '项目预估交货期': _date_value(row['下单日期'], cell_type),
+            '模具名称': str(row['制品名称']),
+            '模具编号': str(row['生产单号']),
+            '预估交货期': _date_value(row['交期'], cell_type),
+            '模具类型': str(row['类型']),
+            '模具阶段': str(row['Unnamed: 7']),
+            '数量': 1
+        }
+        order_data.append(new_row)
+
+    return pd.DataFrame(order_data)
+
+
+def build_workpiece_frame(df_source, chunk_rows=None, on_chunk=None, consolidate=None):
+    """生成工件导入数据（保留所有行，不去重）；consolidate时合并重复的工件行，默认取YMDD_CONSOLIDATE"""
+    workpiece_data = []
+    for index, row in _iter_chunk_rows(df_source, chunk_rows, on_chunk):
+        base_row = {
+            '生产任务号': str(row['生产单号']) + '_T0',
+            '件号': str(row['制品名称']) + str(row['部件名称']),
+            '工件编码': str(row['制品名称']),
+            '工件名称': str(row['部件名称']),
+            '数量': int(row['数量']),
+            '备注': '',
+            '生产单号': str(row['生产单号'])
+        }
+        workpiece_data.append(base_row)
+
+        # 处理各类配件
+        for column in ACCESSORY_COLUMNS:
+            if pd.notna(row.get(column)) and str(row[column]).strip():
+                workpiece_data.append({
+                    '生产任务号': str(row['生产单号']) + '_T0',
+                    '件号': column,
+                    '工件编码': column,
+                    '工件名称': ACCESSORY_PART_NAME,
+                    '数量': int(row['数量']),
+                    '备注': '',
+                    '生产单号': str(row['生产单号'])
+                })
+
+        if pd.notna(row.get(BASE_COLUMN)) and str(row[BASE_COLUMN]).strip():
+            workpiece_data.append({
+                '生产任务号': str(row['生产单号']) + '_T0',
+                '件号': f"{row['部件名称']}{BASE_COLUMN}",
+                '工件编码': f"{row['部件名称']}{BASE_COLUMN}",
+                '工件名称': ACCESSORY_PART_NAME,
+                '数量': int(row['数量']),
+                '备注': '',
+                '生产单号': str(row['生产单号'])
+            })
+
+    df_workpiece = pd.DataFrame(workpiece_data)
+    if CONSOLIDATE if consolidate is None else consolidate:
+        df_workpiece = consolidate_workpieces(df_workpiece)
+    return df_workpiece
+
+
+def consolidate_workpieces(df_workpiece):
+    """
+    合并重复的工件行：按CONSOLIDATE_KEYS分组，数量相加，其余列取每组第一行，保持各组首次出现的顺序
+    配件多的订单（每个部件各带一行母型合金、合金针等）行数可大幅减少
+    """
+    if df_workpiece.empty:
+        return df_workpiece
+    keys = list(CONSOLIDATE_KEYS)
+    quantities = df_workpiece.groupby(keys, sort=False, dropna=False)['数量'].sum()
+    df_first = df_workpiece.drop_duplicates(subset=keys, keep='first').reset_index(drop=True)
+    df_first['数量'] = quantities.to_numpy()
+    return df_first
+
+
+def _filled(df, column):
+    """配件列中有内容的行（与生成工件时的判断一致），缺少该列时全为False"""
+    if column not in df.columns:
+        return pd.Series(False, index=df.index)
+    values = df[column]
+    return values.notna() & values.astype(str).str.strip().ne('')
+
+
+def _text_cells(values):
+    """
+    列中以文本形式存放的单元格（生成订单录入数据时文本日期无法格式化）
+    先按整列推断类型，只有日期和文本混杂的列才用.str逐格判断，不对每行调用Python函数
+    """
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind == "string":
+        return values.notna()
+    if kind in ("mixed", "mixed-integer"):
+        return values.str.len().notna()
+    return pd.Series(False, index=values.index)
+
+
+def _issue(problem, mask, df):
+    """统计一类问题的行数，并列出前几个涉及的生产单号"""
+    count = int(mask.sum())
+    if not count:
+        return None
+    examples = df.loc[mask, '生产单号'].dropna().astype(str).unique()[:5] if '生产单号' in df.columns else []
+    return {'问题': problem, '行数': count, '示例生产单号': '、'.join(examples)}
+
+
+def _consolidated_workpieces(df_source):
+    """合并重复工件行后的工件行数：按与build_workpiece_frame相同的规则拼出各行的分组键再去重"""
+    tasks = df_source['生产单号'].map(str)
+    products = df_source['制品名称'].map(str)
+    parts = df_source['部件名称'].map(str)
+    keys = [pd.DataFrame({'task': tasks, 'number': products + parts, 'code': products})]
+    for column in ACCESSORY_COLUMNS + (BASE_COLUMN,):
+        filled = _filled(df_source, column)
+        names = parts[filled] + column if column == BASE_COLUMN else pd.Series(column, index=tasks[filled].index)
+        keys.append(pd.DataFrame({'task': tasks[filled], 'number': names, 'code': names}))
+    return len(pd.concat(keys, ignore_index=True).drop_duplicates())
+
+
+def count_conversion(df_source, consolidate=None):
+    """
+    只统计转换结果的数量和数据问题（试运行），全部为按列的向量化运算，不生成结果数据也不写文件
+    consolidate时工件数按合并重复工件行后的行数统计，默认取YMDD_CONSOLIDATE
+    返回{rows, orders, workpieces, merged（合并掉的工件行数）, accessories: {配件: 数量},
+    errors: [{问题, 行数, 示例生产单号}]}
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df_source.columns]
+    accessories = dict.fromkeys(ACCESSORY_COLUMNS + (BASE_COLUMN,), 0)
+    if missing:
+        return {
+            'rows': len(df_source), 'orders': 0, 'workpieces': 0, 'merged': 0, 'accessories': accessories,
+            'errors': [{'问题': f"缺少列: {', '.join(missing)}", '行数': len(df_source), '示例生产单号': ''}],
+        }
+
+    for column in accessories:
+        accessories[column] = int(_filled(df_source, column).sum())
+    # 与生成订单录入数据时相同：每个生产单号取第一行
+    first_rows = df_source.drop_duplicates(subset=['生产单号'], keep='first')
+
+    issues = [
+        _issue("生产单号为空", df_source['生产单号'].isna(), df_source),
+        _issue("数量为空或不是数字", pd.to_numeric(df_source['数量'], errors='coerce').isna(), df_source),
+    ]
+    for column in ('下单日期', '交期'):
+        dates = first_rows[column]
+        invalid = pd.to_datetime(dates, errors='coerce').isna()
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            invalid |= _text_cells(dates)
+        issues.append(_issue(f"{column}为空或不是日期", invalid, first_rows))
+
+    workpieces = len(df_source) + sum(accessories.values())
+    merged = 0
+    if CONSOLIDATE if consolidate is None else consolidate:
+        merged = workpieces - _consolidated_workpieces(df_source)
+    return {
+        'rows': len(df_source),
+        'orders': len(first_rows),
+        'workpieces': workpieces - merged,
+        'merged': merged,
+        'accessories': accessories,
+        'errors': [issue for issue in issues if issue],
+    }
+
+
+def copy_sheet(source_wb, source_sheet_name, target_wb, new_sheet_name=None):
+    """复制工作表（包含完整格式）"""
+    source_sheet = source_wb[source_sheet_name]
+    new_name = new_sheet_name or source_sheet_name
+    target_sheet = target_wb.create_sheet(new_name)
+
+    # 复制单元格内容和样式
+    for row in source_sheet.iter_rows(min_row=1, max_row=source_sheet.max_row,
+                                     min_col=1, max_col=source_sheet.max_column):
+        for cell in row:
+            new_cell = target_sheet.cell(row=cell.row, column=cell.column, value=cell.value)
+            if cell.has_style:
+                new_cell.font = copy(cell.font)
+                new_cell.border = copy(cell.border)
+                new_cell.fill = copy(cell.fill)
+                new_cell.number_format = copy(cell.number_format)
+                new_cell.protection = copy(cell.protection)
+                new_cell.alignment = copy(cell.alignment)
+
+    # 复制列宽
+    for col_idx in range(1, source_sheet.max_column + 1):
+        col_letter = get_column_letter(col_idx)
+        if col_letter in source_sheet.column_dimensions:
+            target_sheet.column_dimensions[col_letter].width = source_sheet.column_dimensions[col_letter].width
+
+    # 复制行高
+    for row in range(1, source_sheet.max_row + 1):
+        if row in source_sheet.row_dimensions:
+            target_sheet.row_dimensions[row].height = source_sheet.row_dimensions[row].height
+
+    # 复制合并单元格
+    for merged_range in source_sheet.merged_cells.ranges:
+        target_sheet.merged_cells.add(str(merged_range))
+
+    # 复制工作表属性
+    target_sheet.sheet_format = copy(source_sheet.sheet_format)
+    target_sheet.sheet_properties = copy(source_sheet.sheet_properties)
+    target_sheet.page_margins = copy(source_sheet.page_margins)
+    target_sheet.freeze_panes = source_sheet.freeze_panes
+    target_sheet.page_setup = copy(source_sheet.page_setup)
+    target_sheet.conditional_formatting = copy(source_sheet.conditional_formatting)
+
+    # 修正：正确复制命名样式
+    target_style_names = []
+    for s in target_wb.named_styles:
+        if hasattr(s, 'name'):
+            target_style_names.append(s.name)
+        elif isinstance(s, str):
+            target_style_names.append(s)
+
+    for style in source_wb.named_styles:
+        if hasattr(style, 'name'):
+            style_name = style.name
+        elif isinstance(style, str):
+            style_name = style
+        else:
+            continue
+
+        if style_name not in target_style_names:
+            new_style = NamedStyle(name=style_name)
+            if hasattr(style, 'font'):
+                new_style.font = copy(style.font)
+            if hasattr(style, 'border'):
+                new_style.border = copy(style.border)
+            if hasattr(style, 'fill'):
+                new_style.fill = copy(style.fill)
+            if hasattr(style, 'number_format'):
+                new_style.number_format = copy(style.number_format)
+            if hasattr(style, 'protection'):
+                new_style.protection = copy(style.protection)
+            if hasattr(style, 'alignment'):
+                new_style.alignment = copy(style.alignment)
+            target_wb.add_named_style(new_style)
+
+    return target_sheet
+
+
+def fill_data_sheet(ws, df, column_widths, chunk_rows=None, on_chunk=None):
+    """把数据写入工作表并设置列宽、行高，每写入一块数据行回调on_chunk(本块行数)"""
+    ws.append(list(df.columns))
+    for start, end in chunk_bounds(len(df), chunk_rows):
+        for r in dataframe_to_rows(df.iloc[start:end], index=False, header=False):
+            ws.append(r)
+        if on_chunk:
+            on_chunk(end - start)
+
+    for col_letter, width in column_widths.items():
+        ws.column_dimensions[col_letter].width = width
+    ws.row_dimensions[1].height = HEADER_ROW_HEIGHT
+    for row_num in range(2, len(df) + 2):
+        ws.row_dimensions[row_num].height = DATA_ROW_HEIGHT
+    return ws
+
+
+def build_workbook(df, sheet_name, hidden_wb, page_sheet_name, column_widths,
+                   chunk_rows=None, on_chunk=None):
+    """
+    生成带隐藏page工作表的结果工作簿
+    df也可以是[(工作表名, 数据)]，用于把拆分后的数据写入同一文件的多个工作表
+    """
+    wb = Workbook()
+    if 'Sheet' in wb.sheetnames:
+        del wb['Sheet']
+
+    sheets = df if isinstance(df, list) else [(sheet_name, df)]
+    for name, frame in sheets:
+        fill_data_sheet(wb.create_sheet(name), frame, column_widths, chunk_rows, on_chunk)
+    copy_sheet(hidden_wb, page_sheet_name, wb, new_sheet_name='page')
+
+    wb['page'].sheet_state = 'hidden'
+    return wb
+
+
+def build_order_workbook(df_order_result, hidden_wb, chunk_rows=None, on_chunk=None):
+    """生成订单录入工作簿"""
+    return build_workbook(df_order_result, '订单录入', hidden_wb, 'page', ORDER_COLUMN_WIDTHS,
+                          chunk_rows, on_chunk)
+
+
+def build_workpiece_workbook(df_workpiece_result, hidden_wb, chunk_rows=None, on_chunk=None):
+    """生成工件导入工作簿"""
+    return build_workbook(df_workpiece_result, '工件信息', hidden_wb, 'page2', WORKPIECE_COLUMN_WIDTHS,
+                          chunk_rows, on_chunk)
+
+
+def save_to_buffer(wb):
+    """把工作簿保存到内存"""
+    buffer = BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
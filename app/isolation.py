@@ -0,0 +1,183 @@
+"""
+在独立子进程中执行转换
+每次转换启动一个短期子进程，设置内存上限并限制运行时间，结束后进程退出、内存全部归还系统，
+网页服务进程的内存在每个任务后回到基线，失控的上传也只会终止自己的子进程
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+
+# 是否在子进程中执行转换（YMDD_ISOLATE=0时在服务进程内直接执行）
+ISOLATE = os.environ.get("YMDD_ISOLATE", "1") != "0"
+# 单次转换的最长运行秒数
+TIMEOUT = float(os.environ.get("YMDD_JOB_TIMEOUT", 600))
+# 子进程可用内存上限（MB），0表示不限制；只在支持resource模块的系统上生效
+MEMORY_LIMIT_MB = int(os.environ.get("YMDD_JOB_MEMORY_MB", 4096))
+
+
+class IsolatedRunError(Exception):
+    """子进程执行失败（超时、超出内存上限、异常退出或转换本身出错），detail为子进程中的详细错误信息"""
+
+    def __init__(self, message, detail=""):
+        super().__init__(message)
+        self.detail = detail
+
+
+def limit_memory(memory_limit_mb=MEMORY_LIMIT_MB):
+    """限制当前进程的地址空间大小，超出时分配内存会抛出MemoryError"""
+    if not memory_limit_mb:
+        return False
+    try:
+        import resource
+    except ImportError:
+        return False
+    limit = memory_limit_mb * 1024 * 1024
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    return True
+
+
+def init_pool_worker(memory_limit_mb=MEMORY_LIMIT_MB):
+    """批量转换进程池的工作进程初始化：设置内存上限，忽略Ctrl-C（由主进程统一停止，转换中的文件照常完成）"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    limit_memory(memory_limit_mb)
+
+
+class _Awaited:
+    """
+    子进程中代替父进程里尚未完成的Future：子进程启动后由后台线程从管道接收结果，
+    调用时等待并返回该结果（父进程中出错时抛出IsolatedRunError）
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.future = None
+
+    def start(self):
+        self.future = Future()
+        threading.Thread(target=self._receive, name="ymdd-awaited", daemon=True).start()
+
+    def _receive(self):
+        try:
+            message = self.conn.recv()
+        except EOFError:
+            message = ("error", "服务进程未能提供转换所需的数据", "")
+        finally:
+            self.conn.close()
+        if message[0] == "result":
+            self.future.set_result(message[1])
+        else:
+            self.future.set_exception(IsolatedRunError(message[1], message[2]))
+
+    def __call__(self):
+        return self.future.result()
+
+
+def _forward(future, conn):
+    """父进程中的Future完成后把结果经管道发给子进程（子进程已退出时忽略）"""
+    try:
+        message = ("result", future.result())
+    except Exception as e:
+        message = ("error", str(e), getattr(e, 'detail', None) or traceback.format_exc())
+    try:
+        conn.send(message)
+    except OSError:
+        pass
+    finally:
+        conn.close()
+
+
+def _child(conn, fn, args, kwargs, memory_limit_mb):
+    """子进程入口：设置内存上限后执行fn，进度和结果通过管道发回"""
+    limit_memory(memory_limit_mb)
+    for value in (*args, *kwargs.values()):
+        if isinstance(value, _Awaited):
+            value.start()
+
+    def on_progress(progress, message=None, detail=None):
+        conn.send(("progress", progress, message, detail))
+
+    try:
+        result = fn(*args, on_progress=on_progress, **kwargs)
+    except MemoryError:
+        conn.send(("error", f"转换超出内存上限（{memory_limit_mb} MB），请拆分文件或缩小筛选范围", ""))
+    except Exception as e:
+        conn.send(("error", str(e), traceback.format_exc()))
+    else:
+        conn.send(("result", result))
+    finally:
+        conn.close()
+
+
+def run_isolated(fn, *args, on_progress=None, timeout=TIMEOUT,
+                 memory_limit_mb=MEMORY_LIMIT_MB, **kwargs):
+    """
+    在新的子进程中执行fn(*args, on_progress=..., **kwargs)并返回其结果
+    fn须为模块级函数，结果须可序列化（字节内容或文件路径）；
+    参数中的Future（如正在下载的资源）不必等待完成：子进程中收到的是一个函数，
+    调用时返回该Future的结果，结果在父进程中得到后立即经管道发给子进程，下载与子进程启动同时进行；
+    子进程中出错、超时或异常退出时抛出IsolatedRunError
+    """
+    mp_context = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = mp_context.Pipe(duplex=False)
+    awaited = []
+
+    def substitute(value):
+        if not isinstance(value, Future):
+            return value
+        receive_conn, send_conn = mp_context.Pipe(duplex=False)
+        awaited.append((value, receive_conn, send_conn))
+        return _Awaited(receive_conn)
+
+    args = tuple(substitute(value) for value in args)
+    kwargs = {key: substitute(value) for key, value in kwargs.items()}
+    process = mp_context.Process(
+        target=_child, args=(child_conn, fn, args, kwargs, memory_limit_mb),
+        # 非守护进程：转换中拆分文件时还需要再启动写入进程
+        name="ymdd-convert", daemon=False,
+    )
+    process.start()
+    child_conn.close()
+    for future, receive_conn, send_conn in awaited:
+        receive_conn.close()
+        future.add_done_callback(lambda done, conn=send_conn: _forward(done, conn))
+
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise IsolatedRunError(f"转换超过 {timeout:.0f} 秒仍未完成，已终止")
+            if not parent_conn.poll(min(remaining, 1.0)):
+                if not process.is_alive() and not parent_conn.poll():
+                    raise IsolatedRunError(f"转换进程异常退出（退出码 {process.exitcode}），可能超出内存上限")
+                continue
+            try:
+                message = parent_conn.recv()
+            except EOFError:
+                process.join(5)
+                raise IsolatedRunError(f"转换进程异常退出（退出码 {process.exitcode}），可能超出内存上限")
+            kind = message[0]
+            if kind == "progress":
+                if on_progress:
+                    on_progress(*message[1:])
+            elif kind == "result":
+                process.join(5)
+                return message[1]
+            else:
+                raise IsolatedRunError(message[1], message[2])
+    finally:
+        parent_conn.close()
+        if process.is_alive():
+            process.terminate()
+            process.join(5)
+        if process.is_alive():
+            process.kill()
+            process.join()
@@ -0,0 +1,120 @@
+"""
+后台转换任务
+转换提交到进程内共享的后台线程池执行，返回任务编号；页面重新运行不会中断任务，
+页面通过任务编号轮询进度和结果，已结束的任务在保留期后清理，
+结果中'files'列出的临时文件（如批量转换的压缩包）随任务一起删除
+"""
+
+import os
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# 同时执行的任务数
+JOB_WORKERS = int(os.environ.get("YMDD_JOB_WORKERS", 2))
+# 已结束任务的保留秒数
+JOB_TTL = int(os.environ.get("YMDD_JOB_TTL", 3600))
+
+ACTIVE_STATES = ("queued", "running")
+
+
+class JobManager:
+    """后台任务管理（线程安全，进程内共享一个实例）"""
+
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_TTL):
+        self.ttl = ttl
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ymdd-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def submit(self, fn, *args, kind="convert", **kwargs):
+        """提交任务，fn(report, *args, **kwargs)中通过report(进度, 说明, 明细)汇报进度，返回任务编号"""
+        self._cleanup()
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'status': 'queued',
+            'progress': 0.0,
+            'message': '排队中...',
+            'detail': None,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'finished_at': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+        self._pool.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def _run(self, job_id, fn, args, kwargs):
+        """在后台线程中执行任务并记录结果"""
+        self._update(job_id, status='running', message='正在转换...')
+
+        def report(progress=None, message=None, detail=None):
+            fields = {}
+            if progress is not None:
+                fields['progress'] = max(0.0, min(1.0, progress))
+            if message is not None:
+                fields['message'] = message
+            if detail is not None:
+                fields['detail'] = detail
+            self._update(job_id, **fields)
+
+        try:
+            result = fn(report, *args, **kwargs)
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e), message='转换失败',
+                         detail=getattr(e, 'detail', None) or traceback.format_exc(),
+                         finished_at=time.time())
+        else:
+            self._update(job_id, status='done', result=result, progress=1.0,
+                         message='转换完成', finished_at=time.time())
+
+    def get(self, job_id):
+        """返回任务的快照（不存在或已过期时返回None）"""
+        self._cleanup()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _cleanup(self):
+        """清理超过保留期的已结束任务，并删除任务结果占用的临时文件"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['finished_at'] is not None and now - job['finished_at'] > self.ttl
+            ]
+            files = []
+            for job_id in expired:
+                result = self._jobs.pop(job_id)['result']
+                if isinstance(result, dict):
+                    files.extend(result.get('files', ()))
+        for path in files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    """获取进程内共享的任务管理器"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+        return _manager
@@ -1,17 +1,9 @@
 import streamlit as st
-import pandas as pd
 import os
-import sys
 from datetime import datetime
-import traceback
-from openpyxl import load_workbook, Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from copy import copy
-from openpyxl.styles import NamedStyle
-import tempfile
-from io import BytesIO, StringIO
-import requests
-import base64 
+from io import BytesIO
+# pandas、openpyxl、requests等重量级模块只在转换流程中按需导入，转换不在独立子进程中执行时由warmup在后台提前加载
+import warmup
 
 # 页面配置
 st.set_page_config(
@@ -46,21 +38,26 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-# 新增：配置GitHub仓库信息
-GITHUB_REPO_INFO = {
-    "username": "xinrenleiZZY",
-    "repo_name": "ymdd_web_cloud",
-    "branch": "master",
-    "hidden_file_path": "mnt/隐藏表格.xlsx"
-}
+# 后台任务进度的刷新间隔（秒）
+JOB_POLL_INTERVAL = 0.5
+
+# 自定义CSS文件（按本文件位置定位，与启动时的工作目录无关）
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "styles", "custom.css")
+
+
+@st.cache_resource(show_spinner=False)
+def read_css():
+    """读取自定义CSS，每个进程只读取一次"""
+    # 关键修改：读取文件时指定encoding="utf-8"
+    with open(CSS_PATH, "r", encoding="utf-8") as f:
+        return f.read()
+
 
 # 加载自定义CSS
 def load_css():
     """加载自定义CSS样式"""
     try:
-        # 关键修改：读取文件时指定encoding="utf-8"
-        with open("app/styles/custom.css", "r", encoding="utf-8") as f:
-            st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+        st.markdown(f"<style>{read_css()}</style>", unsafe_allow_html=True)
     except Exception as e:
         st.warning(f"加载CSS样式失败: {str(e)}")
 
@@ -81,7 +78,7 @@ def code_info():
         
         with col1:
             st.subheader("📂 上传文件")
-            source_file = st.file_uploader("选择何氏订单总表文件（Excel格式）     点击Browse files", type=["xlsx"])
+            input_panel()
             with st.expander("程序说明", expanded=True):
                 st.markdown("""
                     <div class="left-column-content">
@@ -96,7 +93,7 @@ def code_info():
                         </p>
                         <div class="custom-subheader">🔍 使用步骤</div>
                         <p class="info-text">
-                        1. 点击"浏览文件（Browse files）"选择订单总表Excel文件
+                        1. 点击"浏览文件（Browse files）"选择订单总表Excel文件（可多选，多个文件的结果打包为zip下载）
                         <br>
                         2. 点击"开始转换"按钮
                         <br>
@@ -113,60 +110,7 @@ def code_info():
                 # default_download_path = st.text_input("默认下载路径（可修改）", value="C:/Users/用户名/Downloads",  help="此路径仅作为参考记录，实际下载位置取决于浏览器设置")
                 st.subheader("🚀 开始处理")
                 st.write("一键式处理工件、订单文件（自动化）点击🚀 开始处理  ")
-                # 处理按钮
-                if st.button("🚀 开始转换"):
-                    if not source_file:
-                        st.error("请先选择订单总表文件")
-                    else:
-                        # 获取隐藏文件
-                        hidden_file = get_hidden_file_from_github()
-                        if not hidden_file:
-                            st.error("无法获取必要资源，转换终止")
-                        else:
-                            # 在expander中显示处理过程
-                            with st.expander("处理过程", expanded=False):
-                                with st.spinner("正在进行数据转换，请稍候..."):
-                                    results = convert_files(source_file, hidden_file)
-                                
-                                if results:
-                                    st.success("转换完成！")
-                                    st.info(f"订单录入文件：{results['order']['filename']}，共 {results['order']['count']} 条记录")
-                                    st.info(f"工件导入文件：{results['workpiece']['filename']}，共 {results['workpiece']['count']} 条记录")
-                                    
-                                    # 存储结果到session state以便后续使用
-                                    st.session_state['conversion_results'] = results
-                                else:
-                                    st.error("程序执行失败！请检查错误信息")
-                st.markdown('</div>', unsafe_allow_html=True)  # 新增
-                # 下载区域（独立显示）
-                if 'conversion_results' in st.session_state:
-                    st.subheader("📥 下载转换结果")
-                    results = st.session_state['conversion_results']
-                    # 优化提示文字
-                    st.info("提示：点击下载按钮后，会弹出保存窗口，请选择本地文件夹进行保存")
-
-                    wat = st.container()
-                    with wat:
-                        st.download_button(
-                            label="下载订单文件",
-                            data=results['order']['buffer'],
-                            file_name=results['order']['filename'],
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                    
-                        st.download_button(
-                            label="下载工件文件",
-                            data=results['workpiece']['buffer'],
-                            file_name=results['workpiece']['filename'],
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                        )
-                        # 增加详细的路径说明
-                        st.info("""
-                        💡 下载路径设置说明：  
-                        1. 文件将保存到浏览器默认的"下载"文件夹  
-                        2. 如需修改路径，可在浏览器设置中调整默认下载位置  
-                        3. 部分浏览器支持"每次下载时询问保存位置"的选项
-                        """)
+                result_panel()
                 with st.expander("程序说明", expanded=True):
                     st.markdown("""
                         <div class="left-column-content">
@@ -189,286 +133,477 @@ def code_info():
                         </div>
                 """, unsafe_allow_html=True)  # 新增     
 
-# 复制工作表函数
-def copy_sheet(source_wb, source_sheet_name, target_wb, new_sheet_name=None):
-    """复制工作表（包含完整格式）"""
-    source_sheet = source_wb[source_sheet_name]
-    new_name = new_sheet_name or source_sheet_name
-    target_sheet = target_wb.create_sheet(new_name)
-
-    # 复制单元格内容和样式
-    for row in source_sheet.iter_rows(min_row=1, max_row=source_sheet.max_row,
-                                     min_col=1, max_col=source_sheet.max_column):
-        for cell in row:
-            new_cell = target_sheet.cell(row=cell.row, column=cell.column, value=cell.value)
-            if cell.has_style:
-                new_cell.font = copy(cell.font)
-                new_cell.border = copy(cell.border)
-                new_cell.fill = copy(cell.fill)
-                new_cell.number_format = copy(cell.number_format)
-                new_cell.protection = copy(cell.protection)
-                new_cell.alignment = copy(cell.alignment)
-            
-    # 复制列宽
-    from openpyxl.utils import get_column_letter
-    for col_idx in range(1, source_sheet.max_column + 1):
-        col_letter = get_column_letter(col_idx)
-        if col_letter in source_sheet.column_dimensions:
-            target_sheet.column_dimensions[col_letter].width = source_sheet.column_dimensions[col_letter].width
-    
-    # 复制行高
-    for row in range(1, source_sheet.max_row + 1):
-        if row in source_sheet.row_dimensions:
-            target_sheet.row_dimensions[row].height = source_sheet.row_dimensions[row].height
-
-    # 复制合并单元格
-    for merged_range in source_sheet.merged_cells.ranges:
-        target_sheet.merged_cells.add(str(merged_range))
-
-    # 复制工作表属性
-    target_sheet.sheet_format = copy(source_sheet.sheet_format)
-    target_sheet.sheet_properties = copy(source_sheet.sheet_properties)
-    target_sheet.page_margins = copy(source_sheet.page_margins)
-    target_sheet.freeze_panes = source_sheet.freeze_panes
-    target_sheet.page_setup = copy(source_sheet.page_setup)
-    target_sheet.conditional_formatting = copy(source_sheet.conditional_formatting)
-
-    # 修正：正确复制命名样式
-    target_style_names = []
-    for s in target_wb.named_styles:
-        if hasattr(s, 'name'):
-            target_style_names.append(s.name)
-        elif isinstance(s, str):
-            target_style_names.append(s)
-    
-    for style in source_wb.named_styles:
-        if hasattr(style, 'name'):
-            style_name = style.name
-        elif isinstance(style, str):
-            style_name = style
+
+# 上传文件和转换选项（独立片段：改动选项只重新运行本片段，不重绘横幅、说明和下载区）
+@st.fragment
+def input_panel():
+    """显示上传和选项控件，当前取值记入session_state供处理区读取"""
+    source_files = st.file_uploader(
+        "选择何氏订单总表文件（Excel格式，可多选）     点击Browse files",
+        type=["xlsx"], accept_multiple_files=True,
+    )
+    filter_args = filter_options()
+    output_args = output_options()
+    st.session_state['inputs'] = (source_files, filter_args, output_args)
+
+
+def deferred(data):
+    """下载按钮的数据改为点击时才提供，页面重新运行时不再对大块结果做哈希和登记"""
+    return lambda: data
+
+
+def deferred_file(path):
+    """下载按钮的数据在点击时才从磁盘读取，结果文件平时不占用内存"""
+    def read():
+        with open(path, "rb") as f:
+            return f.read()
+    return read
+
+
+# 处理和下载区（独立片段：点击按钮、轮询进度只重新运行本片段，下载不触发重新运行）
+@st.fragment
+def result_panel():
+    """显示处理按钮、任务进度、统计结果和下载按钮"""
+    source_files, filter_args, output_args = st.session_state.get('inputs', ([], None, {}))
+    # 处理按钮
+    convert_col, count_col = st.columns(2)
+    with convert_col:
+        convert_clicked = st.button("🚀 开始转换")
+    with count_col:
+        count_clicked = st.button("🔢 只统计数量（试运行）",
+                                  help="只统计订单数、工件数和数据问题，不生成结果文件")
+    if convert_clicked or count_clicked:
+        if not source_files:
+            st.error("请先选择订单总表文件")
+        elif count_clicked:
+            submit_count(source_files, filter_args, output_args)
         else:
-            continue
-            
-        if style_name not in target_style_names:
-            new_style = NamedStyle(name=style_name)
-            if hasattr(style, 'font'):
-                new_style.font = copy(style.font)
-            if hasattr(style, 'border'):
-                new_style.border = copy(style.border)
-            if hasattr(style, 'fill'):
-                new_style.fill = copy(style.fill)
-            if hasattr(style, 'number_format'):
-                new_style.number_format = copy(style.number_format)
-            if hasattr(style, 'protection'):
-                new_style.protection = copy(style.protection)
-            if hasattr(style, 'alignment'):
-                new_style.alignment = copy(style.alignment)
-            target_wb.add_named_style(new_style)
-
-    return target_sheet
-
-# 从GitHub获取隐藏表格
-def get_hidden_file_from_github():
-    """从GitHub仓库的mnt文件夹读取隐藏表格"""
-    try:
-        github_url = (
-            f"https://raw.githubusercontent.com/"
-            f"{GITHUB_REPO_INFO['username']}/"
-            f"{GITHUB_REPO_INFO['repo_name']}/"
-            f"{GITHUB_REPO_INFO['branch']}/"
-            f"{GITHUB_REPO_INFO['hidden_file_path']}"
-        )
-        
-        with st.spinner("正在从GitHub获取必要资源..."):
-            response = requests.get(github_url)
-            response.raise_for_status()
-        
-        file_stream = BytesIO(response.content)
-        return file_stream
-    
-    except Exception as e:
-        st.error(f"获取资源失败：{str(e)}")
-        st.text("请检查网络连接或联系管理员")
+            submit_conversion(source_files, filter_args, output_args)
+    # 后台任务进度（页面重新运行不会中断任务）
+    job_id = st.session_state.get('job_id') or st.query_params.get('job')
+    if job_id:
+        show_job(job_id)
+    st.markdown('</div>', unsafe_allow_html=True)  # 新增
+    # 试运行统计结果
+    if 'count_results' in st.session_state:
+        show_counts(st.session_state['count_results'])
+    # 批量转换结果下载（压缩包保存在磁盘上，任务过期时删除）
+    if 'batch_results' in st.session_state:
+        batch_results = st.session_state['batch_results']
+        st.subheader("📥 下载转换结果")
+        st.dataframe(batch_results['statuses'], hide_index=True)
+        if os.path.exists(batch_results['path']):
+            st.download_button(
+                label="下载全部结果（zip）",
+                data=deferred_file(batch_results['path']),
+                file_name=batch_results['filename'],
+                mime="application/zip",
+                on_click="ignore"
+            )
+        else:
+            st.warning("转换结果已过期，请重新转换")
+    # 下载区域（独立显示）
+    if 'conversion_results' in st.session_state:
+        st.subheader("📥 下载转换结果")
+        results = st.session_state['conversion_results']
+        # 优化提示文字
+        st.info("提示：点击下载按钮后，会弹出保存窗口，请选择本地文件夹进行保存")
+
+        wat = st.container()
+        with wat:
+            if results.get('archive'):
+                # 结果拆分为多个文件时打包下载
+                st.download_button(
+                    label=f"下载全部拆分文件（zip，共 {results['partitions']} 组）",
+                    data=deferred(results['archive']['buffer']),
+                    file_name=results['archive']['filename'],
+                    mime="application/zip",
+                    on_click="ignore"
+                )
+            else:
+                st.download_button(
+                    label="下载订单文件",
+                    data=deferred(results['order']['buffer']),
+                    file_name=results['order']['filename'],
+                    mime=results['mime'],
+                    on_click="ignore"
+                )
+
+                st.download_button(
+                    label="下载工件文件",
+                    data=deferred(results['workpiece']['buffer']),
+                    file_name=results['workpiece']['filename'],
+                    mime=results['mime'],
+                    on_click="ignore"
+                )
+            if results.get('catalog_misses') and any(results['catalog_misses'].values()):
+                from catalog import MISSES_PREFIX, misses_csv
+                st.download_button(
+                    label="下载主数据未匹配清单（csv）",
+                    data=lambda: misses_csv(results['catalog_misses']),
+                    file_name=f"{MISSES_PREFIX}.csv",
+                    mime="text/csv",
+                    on_click="ignore"
+                )
+            # 增加详细的路径说明
+            st.info("""
+            💡 下载路径设置说明：  
+            1. 文件将保存到浏览器默认的"下载"文件夹  
+            2. 如需修改路径，可在浏览器设置中调整默认下载位置  
+            3. 部分浏览器支持"每次下载时询问保存位置"的选项
+            """)
+
+
+# 数据筛选选项
+def filter_options():
+    """显示数据筛选选项，返回筛选参数（未启用时为None）"""
+    with st.expander("数据筛选（可选）", expanded=False):
+        enabled = st.checkbox("只转换指定范围内的订单", value=False)
+        date_field = st.selectbox("按日期筛选", ["不筛选", "下单日期", "交期"])
+        date_range = st.date_input("日期范围", value=[], help="包含起止日期，只选一天表示从该日起")
+        prefix_text = st.text_input("生产单号前缀", value="", help="多个前缀用逗号分隔，例如 HS01,HS02")
+    if not enabled:
         return None
 
-# 功能代码函数
-def convert_files(source_file, hidden_file):
-    """执行文件转换并返回结果"""
-    try:
-        with st.spinner("正在读取订单数据..."):
-            df_source = pd.read_excel(source_file)
-        st.success(f"✅ 源文件读取成功，共 {len(df_source)} 行数据")
+    start_date = end_date = None
+    if date_field != "不筛选" and date_range:
+        start_date = date_range[0]
+        end_date = date_range[1] if len(date_range) > 1 else None
+    prefixes = [p for p in prefix_text.replace("，", ",").split(",") if p.strip()]
+    return {
+        'date_field': date_field if start_date else None,
+        'start_date': start_date,
+        'end_date': end_date,
+        'order_prefixes': prefixes,
+    }
 
-        # 生成订单录入文件
-        with st.spinner("正在处理订单数据..."):
-            df_unique = df_source.drop_duplicates(subset=['生产单号'], keep='first')
-        
-        st.success(f"✅ 按生产单号去重完成，共 {len(df_unique)} 条记录")
-
-        order_data = []
-        for index, row in df_unique.iterrows():
-            new_row = {
-                '项目名称': str(row['制品名称']),
-                '项目编号': str(row['制品名称']),
-                '项目预估交货期': row['下单日期'].strftime('%Y-%m-%d'),
-                '模具名称': str(row['制品名称']),
-                '模具编号': str(row['生产单号']),
-                '预估交货期': row['交期'].strftime('%Y-%m-%d'),
-                '模具类型': str(row['类型']),
-                '模具阶段': str(row['Unnamed: 7']),
-                '数量': 1
-            }
-            order_data.append(new_row)
-
-        df_order_result = pd.DataFrame(order_data)
-
-        # 生成工件导入文件
-        with st.spinner("正在生成工件数据..."):
-            workpiece_data = []
-            for index, row in df_source.iterrows():
-                base_row = {
-                    '生产任务号': str(row['生产单号']) + '_T0',
-                    '件号': str(row['制品名称']) + str(row['部件名称']),
-                    '工件编码': str(row['制品名称']),
-                    '工件名称': str(row['部件名称']),
-                    '数量': int(row['数量']),
-                    '备注': '',
-                    '生产单号': str(row['生产单号'])
-                }
-                workpiece_data.append(base_row)
-
-                # 处理各类配件
-                if pd.notna(row.get('母型合金')) and str(row['母型合金']).strip():
-                    workpiece_data.append({
-                        '生产任务号': str(row['生产单号']) + '_T0',
-                        '件号': '母型合金',
-                        '工件编码': '母型合金',
-                        '工件名称': '其他配件',
-                        '数量': int(row['数量']),
-                        '备注': '',
-                        '生产单号': str(row['生产单号'])
-                    })
-
-                if pd.notna(row.get('母型合金板')) and str(row['母型合金板']).strip():
-                    workpiece_data.append({
-                        '生产任务号': str(row['生产单号']) + '_T0',
-                        '件号': '母型合金板',
-                        '工件编码': '母型合金板',
-                        '工件名称': '其他配件',
-                        '数量': int(row['数量']),
-                        '备注': '',
-                        '生产单号': str(row['生产单号'])
-                    })
-
-                if pd.notna(row.get('母型套中套')) and str(row['母型套中套']).strip():
-                    workpiece_data.append({
-                        '生产任务号': str(row['生产单号']) + '_T0',
-                        '件号': '母型套中套',
-                        '工件编码': '母型套中套',
-                        '工件名称': '其他配件',
-                        '数量': int(row['数量']),
-                        '备注': '',
-                        '生产单号': str(row['生产单号'])
-                    })
-
-                if pd.notna(row.get('合金针')) and str(row['合金针']).strip():
-                    workpiece_data.append({
-                        '生产任务号': str(row['生产单号']) + '_T0',
-                        '件号': '合金针',
-                        '工件编码': '合金针',
-                        '工件名称': '其他配件',
-                        '数量': int(row['数量']),
-                        '备注': '',
-                        '生产单号': str(row['生产单号'])
-                    })
-
-                if pd.notna(row.get('底座')) and str(row['底座']).strip():
-                    workpiece_data.append({
-                        '生产任务号': str(row['生产单号']) + '_T0',
-                        '件号': f"{row['部件名称']}底座",
-                        '工件编码': f"{row['部件名称']}底座",
-                        '工件名称': '其他配件',
-                        '数量': int(row['数量']),
-                        '备注': '',
-                        '生产单号': str(row['生产单号'])
-                    })
-
-        df_workpiece_result = pd.DataFrame(workpiece_data)
-        st.success(f"✅ 工件导入数据生成完成，共 {len(df_workpiece_result)} 条记录")
-
-        # 处理隐藏表格文件
-        hidden_wb = load_workbook(hidden_file, data_only=True)
-
-        # 生成订单录入文件
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        order_wb = Workbook()
-        if 'Sheet' in order_wb.sheetnames:
-            del order_wb['Sheet']
-        order_ws = order_wb.create_sheet('订单录入')
-        for r in dataframe_to_rows(df_order_result, index=False, header=True):
-            order_ws.append(r)
-        copy_sheet(hidden_wb, 'page', order_wb, new_sheet_name='page')
-        column_widths = {
-            'A': 35, 'B': 35, 'C': 15, 'D': 35, 'E': 12,
-            'F': 15, 'G': 20, 'H': 12, 'I': 8
-        }
-        for col_letter, width in column_widths.items():
-            order_ws.column_dimensions[col_letter].width = width
-        order_ws.row_dimensions[1].height = 25
-        for row_num in range(2, len(df_order_result) + 2):
-            order_ws.row_dimensions[row_num].height = 20
-        
-        order_wb['page'].sheet_state = 'hidden'
-        
-        # 保存到内存
-        order_buffer = BytesIO()
-        order_wb.save(order_buffer)
-        order_buffer.seek(0)
-
-        # 生成工件导入文件
-        workpiece_wb = Workbook()
-        if 'Sheet' in workpiece_wb.sheetnames:
-            del workpiece_wb['Sheet']
-        
-        workpiece_ws = workpiece_wb.create_sheet('工件信息')
-        for r in dataframe_to_rows(df_workpiece_result, index=False, header=True):
-            workpiece_ws.append(r)
-        copy_sheet(hidden_wb, 'page2', workpiece_wb, new_sheet_name='page')
-        workpiece_column_widths = {
-            'A': 15, 'B': 50, 'C': 35, 'D': 20, 'E': 8, 'F': 10, 'G': 12
-        }
-        for col_letter, width in workpiece_column_widths.items():
-            workpiece_ws.column_dimensions[col_letter].width = width
-        workpiece_ws.row_dimensions[1].height = 25
-        for row_num in range(2, len(df_workpiece_result) + 2):
-            workpiece_ws.row_dimensions[row_num].height = 20
-        
-        workpiece_wb['page'].sheet_state = 'hidden'
-        
-        # 保存到内存
-        workpiece_buffer = BytesIO()
-        workpiece_wb.save(workpiece_buffer)
-        workpiece_buffer.seek(0)
-
-        st.success("🎉 所有转换完成！")
-        return {
-            'order': {
-                'buffer': order_buffer,
-                'filename': f'订单录入结果_{timestamp}.xlsx',
-                'count': len(df_order_result)
-            },
-            'workpiece': {
-                'buffer': workpiece_buffer,
-                'filename': f'工件导入结果_{timestamp}.xlsx',
-                'count': len(df_workpiece_result)
-            }
+
+# 输出格式和结果拆分选项
+def output_options():
+    """显示输出格式和结果拆分选项，返回输出参数"""
+    from settings import CONSOLIDATE, PARTITION_ROWS, PARTITION_MODE, PARTITION_KEYS, PARTITION_KEY, PREFIX_LENGTH
+
+    # 显示名称 → (输出格式, 写入后端)
+    format_labels = {
+        "Excel（xlsx）": ("xlsx", None),
+        "Excel（填入益模导入模板）": ("xlsx", "template"),
+        "CSV（UTF-8-BOM）": ("csv", None),
+        "Parquet": ("parquet", None),
+    }
+    split_labels = {"拆分为多个文件": "files", "拆分为多个工作表": "sheets"}
+    with st.expander("输出设置（可选）", expanded=False):
+        format_label = st.radio(
+            "输出格式", list(format_labels), horizontal=True,
+            help="填入益模导入模板时保留模板的样式、数据验证和批注；"
+                 "CSV、Parquet只含数据表，不含益模导入所需的隐藏page表，适合数据仓库和脚本导入",
+        )
+        max_rows = st.number_input(
+            "每份最多工件行数", min_value=0, value=PARTITION_ROWS, step=10000,
+            help="0表示只在超过Excel行数上限时拆分；同一生产单号的订单和工件不会被拆开",
+        )
+        typed_cells = st.checkbox(
+            "日期写为Excel日期格式", value=False,
+            help="默认日期写为“YYYY-MM-DD”文本；勾选后写为可排序、可计算的Excel日期（显示格式相同），文件更小",
+        )
+        consolidate = st.checkbox(
+            "合并重复工件行", value=CONSOLIDATE,
+            help="生产任务号、件号、工件编码都相同的工件行合并为一行，数量相加；配件多的订单导入行数可大幅减少",
+        )
+        group_labels = {"不分组": "", **{f"按{name}": key for key, name in PARTITION_KEYS.items()}}
+        group_label = st.selectbox(
+            "按分组拆分", list(group_labels),
+            index=list(group_labels.values()).index(PARTITION_KEY) if PARTITION_KEY in group_labels.values() else 0,
+            help="每组生成一套订单录入、工件导入文件，打包为zip下载",
+        )
+        prefix_length = PREFIX_LENGTH
+        if group_labels[group_label] == "prefix":
+            prefix_length = st.number_input("生产单号前缀位数", min_value=1, value=PREFIX_LENGTH, step=1)
+        catalog_file = st.file_uploader(
+            "产品主数据（可选，xlsx/csv/parquet）", type=["xlsx", "csv", "parquet"],
+            help="按制品名称、部件名称补全项目编号和工件编码；需含制品名称、部件名称、项目编号、工件编码四列",
+        )
+        split_label = st.radio(
+            "拆分方式（导入模板、CSV、Parquet总是拆分为多个文件）", list(split_labels), horizontal=True,
+            index=list(split_labels.values()).index(PARTITION_MODE) if PARTITION_MODE in split_labels.values() else 0,
+        )
+    output_format, writer_name = format_labels[format_label]
+    catalog = None
+    if catalog_file is not None:
+        from catalog import load_catalog
+        try:
+            # 按内容哈希缓存，页面重新运行时不会重复读取
+            catalog = load_catalog(catalog_file.getvalue(), catalog_file.name)
+        except Exception as e:
+            st.error(f"产品主数据读取失败: {e}")
+    return {
+        'max_rows': int(max_rows),
+        'split_mode': split_labels[split_label],
+        'output_format': output_format,
+        'writer_name': writer_name,
+        'cell_type': "typed" if typed_cells else "text",
+        'partition_key': group_labels[group_label],
+        'prefix_length': int(prefix_length),
+        'consolidate': consolidate,
+        'catalog': catalog,
+    }
+
+
+def archive_parts(result, timestamp):
+    """把拆分后的各部分文件打包为zip"""
+    import zipfile
+    from partition import part_filename
+
+    buffer = BytesIO()
+    # xlsx、parquet本身已是压缩格式，直接存储即可；csv需要压缩
+    compression = zipfile.ZIP_DEFLATED if result['extension'] == 'csv' else zipfile.ZIP_STORED
+    with zipfile.ZipFile(buffer, "w", compression=compression) as zf:
+        for prefix, key in (('订单录入结果', 'order'), ('工件导入结果', 'workpiece')):
+            parts = result[key]['parts']
+            for index, part in enumerate(parts):
+                filename = part_filename(prefix, timestamp, index, len(parts), result['extension'],
+                                         result['labels'][index])
+                zf.writestr(filename, part)
+    return buffer.getvalue()
+
+
+# 后台转换任务
+def conversion_job(report, data, filter_args=None, output_args=None):
+    """单个文件的转换任务（在后台线程中执行）"""
+    from concurrent.futures import ThreadPoolExecutor
+    from partition import part_filename
+    from source_reader import make_row_filter
+    from pipeline import convert_source
+    from isolation import ISOLATE, run_isolated
+    from template_client import get_template_client
+    from writers import needs_hidden_template
+
+    row_filter = make_row_filter(**filter_args) if filter_args else None
+    output_args = output_args or {}
+    if ISOLATE:
+        # 隐藏表格在服务进程中通过共享客户端获取（复用连接池、熔断状态和预热结果），
+        # 与子进程启动同时进行，取到后经管道交给子进程
+        hidden_bytes = None
+        if needs_hidden_template(output_args.get('output_format', 'xlsx'), output_args.get('writer_name')):
+            fetcher = ThreadPoolExecutor(max_workers=1)
+            hidden_bytes = fetcher.submit(get_template_client().fetch)
+            fetcher.shutdown(wait=False)
+        # 在独立子进程中转换，结束后内存归还系统，超时或超出内存上限时只终止该子进程
+        result = run_isolated(convert_source, data, hidden_bytes, row_filter=row_filter, on_progress=report,
+                              **output_args)
+    else:
+        result = convert_source(data, row_filter=row_filter, on_progress=report, **output_args)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    archive = None
+    if result['split_mode'] == 'files':
+        archive = {'buffer': archive_parts(result, timestamp), 'filename': f'转换结果_{timestamp}.zip'}
+    return {
+        'rows': result['rows'],
+        'from_cache': result['from_cache'],
+        'template_origin': result['template_origin'],
+        'partitions': result['partitions'],
+        'partition_key': result['partition_key'],
+        'archive': archive,
+        'catalog_misses': result['catalog_misses'],
+        'mime': result['mime'],
+        'order': {
+            'buffer': result['order']['data'],
+            'filename': part_filename('订单录入结果', timestamp, 0, 1, result['extension'], result['labels'][0]),
+            'count': result['order']['count']
+        },
+        'workpiece': {
+            'buffer': result['workpiece']['data'],
+            'filename': part_filename('工件导入结果', timestamp, 0, 1, result['extension'], result['labels'][0]),
+            'count': result['workpiece']['count']
         }
+    }
 
-    except Exception as e:
-        st.error(f"转换过程中出现错误: {str(e)}")
-        st.text("详细错误信息:")
-        st.text(traceback.format_exc())
-        return None
+
+def batch_conversion_job(report, sources, filter_args=None, output_args=None):
+    """多个文件的批量转换任务（在后台线程中执行），结果打包为zip"""
+    from source_reader import make_row_filter
+    from batch import convert_batch
+    from template_client import get_template_client
+    from writers import needs_hidden_template
+
+    row_filter = make_row_filter(**filter_args) if filter_args else None
+    output_args = output_args or {}
+    hidden_bytes = template_origin = None
+    # csv、parquet和导入模板写入方式不需要隐藏表格
+    if needs_hidden_template(output_args.get('output_format', 'xlsx'), output_args.get('writer_name')):
+        report(0.0, "正在获取必要资源...")
+        hidden_bytes, template_origin = get_template_client().fetch()
+
+    def on_update(statuses):
+        done = sum(1 for s in statuses if s['状态'] in ('完成', '失败'))
+        report(done / len(statuses), f"已完成 {done}/{len(statuses)} 个文件", [dict(s) for s in statuses])
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    zip_path, statuses = convert_batch(
+        sources, hidden_bytes, row_filter, timestamp=timestamp, on_update=on_update, **output_args,
+    )
+    # 压缩包留在磁盘上供下载，任务过期时由任务管理器删除
+    return {
+        'path': zip_path,
+        'files': [zip_path],
+        'filename': f'转换结果_{timestamp}.zip',
+        'statuses': statuses,
+        'template_origin': template_origin,
+    }
+
+
+def count_job(report, sources, filter_args=None, consolidate=None):
+    """试运行任务：依次统计每个文件的订单数、工件数、配件数和数据问题；consolidate时工件数按合并后统计"""
+    from source_reader import make_row_filter
+    from pipeline import count_source
+
+    row_filter = make_row_filter(**filter_args) if filter_args else None
+    summaries = []
+    for index, (name, data) in enumerate(sources):
+        def on_progress(progress, message):
+            report((index + progress) / len(sources), f"{name}：{message}")
+
+        try:
+            counts = count_source(data, row_filter, on_progress, consolidate=consolidate)
+        except Exception as e:
+            counts = {'rows': 0, 'orders': 0, 'workpieces': 0, 'merged': 0, 'accessories': {},
+                      'errors': [{'问题': f"读取失败: {e}", '行数': 0, '示例生产单号': ''}]}
+        counts['file'] = name
+        summaries.append(counts)
+    return {'summaries': summaries}
+
+
+def submit_count(source_files, filter_args=None, output_args=None):
+    """把试运行提交到后台任务队列（转换选项中只有合并重复工件行影响统计结果）"""
+    from jobs import get_job_manager
+
+    sources = [(f.name, f.getvalue()) for f in source_files]
+    consolidate = (output_args or {}).get('consolidate')
+    job_id = get_job_manager().submit(count_job, sources, filter_args, consolidate, kind="count")
+    st.session_state.pop('conversion_results', None)
+    st.session_state.pop('batch_results', None)
+    st.session_state.pop('count_results', None)
+    st.session_state['job_id'] = job_id
+    st.query_params['job'] = job_id
+
+
+def show_counts(results):
+    """显示试运行的统计表和数据问题"""
+    st.subheader("🔢 试运行统计")
+    rows = []
+    for summary in results['summaries']:
+        row = {'文件': summary['file'], '源数据行数': summary['rows'],
+               '订单数': summary['orders'], '工件数': summary['workpieces']}
+        if summary.get('merged'):
+            row['合并的重复工件行'] = summary['merged']
+        row.update(summary['accessories'])
+        row['问题数'] = len(summary['errors'])
+        rows.append(row)
+    st.dataframe(rows, hide_index=True)
+    errors = [dict(error, 文件=summary['file']) for summary in results['summaries'] for error in summary['errors']]
+    if errors:
+        st.warning(f"⚠️ 发现 {len(errors)} 类数据问题，转换前请先修正")
+        st.dataframe(errors, hide_index=True)
+    else:
+        st.success("✅ 未发现数据问题")
+
+
+def submit_conversion(source_files, filter_args=None, output_args=None):
+    """把转换提交到后台任务队列，记录任务编号"""
+    from jobs import get_job_manager
+
+    manager = get_job_manager()
+    if len(source_files) > 1:
+        sources = [(f.name, f.getvalue()) for f in source_files]
+        job_id = manager.submit(batch_conversion_job, sources, filter_args, output_args, kind="batch")
+    else:
+        job_id = manager.submit(conversion_job, source_files[0].getvalue(), filter_args, output_args,
+                                kind="single")
+
+    st.session_state.pop('conversion_results', None)
+    st.session_state.pop('batch_results', None)
+    st.session_state.pop('count_results', None)
+    st.session_state['job_id'] = job_id
+    # 任务编号同时写入网址，刷新或重新打开页面后仍可取回结果
+    st.query_params['job'] = job_id
+
+
+def forget_job():
+    """清除当前任务编号"""
+    st.session_state.pop('job_id', None)
+    if 'job' in st.query_params:
+        del st.query_params['job']
+
+
+# 任务进度（独立片段：每隔JOB_POLL_INTERVAL秒只重新运行本片段，不占用脚本线程等待）
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def job_progress(job_id):
+    """显示进行中任务的进度；任务结束后重新运行页面，显示结果并停止轮询"""
+    from jobs import get_job_manager, ACTIVE_STATES
+
+    job = get_job_manager().get(job_id)
+    if job is None or job['status'] not in ACTIVE_STATES:
+        st.rerun()
+    st.progress(job['progress'], text=job['message'])
+    if job['detail']:
+        st.dataframe(job['detail'], hide_index=True)
+
+
+def show_job(job_id):
+    """显示后台任务进度（进行中时由job_progress片段轮询），任务结束后把结果放入session_state"""
+    from jobs import get_job_manager, ACTIVE_STATES
+
+    job = get_job_manager().get(job_id)
+    if job is not None and job['status'] in ACTIVE_STATES:
+        job_progress(job_id)
+        return
+
+    if job is None:
+        st.warning("转换任务已过期或不存在，请重新转换")
+        forget_job()
+        return
+
+    if job['status'] == 'failed':
+        st.error(f"转换过程中出现错误: {job['error']}")
+        with st.expander("详细错误信息", expanded=False):
+            st.text(job['detail'])
+        forget_job()
+        return
+
+    if st.session_state.get('loaded_job') == job_id:
+        return
+    st.session_state['loaded_job'] = job_id
+    results = job['result']
+    if results.get('template_origin') in ("cache", "bundled"):
+        st.warning("⚠️ GitHub暂时无法访问，已使用本地保存的隐藏表格")
+    if job['kind'] == 'count':
+        st.session_state['count_results'] = results
+        return
+    if job['kind'] == 'batch':
+        failed = sum(1 for s in results['statuses'] if s['状态'] == '失败')
+        if failed:
+            st.warning(f"⚠️ {failed} 个文件转换失败，详见状态表")
+        else:
+            st.success(f"🎉 {len(results['statuses'])} 个文件全部转换完成！")
+        st.session_state['batch_results'] = results
+    else:
+        cache_note = "，使用缓存" if results['from_cache'] else ""
+        st.success(f"转换完成！源文件共 {results['rows']} 行数据{cache_note}")
+        if results['partitions'] > 1 and results.get('partition_key'):
+            from partition import PARTITION_KEYS
+            st.info(f"结果按{PARTITION_KEYS[results['partition_key']]}分为 {results['partitions']} 组文件，"
+                    f"同一生产单号不会被拆开")
+        elif results['partitions'] > 1:
+            split_note = "个文件" if results['archive'] else "个工作表"
+            st.info(f"结果按生产单号拆分为 {results['partitions']} {split_note}，同一生产单号不会被拆开")
+        st.info(f"订单录入文件：{results['order']['filename']}，共 {results['order']['count']} 条记录")
+        st.info(f"工件导入文件：{results['workpiece']['filename']}，共 {results['workpiece']['count']} 条记录")
+        if results.get('catalog_misses'):
+            from catalog import describe_misses
+            summary = describe_misses(results['catalog_misses'])
+            if summary:
+                st.warning(f"⚠️ 产品主数据补全：{summary}，已保留原值，可下载未匹配清单补录")
+        st.session_state['conversion_results'] = results
+    warmup.mark("first_conversion")
 
 
 def main():
@@ -476,6 +611,9 @@ def main():
     load_css()
     print_banner()
     code_info()
+    warmup.mark("first_paint")
+    # 页面渲染完成后再开始预热（每个进程只启动一次），后台导入不与首次渲染争抢GIL
+    warmup.start_warmup()
 
 
 if __name__ == "__main__":
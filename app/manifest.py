@@ -0,0 +1,98 @@
+"""
+批量转换的检查点清单
+记录每个源文件的状态、内容哈希和结果路径，每处理完一个文件就原子地写回磁盘，
+中断（重启、内存不足、Ctrl-C）后可以据此跳过已完成且内容未变的文件继续转换
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+MANIFEST_NAME = "转换清单.json"
+MANIFEST_VERSION = 1
+
+STATUS_PENDING = "pending"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def file_sha256(path, block_size=1024 * 1024):
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path, data):
+    """先写临时文件并落盘，再改名覆盖，中途断电也不会留下半个文件"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class BatchManifest:
+    """
+    检查点清单：{源文件绝对路径: {status, sha256, outputs, orders, workpieces, seconds, error, finished}}
+    outputs为相对于结果目录的路径，options为本次批量转换的输出参数，继续转换时沿用
+    """
+
+    def __init__(self, path, options=None, entries=None):
+        self.path = path
+        self.options = options or {}
+        self.entries = entries or {}
+
+    @classmethod
+    def create(cls, out_dir, sources, options=None):
+        """为一组源文件新建清单（覆盖旧清单）"""
+        manifest = cls(os.path.join(out_dir, MANIFEST_NAME), options)
+        for source in sources:
+            manifest.entries[os.path.abspath(source)] = {'status': STATUS_PENDING, 'sha256': None, 'outputs': []}
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, out_dir):
+        """读取结果目录中的清单，不存在时抛出FileNotFoundError"""
+        path = os.path.join(out_dir, MANIFEST_NAME)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"不支持的清单版本: {data.get('version')}")
+        return cls(path, data.get('options'), data.get('entries'))
+
+    def save(self):
+        write_json_atomic(self.path, {
+            'version': MANIFEST_VERSION,
+            'updated': datetime.now().isoformat(timespec="seconds"),
+            'options': self.options,
+            'entries': self.entries,
+        })
+
+    def is_complete(self, source, sha256):
+        """已成功转换、内容未变且结果仍在时可以跳过"""
+        entry = self.entries.get(source)
+        if not entry or entry.get('status') != STATUS_DONE or entry.get('sha256') != sha256:
+            return False
+        out_dir = os.path.dirname(self.path)
+        return all(os.path.exists(os.path.join(out_dir, output)) for output in entry.get('outputs', []))
+
+    def record(self, source, **fields):
+        """更新一个源文件的记录并立即写回磁盘"""
+        entry = self.entries.setdefault(source, {'status': STATUS_PENDING, 'sha256': None, 'outputs': []})
+        entry.update(fields)
+        entry['finished'] = datetime.now().isoformat(timespec="seconds")
+        self.save()
+
+    def summary(self):
+        """各状态的文件数"""
+        counts = dict.fromkeys((STATUS_PENDING, STATUS_DONE, STATUS_FAILED), 0)
+        for entry in self.entries.values():
+            status = entry.get('status', STATUS_PENDING)
+            counts[status] = counts.get(status, 0) + 1
+        return counts
@@ -0,0 +1,136 @@
+"""
+订单总表解析结果缓存
+按上传文件内容的哈希缓存解析后的源列（Arrow IPC格式），
+同一文件再次转换时以内存映射方式读回，跳过xlsx解析；
+转换为DataFrame时仍会把数据复制一次（按列分块、不再合并，Arrow缓冲区随转换释放）
+"""
+
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+
+from sharded_reader import read_order_total_parallel
+from source_reader import apply_row_filter, project_columns, row_filter_key
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # 未安装pyarrow时缓存自动停用
+    pa = None
+    feather = None
+
+# 解析逻辑变化时递增，使旧缓存失效
+CACHE_VERSION = "1"
+CACHE_DIR = os.environ.get(
+    "YMDD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ymdd_parse_cache")
+)
+CACHE_MAX_BYTES = int(os.environ.get("YMDD_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+def cache_enabled():
+    """缓存是否可用"""
+    return pa is not None and CACHE_MAX_BYTES > 0
+
+
+def content_hash(data):
+    """计算文件内容哈希"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _read_bytes(source_file):
+    """读取上传文件或本地路径的全部内容"""
+    if isinstance(source_file, (str, os.PathLike)):
+        with open(source_file, "rb") as f:
+            return f.read()
+    if hasattr(source_file, "getvalue"):
+        return source_file.getvalue()
+    source_file.seek(0)
+    return source_file.read()
+
+
+def _entry_path(digest, row_filter):
+    """缓存条目的文件路径"""
+    filter_digest = hashlib.sha1(row_filter_key(row_filter).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CACHE_DIR, f"{digest}_{CACHE_VERSION}_{filter_digest}.arrow")
+
+
+def _load_entry(path):
+    """以内存映射方式读回缓存条目（按列分块转换为DataFrame，不合并成二维块），同时刷新其最近使用时间"""
+    if not os.path.exists(path):
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+        os.utime(path)
+    except (OSError, pa.ArrowInvalid):
+        return None
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def _store_entry(path, df):
+    """写入缓存条目（先写临时文件再原子替换），随后按容量上限淘汰"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(df, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError, pa.ArrowException):
+        # 混合类型等无法转为Arrow的列不缓存，不影响转换本身
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return
+    evict()
+
+
+def evict(max_bytes=None):
+    """按最近使用时间淘汰缓存条目，直到总大小不超过上限"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if not os.path.isdir(CACHE_DIR):
+        return
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        if not name.endswith(".arrow"):
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+def clear_cache():
+    """清空缓存目录"""
+    evict(max_bytes=0)
+
+
+def load_order_total(source_file, row_filter=None, workers=None):
+    """读取订单总表，优先使用缓存，返回(DataFrame, 是否命中缓存)"""
+    if not cache_enabled():
+        return project_columns(read_order_total_parallel(source_file, row_filter, workers=workers)), False
+
+    data = _read_bytes(source_file)
+    digest = content_hash(data)
+
+    # 先找同一筛选条件的缓存，再找整表缓存并在内存中筛选
+    df = _load_entry(_entry_path(digest, row_filter))
+    if df is not None:
+        return df, True
+    if row_filter:
+        df = _load_entry(_entry_path(digest, None))
+        if df is not None:
+            return apply_row_filter(df, row_filter), True
+
+    df = project_columns(read_order_total_parallel(BytesIO(data), row_filter, workers=workers))
+    _store_entry(_entry_path(digest, row_filter), df)
+    return df, False
@@ -0,0 +1,189 @@
+"""
+结果拆分
+工件数据超过Excel行数上限或设定的导入批量时，按生产单号整组拆分为多个文件或工作表，
+同一生产单号的订单和工件始终在同一部分中，各部分可分别并行导入；
+也可以按类型、交期所在周/月或生产单号前缀分组，每组一套文件；
+拆分为多个文件时各文件在进程池中并行写入
+"""
+
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+
+import pandas as pd
+
+from settings import (PARTITION_KEY, PARTITION_KEYS, PARTITION_MODE, PARTITION_MODES, PARTITION_ROWS,
+                      PREFIX_LENGTH)
+
+# Excel单个工作表的最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+MAX_DATA_ROWS = EXCEL_MAX_ROWS - 1
+# 分组值为空时的组名
+UNGROUPED_LABEL = "未分组"
+# 并行写入拆分文件的进程数上限
+WRITE_WORKERS = int(os.environ.get("YMDD_WRITE_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def row_cap(max_rows=None):
+    """每部分实际允许的最多数据行数"""
+    max_rows = PARTITION_ROWS if max_rows is None else max_rows
+    return min(max_rows, MAX_DATA_ROWS) if max_rows and max_rows > 0 else MAX_DATA_ROWS
+
+
+def assign_partitions(order_numbers, max_rows=None):
+    """
+    按生产单号首次出现的顺序把各组工件依次装入各部分，返回{生产单号: 部分序号}
+    一个部分装不下下一组时开新的部分；单个生产单号超过Excel上限时无法拆分，抛出ValueError
+    """
+    cap = row_cap(max_rows)
+    sizes = order_numbers.groupby(order_numbers, sort=False).size()
+    assignment = {}
+    part, used = 0, 0
+    for order_number, size in sizes.items():
+        if size > MAX_DATA_ROWS:
+            raise ValueError(f"生产单号 {order_number} 有 {size} 行工件，超过Excel单表上限，无法拆分")
+        if used and used + size > cap:
+            part, used = part + 1, 0
+        assignment[order_number] = part
+        used += size
+    return assignment
+
+
+def split_frames(df_order, df_workpiece, max_rows=None):
+    """按生产单号整组拆分订单和工件数据，返回[(订单部分, 工件部分)]，不需要拆分时只有一项"""
+    cap = row_cap(max_rows)
+    if len(df_workpiece) <= cap:
+        return [(df_order, df_workpiece)]
+
+    assignment = assign_partitions(df_workpiece['生产单号'], max_rows)
+    workpiece_parts = df_workpiece['生产单号'].map(assignment)
+    order_parts = df_order['模具编号'].map(assignment)
+    parts = []
+    for index in range(max(assignment.values()) + 1):
+        parts.append((
+            df_order[order_parts == index].reset_index(drop=True),
+            df_workpiece[workpiece_parts == index].reset_index(drop=True),
+        ))
+    return parts
+
+
+def order_group_labels(df_order, key, prefix_length=None):
+    """每个订单所属分组的名称（按订单录入数据计算，与工件数据通过生产单号对应）"""
+    if key == 'type':
+        labels = df_order['模具类型'].astype(str).str.strip()
+    elif key in ('week', 'month'):
+        dates = pd.to_datetime(df_order['预估交货期'], errors='coerce')
+        if key == 'week':
+            iso = dates.dt.isocalendar()
+            labels = iso['year'].astype(str) + "-W" + iso['week'].astype(str).str.zfill(2)
+        else:
+            labels = dates.dt.strftime('%Y-%m')
+        labels = labels.where(dates.notna())
+    elif key == 'prefix':
+        labels = df_order['模具编号'].astype(str).str.strip().str[:prefix_length or PREFIX_LENGTH]
+    else:
+        raise ValueError(f"未知的分组方式: {key}，可选: {', '.join(PARTITION_KEYS)}")
+    return labels.replace({"": None, "nan": None}).fillna(UNGROUPED_LABEL).astype(str)
+
+
+def group_frames(df_order, df_workpiece, key, prefix_length=None):
+    """
+    按分组键把订单和工件数据各做一次分组（不逐组重复筛选），返回[(组名, 订单部分, 工件部分)]，按组名排序
+    组内保持原有顺序，工件按生产单号归入其订单所在的组
+    """
+    labels = order_group_labels(df_order, key, prefix_length)
+    order_to_label = dict(zip(df_order['模具编号'].astype(str), labels))
+    workpiece_labels = df_workpiece['生产单号'].astype(str).map(order_to_label).fillna(UNGROUPED_LABEL)
+
+    order_groups = {label: part.reset_index(drop=True)
+                    for label, part in df_order.groupby(labels.to_numpy(), sort=True)}
+    workpiece_groups = {label: part.reset_index(drop=True)
+                        for label, part in df_workpiece.groupby(workpiece_labels.to_numpy(), sort=True)}
+    return [
+        (label, order_groups.get(label, df_order.iloc[:0]), workpiece_groups.get(label, df_workpiece.iloc[:0]))
+        for label in sorted(set(order_groups) | set(workpiece_groups))
+    ]
+
+
+def plan_parts(df_order, df_workpiece, max_rows=None, key=None, prefix_length=None):
+    """
+    确定结果如何拆分，返回([(订单部分, 工件部分)], [各部分的组名])
+    不分组时组名均为None；分组时每组再按行数上限拆分，组名后加序号
+    """
+    if not key:
+        parts = split_frames(df_order, df_workpiece, max_rows)
+        return parts, [None] * len(parts)
+
+    parts, labels = [], []
+    for label, order_part, workpiece_part in group_frames(df_order, df_workpiece, key, prefix_length):
+        sub_parts = split_frames(order_part, workpiece_part, max_rows)
+        parts.extend(sub_parts)
+        if len(sub_parts) == 1:
+            labels.append(label)
+        else:
+            labels.extend(f"{label}_{index + 1:02d}" for index in range(len(sub_parts)))
+    return parts, labels
+
+
+def _safe_label(label):
+    """组名中不能用于文件名的字符替换为下划线"""
+    return re.sub(r'[\\/:*?"<>|\s]+', "_", str(label)).strip("_") or UNGROUPED_LABEL
+
+
+def part_filename(prefix, timestamp, index, total, extension="xlsx", label=None):
+    """拆分后各部分的文件名，不拆分时与原文件名相同；分组时文件名中带组名"""
+    if label is not None:
+        return f"{prefix}_{_safe_label(label)}_{timestamp}.{extension}"
+    if total <= 1:
+        return f"{prefix}_{timestamp}.{extension}"
+    return f"{prefix}_{timestamp}_{index + 1:02d}.{extension}"
+
+
+def part_sheet_names(base_name, total):
+    """拆分为多个工作表时各表的名称，不拆分时与原表名相同"""
+    if total <= 1:
+        return [base_name]
+    return [f"{base_name}_{index + 1}" for index in range(total)]
+
+
+def _write_part(df_order, df_workpiece, hidden_bytes, writer_name):
+    """在工作进程中写入一个部分的订单录入、工件导入文件，返回两个文件的内容"""
+    from openpyxl import load_workbook
+    from writers import get_writer
+
+    hidden_wb = load_workbook(BytesIO(hidden_bytes), data_only=True) if hidden_bytes else None
+    writer = get_writer(hidden_wb, writer_name)
+    order_buffer = writer.write_order(df_order, hidden_wb, BytesIO())
+    workpiece_buffer = writer.write_workpiece(df_workpiece, hidden_wb, BytesIO())
+    return order_buffer.getvalue(), workpiece_buffer.getvalue()
+
+
+def write_partitions(parts, hidden_bytes, writer_name, workers=None, on_part=None):
+    """
+    并行写入各部分，按原顺序返回[(订单录入文件内容, 工件导入文件内容)]
+    on_part(已完成部分数, 总部分数)在每个部分写完时回调
+    """
+    workers = max(1, min(workers or WRITE_WORKERS, len(parts)))
+    results = [None] * len(parts)
+    if workers == 1:
+        for index, (df_order, df_workpiece) in enumerate(parts):
+            results[index] = _write_part(df_order, df_workpiece, hidden_bytes, writer_name)
+            if on_part:
+                on_part(index + 1, len(parts))
+        return results
+
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        futures = {
+            pool.submit(_write_part, df_order, df_workpiece, hidden_bytes, writer_name): index
+            for index, (df_order, df_workpiece) in enumerate(parts)
+        }
+        done = 0
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            done += 1
+            if on_part:
+                on_part(done, len(parts))
+    return results
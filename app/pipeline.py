@@ -0,0 +1,160 @@
+"""
+单个订单总表的完整转换流程（不涉及界面）
+读取 → 生成订单/工件数据 → 写入两个工作簿，各阶段通过on_progress回调汇报进度，
+供后台任务、批量转换等调用
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from catalog import enrich_frames, resolve_catalog
+from converter import build_order_frame, build_workpiece_frame, count_conversion
+from parse_cache import load_order_total
+from partition import PARTITION_KEY, PARTITION_KEYS, PARTITION_MODE, plan_parts, write_partitions
+from progress import ProgressTracker, format_progress
+from writers import OUTPUT_FORMATS, get_writer, needs_hidden_template
+
+
+def _load_template(hidden_bytes=None):
+    """
+    获取并解析隐藏表格，返回(字节内容, 工作簿, 来源)
+    hidden_bytes为字节内容、None（通过共享客户端下载）或返回(字节内容, 来源)的函数
+    """
+    origin = "provided"
+    if hidden_bytes is None:
+        from template_client import get_template_client
+        hidden_bytes = get_template_client().fetch
+    if callable(hidden_bytes):
+        hidden_bytes, origin = hidden_bytes()
+    return hidden_bytes, load_workbook(BytesIO(hidden_bytes), data_only=True), origin
+
+
+def count_source(data, row_filter=None, on_progress=None, workers=None, consolidate=None):
+    """
+    试运行：只读取订单总表并统计订单数、工件数、各配件数和数据问题，不生成也不写入结果文件
+    consolidate时工件数为合并重复工件行后的行数（与convert_source相同，默认取YMDD_CONSOLIDATE）
+    """
+    if on_progress:
+        on_progress(0.0, "正在读取订单数据...")
+    df_source, from_cache = load_order_total(BytesIO(data), row_filter, workers=workers)
+    if on_progress:
+        on_progress(0.9, f"正在统计（共 {len(df_source)} 行）...")
+    counts = count_conversion(df_source, consolidate)
+    counts['from_cache'] = from_cache
+    if on_progress:
+        on_progress(1.0, "统计完成")
+    return counts
+
+
+def convert_source(data, hidden_bytes=None, row_filter=None, on_progress=None, workers=None,
+                   chunk_rows=None, max_rows=None, split_mode=None, write_workers=None,
+                   output_format="xlsx", writer_name=None, cell_type=None, partition_key=None,
+                   prefix_length=None, consolidate=None, catalog=None):
+    """
+    转换一个订单总表，返回两个结果文件的内容和记录数
+    output_format为xlsx、csv或parquet，writer_name为xlsx的写入后端（默认取YMDD_WRITER），
+    cell_type为日期写成文本（text）还是Excel日期（typed，默认取YMDD_CELL_TYPES）；
+    consolidate时合并重复的工件行（默认取YMDD_CONSOLIDATE）；
+    catalog为产品主数据（文件路径或CatalogIndex，默认取YMDD_CATALOG），指定时补全项目编号和工件编码，
+    查不到的键汇总在catalog_misses中；
+    需要隐藏表格时在后台线程中下载（未提供hidden_bytes时）并解析，与读取、转换并行，
+    hidden_bytes也可以是返回(字节内容, 来源)的函数（如TemplateClient.fetch），同样在后台线程中调用；
+    转换和写入按chunk_rows行分块，每块汇报一次行数、速度和预计剩余时间；
+    工件行数超过max_rows（或Excel上限）时按生产单号拆分，parts中为各部分的文件内容；
+    partition_key（见PARTITION_KEYS，默认取YMDD_PARTITION_KEY）指定时按类型、交期周/月或生产单号前缀
+    分组，每组一套文件并行写入，labels中为各部分的组名
+    """
+    def report(progress, message):
+        if on_progress:
+            on_progress(progress, message)
+
+    def stage(name, total, begin, end):
+        """返回某个分块阶段的on_chunk回调，阶段进度映射到总进度的[begin, end]区间"""
+        def on_event(event):
+            report(begin + (end - begin) * event['fraction'], format_progress(event))
+        return ProgressTracker(name, total, on_event).advance
+
+    partition_key = PARTITION_KEY if partition_key is None else partition_key
+    if partition_key and partition_key not in PARTITION_KEYS:
+        raise ValueError(f"未知的分组方式: {partition_key}，可选: {', '.join(PARTITION_KEYS)}")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {output_format}，可选: {', '.join(OUTPUT_FORMATS)}")
+    needs_template = needs_hidden_template(output_format, writer_name)
+    catalog = resolve_catalog(catalog)
+
+    # 隐藏表格的下载（未提供时）和解析都在后台线程中进行，与读取、转换并行，写入前才等待
+    template_future = None
+    if needs_template:
+        template_pool = ThreadPoolExecutor(max_workers=1)
+        template_future = template_pool.submit(_load_template, hidden_bytes)
+        template_pool.shutdown(wait=False)
+
+    report(0.0, "正在读取订单数据...")
+    df_source, from_cache = load_order_total(BytesIO(data), row_filter, workers=workers)
+    if df_source.empty:
+        raise ValueError("筛选范围内没有订单数据，请调整筛选条件")
+
+    rows = len(df_source)
+    report(0.3, f"正在处理订单数据（共 {rows} 行）...")
+    df_order_result = build_order_frame(
+        df_source, chunk_rows, stage("正在处理订单数据", df_source['生产单号'].nunique(dropna=False), 0.3, 0.4),
+        cell_type)
+    df_workpiece_result = build_workpiece_frame(
+        df_source, chunk_rows, stage("正在生成工件数据", rows, 0.4, 0.6), consolidate)
+    catalog_misses = None
+    if catalog is not None:
+        report(0.6, "正在按产品主数据补全编码...")
+        df_order_result, df_workpiece_result, catalog_misses = enrich_frames(
+            df_order_result, df_workpiece_result, catalog)
+
+    # csv、parquet直接由数据表写出，template后端使用自带的导入模板，都不需要隐藏表格
+    hidden_wb = template_origin = None
+    if template_future is not None:
+        report(0.6, "正在获取必要资源...")
+        hidden_bytes, hidden_wb, template_origin = template_future.result()
+    writer = get_writer(hidden_wb, writer_name, output_format)
+    parts, labels = plan_parts(df_order_result, df_workpiece_result, max_rows, partition_key, prefix_length)
+    # 分组时每组一套文件；不能写多个工作表的写入方式拆分时也总是拆分为多个文件
+    split_mode = (split_mode or PARTITION_MODE) if writer.supports_sheets and not partition_key else "files"
+    if len(parts) > 1 and split_mode == "files":
+        # 各部分分别写成独立文件，在进程池中并行写入
+        def on_part(done, total):
+            report(0.6 + 0.35 * done / total, f"正在写入拆分文件 {done}/{total}")
+
+        report(0.6, f"结果拆分为 {len(parts)} 组文件，正在写入...")
+        written = write_partitions(parts, hidden_bytes if needs_template else None, writer.name,
+                                   write_workers, on_part)
+        order_parts = [order_data for order_data, _ in written]
+        workpiece_parts = [workpiece_data for _, workpiece_data in written]
+    else:
+        # 不拆分，或拆分为同一文件中的多个工作表
+        order_frames = [order for order, _ in parts] if len(parts) > 1 else df_order_result
+        workpiece_frames = [workpiece for _, workpiece in parts] if len(parts) > 1 else df_workpiece_result
+        order_buffer = writer.write_order(
+            order_frames, hidden_wb, BytesIO(), chunk_rows,
+            stage("正在写入订单录入文件", len(df_order_result), 0.6, 0.7))
+        workpiece_buffer = writer.write_workpiece(
+            workpiece_frames, hidden_wb, BytesIO(), chunk_rows,
+            stage("正在写入工件导入文件", len(df_workpiece_result), 0.7, 0.95))
+        order_parts = [order_buffer.getvalue()]
+        workpiece_parts = [workpiece_buffer.getvalue()]
+    report(1.0, "转换完成")
+
+    return {
+        'rows': rows,
+        'from_cache': from_cache,
+        'template_origin': template_origin,
+        'writer': writer.name,
+        'format': output_format,
+        'extension': writer.extension,
+        'mime': writer.mime,
+        'partitions': len(parts),
+        'split_mode': split_mode if len(parts) > 1 else None,
+        'partition_key': partition_key or None,
+        'labels': labels,
+        'catalog_misses': catalog_misses,
+        'order': {'data': order_parts[0], 'parts': order_parts, 'count': len(df_order_result)},
+        'workpiece': {'data': workpiece_parts[0], 'parts': workpiece_parts, 'count': len(df_workpiece_result)},
+    }
@@ -0,0 +1,75 @@
+"""
+分块处理的进度汇报
+转换和写入按固定行数分块进行，每处理完一块汇报一次已处理行数、速度和预计剩余时间，
+网页版显示在进度条上，exe显示为控制台进度行
+"""
+
+import os
+import sys
+import time
+
+# 每块处理的行数：越小进度越及时，越大额外开销越少
+CHUNK_ROWS = int(os.environ.get("YMDD_CHUNK_ROWS", 2000))
+
+
+def chunk_bounds(total, chunk_rows=None):
+    """按块大小切分[0, total)，返回[(起始, 结束)]"""
+    size = max(1, int(chunk_rows or CHUNK_ROWS))
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def format_seconds(seconds):
+    """把秒数格式化为“1分05秒”或“12秒”"""
+    seconds = int(round(seconds))
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60:02d}秒"
+    return f"{seconds}秒"
+
+
+def format_progress(event):
+    """把进度事件格式化为一行说明文字"""
+    text = f"{event['stage']} {event['done']}/{event['total']} 行"
+    if event['rate']:
+        text += f"，{event['rate']:.0f} 行/秒"
+    if event['eta'] is not None and event['done'] < event['total']:
+        text += f"，预计剩余 {format_seconds(event['eta'])}"
+    return text
+
+
+class ProgressTracker:
+    """记录一个阶段的分块进度，每块结束时回调on_event(进度事件)"""
+
+    def __init__(self, stage, total, on_event=None):
+        self.stage = stage
+        self.total = total
+        self.on_event = on_event
+        self.done = 0
+        self.started = time.perf_counter()
+
+    def advance(self, rows):
+        """登记新处理完的行数并汇报"""
+        self.done = min(self.total, self.done + rows)
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        event = {
+            'stage': self.stage,
+            'done': self.done,
+            'total': self.total,
+            'fraction': self.done / self.total if self.total else 1.0,
+            'rate': rate,
+            'eta': (self.total - self.done) / rate if rate else None,
+            'elapsed': elapsed,
+        }
+        if self.on_event:
+            self.on_event(event)
+        return event
+
+
+def console_progress(event, width=30, stream=None):
+    """在控制台同一行刷新进度条，阶段完成时换行"""
+    stream = stream or sys.stdout
+    filled = int(width * event['fraction'])
+    bar = "█" * filled + "░" * (width - filled)
+    end = "\n" if event['done'] >= event['total'] else ""
+    stream.write(f"\r   [{bar}] {format_progress(event)}    {end}")
+    stream.flush()
@@ -0,0 +1,20 @@
+"""
+带预热的Streamlit启动入口
+用法: python app/run_server.py [streamlit run 的其他参数]
+在Streamlit服务启动的同时开始后台预热，第一个访问者不必再等待模块导入和隐藏表格下载
+"""
+
+import os
+import sys
+
+from streamlit.web import cli
+
+from warmup import start_warmup
+
+MAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+
+
+if __name__ == "__main__":
+    start_warmup()
+    sys.argv = ["streamlit", "run", MAIN_SCRIPT, *sys.argv[1:]]
+    sys.exit(cli.main())
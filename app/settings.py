@@ -0,0 +1,24 @@
+"""
+转换选项的默认值（取自环境变量）
+不导入pandas、openpyxl等重量级模块，网页首次渲染时读取选项默认值不必等待它们加载
+"""
+
+import os
+
+# 合并重复工件行：同一生产任务号下件号、工件编码都相同的行合并为一行，数量相加（1开启，默认不合并）
+CONSOLIDATE = os.environ.get("YMDD_CONSOLIDATE", "0") == "1"
+# 每部分最多的工件行数（导入批量），0表示只在超过Excel上限时拆分
+PARTITION_ROWS = int(os.environ.get("YMDD_PARTITION_ROWS", 0))
+# 拆分方式：files 拆分为多个文件，sheets 拆分为同一文件中的多个工作表
+PARTITION_MODES = ("files", "sheets")
+PARTITION_MODE = os.environ.get("YMDD_PARTITION_MODE", "files")
+# 分组方式：type 模具类型，week/month 预估交货期所在周/月，prefix 生产单号前缀；空表示不分组
+PARTITION_KEYS = {
+    'type': '类型',
+    'week': '交期周',
+    'month': '交期月',
+    'prefix': '生产单号前缀',
+}
+PARTITION_KEY = os.environ.get("YMDD_PARTITION_KEY", "")
+# 按生产单号前缀分组时取前几位
+PREFIX_LENGTH = int(os.environ.get("YMDD_PARTITION_PREFIX", 2))
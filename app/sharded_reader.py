@@ -0,0 +1,211 @@
+"""
+何氏订单总表并行分片读取
+先把工作表XML解压到临时文件并扫描行边界，按字节切成若干分片，
+由多个进程共享同一份共享字符串表并行解析，最后按原始行顺序合并
+"""
+
+import mmap
+import multiprocessing
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from xml.etree.ElementTree import fromstring
+
+import pandas as pd
+from openpyxl.reader.strings import read_string_table
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900
+from openpyxl.worksheet._reader import WorkSheetParser
+
+from source_reader import build_row_predicate, header_names, is_blank_row, read_order_total
+
+# 工作表XML小于该大小时直接单线程流式读取，多进程的启动开销不划算
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+# 每个工作进程分到的分片数，分片略多于进程数可以平衡各分片的解析耗时
+SHARDS_PER_WORKER = 2
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+ROW_START_RE = re.compile(rb"<(?:\w+:)?row[\s>]")
+WORKSHEET_RE = re.compile(rb"<((?:\w+:)?)worksheet\b[^>]*>")
+SHEET_DATA_RE = re.compile(rb"<(?:\w+:)?sheetData\b[^>]*?(/?)>")
+SHEET_DATA_END_RE = re.compile(rb"</(?:\w+:)?sheetData>")
+
+# 工作进程内共享的解析上下文，由进程池初始化函数设置
+_worker_context = {}
+
+
+def _first_sheet_path(zf):
+    """根据workbook.xml及其关系文件找到第一个工作表在压缩包中的路径"""
+    workbook = fromstring(zf.read("xl/workbook.xml"))
+    sheet = workbook.find(f"{{{MAIN_NS}}}sheets/{{{MAIN_NS}}}sheet")
+    if sheet is None:
+        raise ValueError("源文件中没有工作表")
+    rel_id = sheet.get(f"{{{REL_NS}}}id")
+
+    rels = fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    for rel in rels.iter(f"{{{PKG_REL_NS}}}Relationship"):
+        if rel.get("Id") == rel_id:
+            target = rel.get("Target")
+            if target.startswith("/"):
+                return target.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", target))
+    raise ValueError(f"找不到工作表关系: {rel_id}")
+
+
+def _workbook_epoch(zf):
+    """读取工作簿的日期基准（1900或1904）"""
+    workbook = fromstring(zf.read("xl/workbook.xml"))
+    props = workbook.find(f"{{{MAIN_NS}}}workbookPr")
+    if props is not None and props.get("date1904") in ("1", "true"):
+        return CALENDAR_MAC_1904
+    return CALENDAR_WINDOWS_1900
+
+
+def _read_date_styles(zf):
+    """读取样式表中属于日期/时长格式的样式序号"""
+    if "xl/styles.xml" not in zf.namelist():
+        return set(), set()
+    stylesheet = Stylesheet.from_tree(fromstring(zf.read("xl/styles.xml")))
+    return stylesheet.date_formats, stylesheet.timedelta_formats
+
+
+def _read_shared_strings(zf):
+    """读取共享字符串表"""
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    with zf.open("xl/sharedStrings.xml") as f:
+        return read_string_table(f)
+
+
+def _init_worker(context):
+    """工作进程初始化：保存共享字符串表等解析上下文"""
+    _worker_context.clear()
+    _worker_context.update(context)
+
+
+def _parse_rows(xml_bytes, context):
+    """用openpyxl的工作表解析器解析一段<row>片段，产出按列展开的行"""
+    src = BytesIO(context["ws_open"] + xml_bytes + context["ws_close"])
+    parser = WorkSheetParser(
+        src,
+        context["shared_strings"],
+        data_only=True,
+        epoch=context["epoch"],
+        date_formats=context["date_formats"],
+        timedelta_formats=context["timedelta_formats"],
+    )
+    for _, cells in parser.parse():
+        values = {}
+        for cell in cells:
+            values[cell["column"]] = cell["value"]
+        width = context.get("width") or (max(values) if values else 0)
+        yield tuple(values.get(col) for col in range(1, width + 1))
+
+
+def _parse_shard(task):
+    """在工作进程中解析一个分片，返回通过筛选的数据行"""
+    path, start, end = task
+    context = _worker_context
+    with open(path, "rb") as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+
+    predicate = build_row_predicate(context["columns"], context["row_filter"])
+    rows = []
+    for row in _parse_rows(chunk, context):
+        if is_blank_row(row):
+            continue
+        if predicate is None or predicate(row):
+            rows.append(row)
+    return rows
+
+
+def _shard_bounds(mm, data_start, data_end, shard_count):
+    """在行边界处把sheetData切成若干字节区间"""
+    bounds = [data_start]
+    step = (data_end - data_start) // shard_count
+    for k in range(1, shard_count):
+        match = ROW_START_RE.search(mm, max(data_start + k * step, bounds[-1] + 1), data_end)
+        if match is None:
+            break
+        if match.start() > bounds[-1]:
+            bounds.append(match.start())
+    bounds.append(data_end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def read_order_total_parallel(source_file, row_filter=None, workers=None,
+                              min_bytes=PARALLEL_MIN_BYTES):
+    """并行读取订单总表，工作表较小时退回单线程流式读取"""
+    workers = workers or os.cpu_count() or 1
+    if hasattr(source_file, "seek"):
+        source_file.seek(0)
+
+    with zipfile.ZipFile(source_file) as zf:
+        sheet_path = _first_sheet_path(zf)
+        sheet_size = zf.getinfo(sheet_path).file_size
+        if workers <= 1 or sheet_size < min_bytes:
+            if hasattr(source_file, "seek"):
+                source_file.seek(0)
+            return read_order_total(source_file, row_filter)
+
+        context = {
+            "shared_strings": _read_shared_strings(zf),
+            "epoch": _workbook_epoch(zf),
+        }
+        context["date_formats"], context["timedelta_formats"] = _read_date_styles(zf)
+
+        tmp = tempfile.NamedTemporaryFile(suffix=".xml", delete=False)
+        try:
+            with tmp, zf.open(sheet_path) as src:
+                shutil.copyfileobj(src, tmp, 1024 * 1024)
+            return _parse_sheet_file(tmp.name, context, row_filter, workers)
+        finally:
+            os.unlink(tmp.name)
+
+
+def _parse_sheet_file(path, context, row_filter, workers):
+    """扫描解压后的工作表XML，分片并行解析后合并为DataFrame"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        ws_match = WORKSHEET_RE.search(mm)
+        data_match = SHEET_DATA_RE.search(mm)
+        if ws_match is None or data_match is None or data_match.group(1) == b"/":
+            return pd.DataFrame()
+        context["ws_open"] = ws_match.group(0)
+        context["ws_close"] = b"</" + ws_match.group(1) + b"worksheet>"
+
+        data_end = SHEET_DATA_END_RE.search(mm, data_match.end()).start()
+        first = ROW_START_RE.search(mm, data_match.end(), data_end)
+        if first is None:
+            return pd.DataFrame()
+        second = ROW_START_RE.search(mm, first.end(), data_end)
+        header_end = second.start() if second else data_end
+
+        # 表头单独在主进程解析，得到列名后分发给各工作进程
+        header = next(_parse_rows(mm[first.start():header_end], context), ())
+        columns = header_names(header)
+        if header_end >= data_end:
+            return pd.DataFrame(columns=columns)
+
+        bounds = _shard_bounds(mm, header_end, data_end, workers * SHARDS_PER_WORKER)
+
+    context.update({"columns": columns, "width": len(columns), "row_filter": row_filter})
+    tasks = [(path, start, end) for start, end in bounds]
+    # 统一使用spawn，避免在Streamlit等多线程进程中fork
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=mp_context,
+                             initializer=_init_worker, initargs=(context,)) as pool:
+        rows = []
+        for shard_rows in pool.map(_parse_shard, tasks):
+            rows.extend(shard_rows)
+
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    return df.infer_objects()
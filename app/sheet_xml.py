@@ -0,0 +1,263 @@
+"""
+直接读写xlsx包中的工作表XML
+不经过openpyxl的对象模型：找到数据表对应的XML成员，按行生成<row>元素直接写出，
+包中其余成员（样式、数据验证、批注、隐藏表等）原样复制
+"""
+
+import posixpath
+import re
+import struct
+import zipfile
+from copy import copy
+from datetime import date, datetime
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+from openpyxl.utils import get_column_letter
+
+_ROW_RE = re.compile(rb'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELL_RE = re.compile(rb'<c\b[^>]*?\br="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', re.S)
+_STYLE_RE = re.compile(rb'\bs="(\d+)"')
+_DIMENSION_RE = re.compile(rb'<dimension ref="[^"]*"\s*/>')
+_DIMENSION_REF_RE = re.compile(rb'<dimension ref="[A-Z]*\d*:?([A-Z]+)(\d+)"')
+_SHARED_STRING_RE = re.compile(rb"<si>(.*?)</si>", re.S)
+_TEXT_RE = re.compile(rb"<t\b[^>]*>(.*?)</t>", re.S)
+_VALUE_RE = re.compile(rb"<v>(.*?)</v>", re.S)
+# Excel日期序列号的起点（1900日期系统）
+EXCEL_EPOCH = datetime(1899, 12, 30)
+# zip本地文件头（签名、版本、标志、压缩方式、时间、日期、CRC、压缩后大小、原大小、文件名长度、扩展字段长度）
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_DATA_DESCRIPTOR_FLAG = 0x08
+_ZIP64_EXTRA_ID = 0x0001
+# XML 1.0不允许的控制字符
+_ILLEGAL_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def sheet_paths(zf):
+    """返回{工作表名: 包内XML路径}，顺序与工作簿中的工作表顺序一致"""
+    workbook_xml = zf.read("xl/workbook.xml").decode("utf-8")
+    rels_xml = zf.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+    targets = {}
+    for rel in re.finditer(r"<Relationship\b[^>]*>", rels_xml):
+        rel_id = re.search(r'\bId="([^"]+)"', rel.group(0))
+        target = re.search(r'\bTarget="([^"]+)"', rel.group(0))
+        if rel_id and target:
+            path = target.group(1)
+            path = path.lstrip("/") if path.startswith("/") else posixpath.normpath(posixpath.join("xl", path))
+            targets[rel_id.group(1)] = path
+    sheets = {}
+    for sheet in re.finditer(r"<sheet\b[^>]*>", workbook_xml):
+        name = re.search(r'\bname="([^"]+)"', sheet.group(0))
+        rel_id = re.search(r'\br:id="([^"]+)"', sheet.group(0))
+        if name and rel_id and rel_id.group(1) in targets:
+            sheets[_unescape(name.group(1))] = targets[rel_id.group(1)]
+    return sheets
+
+
+def _unescape(text):
+    return (text.replace("&lt;", "<").replace("&gt;", ">").replace("&quot;", '"')
+            .replace("&apos;", "'").replace("&amp;", "&"))
+
+
+def split_sheet(xml):
+    """
+    把工作表XML拆为(sheetData之前的部分, [(行号, 行XML)], sheetData之后的部分)
+    sheetData为空元素时行列表为空
+    """
+    empty = re.search(rb"<sheetData\s*/>", xml)
+    if empty:
+        return xml[:empty.start()], [], xml[empty.end():]
+    start = xml.index(b"<sheetData")
+    body_start = xml.index(b">", start) + 1
+    body_end = xml.index(b"</sheetData>", body_start)
+    rows = [(int(m.group(1)), m.group(0)) for m in _ROW_RE.finditer(xml, body_start, body_end)]
+    return xml[:start], rows, xml[body_end + len(b"</sheetData>"):]
+
+
+def row_cell_styles(row_xml):
+    """返回某一行各列单元格的样式编号{列字母: s}"""
+    styles = {}
+    for cell in _CELL_RE.finditer(row_xml):
+        style = _STYLE_RE.search(cell.group(0).split(b">", 1)[0])
+        if style:
+            styles[cell.group(1).decode("ascii")] = style.group(1).decode("ascii")
+    return styles
+
+
+def set_dimension(head, ref):
+    """更新或插入<dimension>，使其覆盖写入后的数据区域"""
+    dimension = f'<dimension ref="{ref}"/>'.encode("utf-8")
+    if _DIMENSION_RE.search(head):
+        return _DIMENSION_RE.sub(dimension, head, count=1)
+    sheet_pr_end = re.search(rb"<sheetPr\b[^>]*?(?:/>|>.*?</sheetPr>)", head, re.S)
+    if sheet_pr_end:
+        return head[:sheet_pr_end.end()] + dimension + head[sheet_pr_end.end():]
+    worksheet = re.search(rb"<worksheet\b[^>]*>", head)
+    return head[:worksheet.end()] + dimension + head[worksheet.end():]
+
+
+def cell_xml(ref, value, style=None):
+    """生成一个单元格的XML，字符串以内联字符串写入，不改动共享字符串表"""
+    style_attr = f' s="{style}"' if style is not None else ""
+    if value is None or value != value:  # 空值、NaN、NaT
+        return f'<c r="{ref}"{style_attr}/>' if style is not None else ""
+    if isinstance(value, bool) or type(value).__name__ == "bool_":
+        return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, date):
+        # 日期写为序列号，显示格式由样式决定（模板中日期列的样式已是日期格式）
+        if not isinstance(value, datetime):
+            value = datetime(value.year, value.month, value.day)
+        serial = (value.replace(tzinfo=None) - EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c r="{ref}"{style_attr}><v>{serial:.15g}</v></c>'
+    if isinstance(value, (int, float)) or type(value).__module__ == "numpy":
+        return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'
+    text = _ILLEGAL_XML_CHARS.sub("", str(value))
+    space = ' xml:space="preserve"' if text != text.strip() else ""
+    return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t{space}>{escape(text)}</t></is></c>'
+
+
+def rows_xml(rows, first_row, columns, styles=None, row_attrs=""):
+    """
+    把多行数据生成为连续的<row>元素
+    columns为各值写入的列字母，styles为{列字母: 样式编号}
+    """
+    styles = styles or {}
+    parts = []
+    for offset, values in enumerate(rows):
+        row_num = first_row + offset
+        cells = "".join(
+            cell_xml(f"{column}{row_num}", value, styles.get(column))
+            for column, value in zip(columns, values)
+        )
+        parts.append(f'<row r="{row_num}"{row_attrs}>{cells}</row>')
+    return "".join(parts).encode("utf-8")
+
+
+def _raw_member(source, info):
+    """读出成员在源包中的压缩数据（跳过本地文件头，不解压）"""
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(_LOCAL_HEADER.size)
+    fields = _LOCAL_HEADER.unpack(header)
+    if fields[0] != _LOCAL_HEADER_SIGNATURE:
+        raise zipfile.BadZipFile(f"{info.filename} 的本地文件头损坏")
+    source.fp.seek(fields[-2] + fields[-1], 1)
+    return source.fp.read(info.compress_size)
+
+
+def _strip_zip64_extra(extra):
+    """去掉扩展字段中的ZIP64记录，写入本地文件头时按需要重新生成"""
+    kept, index = b"", 0
+    while index + 4 <= len(extra):
+        header_id, size = struct.unpack("<HH", extra[index:index + 4])
+        if header_id != _ZIP64_EXTRA_ID:
+            kept += extra[index:index + 4 + size]
+        index += 4 + size
+    return kept
+
+
+def copy_member(source, target, info):
+    """
+    把源包中的一个成员原样复制到目标包（内容、时间戳、压缩方式不变）
+    直接复制已压缩的数据，不解压也不重新压缩；目标不可定位（如管道）时退回解压后重新写入
+    """
+    if not target.fp.seekable():
+        target.writestr(info, source.read(info.filename), compress_type=info.compress_type)
+        return
+    raw = _raw_member(source, info)
+    member = copy(info)
+    # 压缩数据后不再跟数据描述符，CRC和大小直接写在本地文件头中
+    member.flag_bits &= ~_DATA_DESCRIPTOR_FLAG
+    member.extra = _strip_zip64_extra(info.extra)
+    zip64 = member.file_size > zipfile.ZIP64_LIMIT or member.compress_size > zipfile.ZIP64_LIMIT
+    target.fp.seek(target.start_dir)
+    member.header_offset = target.fp.tell()
+    target.fp.write(member.FileHeader(zip64))
+    target.fp.write(raw)
+    target.start_dir = target.fp.tell()
+    target.filelist.append(member)
+    target.NameToInfo[member.filename] = member
+    target._didModify = True
+
+
+def row_attributes(row_xml):
+    """返回<row>元素中除行号以外的属性（如自定义行高），供新写入的行沿用"""
+    start_tag = row_xml.split(b">", 1)[0]
+    attrs = re.sub(rb'\s+r="\d+"', b"", start_tag[len(b"<row"):]).rstrip(b"/")
+    return attrs.decode("utf-8")
+
+
+def _cell_text(xml):
+    """拼接XML片段中所有<t>的文本"""
+    return _unescape(b"".join(_TEXT_RE.findall(xml)).decode("utf-8"))
+
+
+def read_shared_strings(zf, count=None, block_size=64 * 1024):
+    """
+    读取共享字符串表的前count项（None表示全部），没有共享字符串表时返回[]
+    分块读取，只需表头文字时不必解压整个共享字符串表
+    """
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    values = []
+    buffer = b""
+    with zf.open("xl/sharedStrings.xml") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            buffer += block
+            end = 0
+            for match in _SHARED_STRING_RE.finditer(buffer):
+                values.append(_cell_text(match.group(1)))
+                end = match.end()
+                if count is not None and len(values) >= count:
+                    return values
+            buffer = buffer[end:]
+    return values
+
+
+def row_values(row_xml, shared_strings=()):
+    """返回一行中各单元格的值{列字母: 文本}（用于读取表头）"""
+    values = {}
+    for cell in _CELL_RE.finditer(row_xml):
+        xml = cell.group(0)
+        start_tag = xml.split(b">", 1)[0]
+        value = _VALUE_RE.search(xml)
+        if b't="s"' in start_tag and value:
+            index = int(value.group(1))
+            text = shared_strings[index] if index < len(shared_strings) else ""
+        elif b't="inlineStr"' in start_tag:
+            text = _cell_text(xml)
+        else:
+            text = _unescape(value.group(1).decode("utf-8")) if value else ""
+        values[cell.group(1).decode("ascii")] = text
+    return values
+
+
+def dimension_end(head):
+    """从<dimension>中读出数据区域的最后一列和最后一行，没有时返回(None, None)"""
+    match = _DIMENSION_REF_RE.search(head)
+    if not match:
+        return None, None
+    return match.group(1).decode("ascii"), int(match.group(2))
+
+
+def last_row(xml):
+    """XML片段中最后一个完整<row>的(行号, 行XML)，没有时返回(0, b"")"""
+    start = xml.rfind(b"<row ")
+    while start >= 0:
+        match = _ROW_RE.match(xml, start)
+        if match:
+            return int(match.group(1)), match.group(0)
+        start = xml.rfind(b"<row ", 0, start)
+    return 0, b""
+
+
+def column_letters(count, start=1):
+    """从第start列开始的count个列字母"""
+    return [get_column_letter(start + i) for i in range(count)]
+
+
+def open_package(path_or_bytes):
+    """打开xlsx包（文件路径或字节内容）"""
+    if isinstance(path_or_bytes, bytes):
+        return zipfile.ZipFile(BytesIO(path_or_bytes))
+    return zipfile.ZipFile(path_or_bytes)
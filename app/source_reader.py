@@ -0,0 +1,230 @@
+"""
+何氏订单总表读取
+以只读流式方式逐行读取订单总表，筛选条件在读取过程中生效，
+不在时间窗口内的行不会进入DataFrame
+"""
+
+from datetime import datetime, date
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# 可用于日期筛选的列
+DATE_FIELDS = ('下单日期', '交期')
+
+# 转换过程中实际用到的源列
+SOURCE_COLUMNS = (
+    '下单日期', '制品名称', '部件名称', '生产单号', '交期', '类型', 'Unnamed: 7', '数量',
+    '母型合金', '母型合金板', '母型套中套', '底座', '合金针',
+)
+
+
+def make_row_filter(date_field=None, start_date=None, end_date=None, order_prefixes=None):
+    """构造行筛选条件，未设置任何条件时返回None"""
+    if isinstance(order_prefixes, str):
+        order_prefixes = [order_prefixes]
+    prefixes = tuple(p.strip() for p in (order_prefixes or []) if p and p.strip())
+
+    if date_field is not None and date_field not in DATE_FIELDS:
+        raise ValueError(f"不支持的日期筛选列: {date_field}，可选 {'/'.join(DATE_FIELDS)}")
+    if start_date is None and end_date is None:
+        date_field = None
+    elif date_field is None:
+        date_field = DATE_FIELDS[0]
+
+    if date_field is None and not prefixes:
+        return None
+
+    start, end = _to_date(start_date), _to_date(end_date)
+    for raw, parsed in ((start_date, start), (end_date, end)):
+        if raw not in (None, '') and parsed is None:
+            raise ValueError(f"无法识别的日期: {raw}")
+
+    return {
+        'date_field': date_field,
+        'start_date': start,
+        'end_date': end,
+        'order_prefixes': prefixes,
+    }
+
+
+def describe_row_filter(row_filter):
+    """生成筛选条件的中文描述"""
+    if not row_filter:
+        return "全部数据"
+    parts = []
+    if row_filter['date_field']:
+        start = row_filter['start_date'] or '不限'
+        end = row_filter['end_date'] or '不限'
+        parts.append(f"{row_filter['date_field']} {start} ~ {end}")
+    if row_filter['order_prefixes']:
+        parts.append(f"生产单号前缀 {'/'.join(row_filter['order_prefixes'])}")
+    return "，".join(parts)
+
+
+def row_filter_key(row_filter):
+    """生成筛选条件的稳定字符串表示，用作缓存键"""
+    if not row_filter:
+        return "all"
+    return "|".join([
+        row_filter['date_field'] or '',
+        str(row_filter['start_date'] or ''),
+        str(row_filter['end_date'] or ''),
+        ",".join(row_filter['order_prefixes']),
+    ])
+
+
+def _to_date(value):
+    """将单元格值转换为date，无法识别时返回None"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        ts = pd.Timestamp(str(value).strip())
+    except (ValueError, TypeError):
+        return None
+    if pd.isna(ts):
+        return None
+    return ts.date()
+
+
+def _to_dates(values):
+    """
+    按_to_date的规则把一列单元格值转换为日期（Timestamp，无法识别时为NaT），与流式筛选一致
+    日期类型的列直接取日期部分，其余每个不同的值只转换一次
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.normalize()
+    codes, uniques = pd.factorize(values)
+    # 末尾多放一个NaT，对应空值（factorize的编码为-1）
+    parsed = pd.to_datetime(pd.Series([_to_date(v) for v in uniques] + [None], dtype=object))
+    codes[codes < 0] = len(uniques)
+    return pd.Series(parsed.to_numpy()[codes], index=values.index)
+
+
+def is_blank_row(row):
+    """判断整行是否为空"""
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in row)
+
+
+def header_names(header_row):
+    """按pd.read_excel的规则生成列名（空列名为Unnamed: N，重复列名追加.1/.2）"""
+    names = []
+    seen = {}
+    for idx, value in enumerate(header_row):
+        name = f"Unnamed: {idx}" if value is None or str(value).strip() == '' else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def build_row_predicate(columns, row_filter):
+    """根据列名把筛选条件编译为按行判断的函数"""
+    if not row_filter:
+        return None
+
+    checks = []
+    date_field = row_filter['date_field']
+    if date_field:
+        if date_field not in columns:
+            raise KeyError(f"源文件缺少日期列: {date_field}")
+        date_idx = columns.index(date_field)
+        start = row_filter['start_date']
+        end = row_filter['end_date']
+
+        def check_date(row):
+            value = _to_date(row[date_idx])
+            if value is None:
+                return False
+            if start and value < start:
+                return False
+            if end and value > end:
+                return False
+            return True
+        checks.append(check_date)
+
+    prefixes = row_filter['order_prefixes']
+    if prefixes:
+        if '生产单号' not in columns:
+            raise KeyError("源文件缺少列: 生产单号")
+        order_idx = columns.index('生产单号')
+
+        def check_prefix(row):
+            value = row[order_idx]
+            return value is not None and str(value).strip().startswith(prefixes)
+        checks.append(check_prefix)
+
+    return lambda row: all(check(row) for check in checks)
+
+
+def iter_source_rows(source_file, row_filter=None, sheet_name=None):
+    """流式遍历订单总表，先产出列名列表，再逐行产出通过筛选的数据行"""
+    wb = load_workbook(source_file, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            yield []
+            return
+        columns = header_names(header)
+        width = len(columns)
+        yield columns
+
+        predicate = build_row_predicate(columns, row_filter)
+        for row in rows:
+            # 跳过整行为空的记录
+            if is_blank_row(row):
+                continue
+            row = tuple(row[:width]) + (None,) * (width - len(row))
+            if predicate is None or predicate(row):
+                yield row
+    finally:
+        wb.close()
+
+
+def read_order_total(source_file, row_filter=None, sheet_name=None):
+    """读取订单总表为DataFrame，筛选在读取时完成"""
+    rows = iter_source_rows(source_file, row_filter=row_filter, sheet_name=sheet_name)
+    columns = next(rows)
+    df = pd.DataFrame.from_records(list(rows), columns=columns)
+    return df.infer_objects()
+
+
+def project_columns(df):
+    """只保留转换用到的源列"""
+    return df[[c for c in SOURCE_COLUMNS if c in df.columns]]
+
+
+def apply_row_filter(df, row_filter):
+    """对已读取的DataFrame按列向量化地应用筛选条件（与流式筛选规则一致）"""
+    if not row_filter or df.empty:
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    date_field = row_filter['date_field']
+    if date_field:
+        if date_field not in df.columns:
+            raise KeyError(f"源文件缺少日期列: {date_field}")
+        dates = _to_dates(df[date_field])
+        mask &= dates.notna()
+        if row_filter['start_date']:
+            mask &= dates >= pd.Timestamp(row_filter['start_date'])
+        if row_filter['end_date']:
+            mask &= dates < pd.Timestamp(row_filter['end_date']) + pd.Timedelta(days=1)
+
+    prefixes = row_filter['order_prefixes']
+    if prefixes:
+        if '生产单号' not in df.columns:
+            raise KeyError("源文件缺少列: 生产单号")
+        orders = df['生产单号']
+        mask &= orders.notna() & orders.astype(str).str.strip().str.startswith(prefixes)
+
+    return df[mask].reset_index(drop=True)
@@ -0,0 +1,190 @@
+"""
+隐藏表格下载客户端
+共享连接池的requests.Session，带连接/读取超时、指数退避重试、下载大小上限，
+并在连续失败后熔断，改用上次下载成功的缓存或仓库自带的隐藏表格
+"""
+
+import os
+import tempfile
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 配置GitHub仓库信息
+GITHUB_REPO_INFO = {
+    "username": "xinrenleiZZY",
+    "repo_name": "ymdd_web_cloud",
+    "branch": "master",
+    "hidden_file_path": "mnt/隐藏表格.xlsx"
+}
+
+# 仓库自带的隐藏表格，网络和缓存都不可用时使用
+BUNDLED_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "mnt", "隐藏表格.xlsx")
+TEMPLATE_CACHE = os.path.join(tempfile.gettempdir(), "ymdd_template_cache", "隐藏表格.xlsx")
+
+
+class TemplateFetchError(Exception):
+    """隐藏表格获取失败（含所有回退来源）"""
+
+
+def github_url(repo_info=GITHUB_REPO_INFO):
+    """拼接隐藏表格的下载地址"""
+    return (
+        f"https://raw.githubusercontent.com/"
+        f"{repo_info['username']}/"
+        f"{repo_info['repo_name']}/"
+        f"{repo_info['branch']}/"
+        f"{repo_info['hidden_file_path']}"
+    )
+
+
+class TemplateClient:
+    """隐藏表格下载客户端（线程安全，进程内共享一个实例）"""
+
+    def __init__(self, url=None, connect_timeout=3.05, read_timeout=10, retries=3,
+                 backoff=0.5, max_bytes=5 * 1024 * 1024, failure_threshold=3,
+                 cooldown=60, max_age=300, cache_path=TEMPLATE_CACHE, bundled_path=BUNDLED_TEMPLATE):
+        self.url = url or os.environ.get("YMDD_TEMPLATE_URL") or github_url()
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.max_age = max_age
+        self.cache_path = cache_path
+        self.bundled_path = bundled_path
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._last_good = None
+        self._last_good_at = None
+
+    def circuit_open(self):
+        """熔断是否生效（冷却时间过后放行一次试探请求）"""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                self._opened_at = None
+                self._failures = self.failure_threshold - 1
+                return False
+            return True
+
+    def _record_success(self, content):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._last_good = content
+            self._last_good_at = time.monotonic()
+
+    def _record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+    def _download(self):
+        """流式下载一次，超过大小上限即中止"""
+        with self.session.get(self.url, timeout=self.timeout, stream=True) as response:
+            response.raise_for_status()
+            length = response.headers.get("Content-Length")
+            if length and int(length) > self.max_bytes:
+                raise TemplateFetchError(f"隐藏表格过大: {length} 字节")
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > self.max_bytes:
+                    raise TemplateFetchError(f"隐藏表格超过 {self.max_bytes} 字节上限")
+                chunks.append(chunk)
+            return b"".join(chunks)
+
+    def _fetch_remote(self):
+        """带指数退避的重试下载"""
+        last_error = None
+        for attempt in range(self.retries):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)))
+            try:
+                return self._download()
+            except requests.HTTPError as e:
+                last_error = e
+                # 4xx（限流除外）重试无意义
+                status = e.response.status_code if e.response is not None else 0
+                if 400 <= status < 500 and status != 429:
+                    break
+            except TemplateFetchError as e:
+                # 超过大小上限，重试也不会变小
+                last_error = e
+                break
+            except requests.RequestException as e:
+                last_error = e
+        raise TemplateFetchError(f"下载隐藏表格失败: {last_error}")
+
+    def _write_cache(self, content):
+        """把下载成功的隐藏表格写入本地缓存（原子替换）"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, self.cache_path)
+        except OSError:
+            pass
+
+    def _fallback(self, error):
+        """依次尝试内存缓存、磁盘缓存、仓库自带文件"""
+        with self._lock:
+            last_good = self._last_good
+        if last_good is not None:
+            return last_good, "cache"
+        for path, origin in ((self.cache_path, "cache"), (self.bundled_path, "bundled")):
+            if path and os.path.exists(path):
+                with open(path, "rb") as f:
+                    return f.read(), origin
+        raise TemplateFetchError(f"{error}，且没有可用的本地隐藏表格")
+
+    def fresh_copy(self):
+        """max_age秒内下载过的隐藏表格直接复用，不再访问网络"""
+        with self._lock:
+            if self._last_good_at is None or time.monotonic() - self._last_good_at >= self.max_age:
+                return None
+            return self._last_good
+
+    def fetch(self):
+        """获取隐藏表格内容，返回(字节内容, 来源)，来源为network/memory/cache/bundled"""
+        content = self.fresh_copy()
+        if content is not None:
+            return content, "memory"
+        if self.circuit_open():
+            return self._fallback("GitHub连续请求失败，已暂停访问")
+        try:
+            content = self._fetch_remote()
+        except TemplateFetchError as e:
+            self._record_failure()
+            return self._fallback(e)
+        self._record_success(content)
+        self._write_cache(content)
+        return content, "network"
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_template_client():
+    """获取进程内共享的下载客户端"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TemplateClient()
+        return _client
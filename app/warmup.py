@@ -0,0 +1,103 @@
+"""
+启动预热
+在后台线程中提前导入pandas/openpyxl等重量级模块并预取隐藏表格，
+同时记录首次渲染、首次转换的耗时（YMDD_WARMUP_LOG=1时输出）
+转换在独立子进程中执行（YMDD_ISOLATE，默认）时网页服务进程用不到这些模块，只预取隐藏表格
+"""
+
+import importlib
+import os
+import threading
+import time
+
+# 预热时导入的模块，顺序与转换流程中首次用到的顺序一致
+HEAVY_MODULES = (
+    "pandas",
+    "openpyxl",
+    "source_reader",
+    "sharded_reader",
+    "parse_cache",
+    "progress",
+    "converter",
+    "partition",
+    "sheet_xml",
+    "writers",
+    "catalog",
+    "pipeline",
+    "template_client",
+    "jobs",
+)
+# 是否输出预热和各阶段耗时的日志
+VERBOSE = os.environ.get("YMDD_WARMUP_LOG", "0") == "1"
+
+STARTED_AT = time.perf_counter()
+
+_lock = threading.Lock()
+_thread = None
+_marks = {}
+_verbose = VERBOSE
+
+
+def _warm(modules, prefetch_template):
+    """导入重量级模块并预取隐藏表格"""
+    began = time.perf_counter()
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            _log(f"⚠️ 预热导入 {name} 失败: {e}")
+    if modules:
+        mark("imports_ready")
+
+    if prefetch_template:
+        try:
+            from template_client import get_template_client
+            get_template_client().fetch()
+            mark("template_ready")
+        except Exception as e:
+            _log(f"⚠️ 预取隐藏表格失败: {e}")
+    _log(f"🔥 预热完成，耗时 {time.perf_counter() - began:.2f} 秒")
+
+
+def _log(message):
+    """输出预热日志（exe中关闭，避免干扰用户）"""
+    if _verbose:
+        print(message, flush=True)
+
+
+def server_modules():
+    """网页服务进程要预先导入的模块：转换在独立子进程中执行时不导入"""
+    from isolation import ISOLATE
+    return () if ISOLATE else HEAVY_MODULES
+
+
+def start_warmup(modules=None, prefetch_template=True, verbose=VERBOSE):
+    """启动后台预热（每个进程只执行一次，设置YMDD_WARMUP=0可关闭），modules默认取server_modules()"""
+    global _thread, _verbose
+    if os.environ.get("YMDD_WARMUP", "1") == "0":
+        return None
+    if modules is None:
+        modules = server_modules()
+    with _lock:
+        _verbose = verbose
+        if _thread is None:
+            _thread = threading.Thread(target=_warm, args=(modules, prefetch_template),
+                                       name="ymdd-warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def mark(name):
+    """记录某个阶段首次完成的时间（相对本模块导入时刻），只记录第一次"""
+    with _lock:
+        if name in _marks:
+            return None
+        _marks[name] = time.perf_counter() - STARTED_AT
+    _log(f"⏱️ {name}: {_marks[name]:.2f} 秒")
+    return _marks[name]
+
+
+def timings():
+    """返回已记录的各阶段耗时"""
+    with _lock:
+        return dict(_marks)
@@ -0,0 +1,376 @@
+"""
+监控目录自动转换（无人值守）
+监控收件目录，新的订单总表写入完成（大小和修改时间稳定）后交给进程池转换，
+结果先写入发件目录中的临时目录，完成后整体改名，下游看到的总是完整的结果；
+转换成功的源文件移入已处理目录，失败的连同错误信息移入出错目录
+Linux下用inotify及时发现新文件，其他系统或inotify不可用时定时扫描
+用法: python app/watcher.py 收件目录 [--outbox 发件目录] [--error 出错目录] [--once]
+"""
+
+import argparse
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+from isolation import init_pool_worker
+from partition import part_filename
+
+# 定时扫描的间隔（秒），使用inotify时也按此间隔复查
+POLL_SECONDS = float(os.environ.get("YMDD_WATCH_POLL", 2))
+# 文件大小和修改时间保持不变多少秒后才认为写入完成
+SETTLE_SECONDS = float(os.environ.get("YMDD_WATCH_SETTLE", 3))
+# 同时转换的文件数上限
+WATCH_WORKERS = int(os.environ.get("YMDD_WATCH_WORKERS", min(4, os.cpu_count() or 1)))
+# 监控的文件类型
+SOURCE_EXTENSIONS = (".xlsx", ".xlsm")
+
+
+class InotifyWaiter:
+    """用inotify等待目录中有文件写入完成或移入，Linux以外的系统上不可用"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_NONBLOCK = 0x00000800
+
+    def __init__(self, directory):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch 失败")
+
+    def wait(self, timeout):
+        """等待事件或超时，读空事件队列（具体文件由扫描决定，这里只负责及时唤醒）"""
+        import select
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if readable:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWaiter:
+    """定时扫描（inotify不可用时）"""
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+
+    def close(self):
+        pass
+
+
+def make_waiter(directory):
+    """优先使用inotify，不可用时退回定时扫描"""
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWaiter(directory)
+        except (OSError, AttributeError):
+            pass
+    return PollingWaiter()
+
+
+def is_source_file(name):
+    """是否是需要转换的订单总表（跳过Excel的锁文件和隐藏的临时文件）"""
+    return name.lower().endswith(SOURCE_EXTENSIONS) and not name.startswith(("~$", "."))
+
+
+def unique_path(directory, name):
+    """目录中不重名的路径，重名时在文件名后加时间"""
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        return path
+    stem, ext = os.path.splitext(name)
+    return os.path.join(directory, f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{ext}")
+
+
+def move_file(path, directory):
+    """把文件移入目录，返回新路径"""
+    target = unique_path(directory, os.path.basename(path))
+    shutil.move(path, target)
+    return target
+
+
+def convert_to_outbox(path, outbox, hidden_bytes, output_args):
+    """
+    在工作进程中转换一个文件，结果写入发件目录下以源文件名命名的子目录
+    先写入临时目录，全部写完后改名，返回(结果目录, 订单数, 工件数)
+    """
+    from catalog import MISSES_PREFIX, misses_csv
+    from pipeline import convert_source
+
+    with open(path, "rb") as f:
+        data = f.read()
+    result = convert_source(data, hidden_bytes, workers=1, write_workers=1, **output_args)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    stem = os.path.splitext(os.path.basename(path))[0]
+    final_dir = unique_path(outbox, f"{stem}_{timestamp}")
+    tmp_dir = os.path.join(outbox, f".{os.path.basename(final_dir)}.{os.getpid()}.tmp")
+    os.makedirs(tmp_dir)
+    try:
+        for prefix, key in (('订单录入结果', 'order'), ('工件导入结果', 'workpiece')):
+            parts = result[key]['parts']
+            for index, part in enumerate(parts):
+                filename = part_filename(prefix, timestamp, index, len(parts), result['extension'],
+                                         result['labels'][index])
+                with open(os.path.join(tmp_dir, filename), "wb") as f:
+                    f.write(part)
+        misses = misses_csv(result['catalog_misses'])
+        if misses:
+            with open(os.path.join(tmp_dir, f"{MISSES_PREFIX}_{timestamp}.csv"), "wb") as f:
+                f.write(misses)
+        os.replace(tmp_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return final_dir, result['order']['count'], result['workpiece']['count']
+
+
+class FolderWatcher:
+    """监控收件目录，把写入完成的新文件交给进程池转换，并按结果移动源文件"""
+
+    def __init__(self, inbox, outbox=None, error_dir=None, done_dir=None, workers=WATCH_WORKERS,
+                 output_args=None, poll_seconds=POLL_SECONDS, settle_seconds=SETTLE_SECONDS):
+        self.inbox = os.path.abspath(inbox)
+        self.outbox = os.path.abspath(outbox or os.path.join(self.inbox, "转换结果"))
+        self.error_dir = os.path.abspath(error_dir or os.path.join(self.inbox, "转换失败"))
+        self.done_dir = os.path.abspath(done_dir or os.path.join(self.inbox, "已处理"))
+        for directory in (self.inbox, self.outbox, self.error_dir, self.done_dir):
+            os.makedirs(directory, exist_ok=True)
+        self.workers = max(1, workers)
+        self.output_args = output_args or {}
+        self.poll_seconds = poll_seconds
+        self.settle_seconds = settle_seconds
+        # 等待写入完成的文件: {路径: (大小, 修改时间, 最后变化的时间)}
+        self.pending = {}
+        # 转换中的文件: {future: 路径}
+        self.running = {}
+        # 进程池意外损坏时转换中的文件，重建进程池后逐个重试以找出出问题的文件
+        self.retry = []
+        self.suspects = set()
+        # 转换后未能移走的文件: {路径: (大小, 修改时间)}，文件不变时不再重复转换
+        self.unmovable = {}
+        self.stopping = False
+
+    def scan(self, now):
+        """扫描收件目录，返回已稳定、可以开始转换的文件"""
+        in_flight = set(self.running.values()) | set(self.retry)
+        seen = set()
+        ready = []
+        with os.scandir(self.inbox) as entries:
+            for entry in entries:
+                if not entry.is_file() or not is_source_file(entry.name) or entry.path in in_flight:
+                    continue
+                seen.add(entry.path)
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                size, mtime = stat.st_size, stat.st_mtime
+                if self.unmovable.get(entry.path) == (size, mtime):
+                    continue
+                previous = self.pending.get(entry.path)
+                if previous is None or previous[:2] != (size, mtime):
+                    self.pending[entry.path] = (size, mtime, now)
+                elif size > 0 and now - previous[2] >= self.settle_seconds:
+                    ready.append(entry.path)
+        for path in list(self.pending):
+            if path not in seen:
+                del self.pending[path]
+        return ready
+
+    def hidden_bytes(self):
+        """需要隐藏表格时获取（客户端自带缓存，频繁调用不会重复下载）"""
+        from writers import needs_hidden_template
+        if not needs_hidden_template(self.output_args.get('output_format', 'xlsx'),
+                                     self.output_args.get('writer_name')):
+            return None
+        from template_client import get_template_client
+        return get_template_client().fetch()[0]
+
+    def dispatch(self, pool, paths):
+        """
+        把可以转换的文件提交到进程池，超出进程数的留到下一轮
+        有待重试的可疑文件时先重试，并且每次只转换一个
+        """
+        if self.suspects:
+            paths = self.retry[:1] if not self.running else []
+        else:
+            paths = (self.retry + paths)[:self.workers - len(self.running)]
+        if not paths:
+            return
+        hidden_bytes = self.hidden_bytes()
+        for path in paths:
+            if path in self.retry:
+                self.retry.remove(path)
+            self.pending.pop(path, None)
+            print(f"📥 开始转换: {os.path.basename(path)}", flush=True)
+            future = pool.submit(convert_to_outbox, path, self.outbox, hidden_bytes, self.output_args)
+            self.running[future] = path
+
+    def move_source(self, path, directory):
+        """移动源文件，失败时记录下来（不退出监控，文件不变时也不再重复转换），返回新路径或None"""
+        try:
+            return move_file(path, directory)
+        except OSError as e:
+            try:
+                stat = os.stat(path)
+                self.unmovable[path] = (stat.st_size, stat.st_mtime)
+            except OSError:
+                pass
+            print(f"⚠️ 无法把 {os.path.basename(path)} 移入 {directory}（{e}），请手动处理", flush=True)
+            return None
+
+    def fail(self, path, error, detail):
+        """转换失败：源文件移入出错目录，旁边写明原因"""
+        target = self.move_source(path, self.error_dir)
+        if target:
+            try:
+                with open(f"{target}.错误.txt", "w", encoding="utf-8") as f:
+                    f.write(f"{error}\n\n{detail}")
+            except OSError as e:
+                print(f"⚠️ 无法写入错误说明 {target}.错误.txt（{e}）", flush=True)
+        print(f"❌ 转换失败: {os.path.basename(path)}（{error}），已移入 {self.error_dir}", flush=True)
+
+    def collect(self):
+        """
+        处理已完成的转换：成功的源文件移入已处理目录，失败的移入出错目录并写明原因
+        进程池损坏（工作进程崩溃或被杀）时返回True，由调用方重建进程池
+        """
+        broken = []
+        for future in [f for f in self.running if f.done()]:
+            path = self.running.pop(future)
+            self.suspects.discard(path)
+            try:
+                result_dir, order_count, workpiece_count = future.result()
+            except BrokenProcessPool as e:
+                broken.append(path)
+                crash = e
+            except Exception as e:
+                self.fail(path, e, getattr(e, 'detail', None) or traceback.format_exc())
+            else:
+                self.move_source(path, self.done_dir)
+                print(f"✅ 转换完成: {os.path.basename(path)}，订单 {order_count} 条，工件 {workpiece_count} 条 → "
+                      f"{result_dir}", flush=True)
+        if not broken:
+            return False
+        # 进程池损坏后其余转换中的文件也都无法完成
+        broken += self.running.values()
+        self.running.clear()
+        if len(broken) == 1:
+            # 只有一个文件在转换，就是它导致工作进程退出
+            self.fail(broken[0], "转换进程意外退出（可能内存不足或程序崩溃）",
+                      "".join(traceback.format_exception(crash)))
+        else:
+            # 无法确定是哪个文件，重建进程池后逐个重试
+            self.suspects.update(broken)
+            self.retry.extend(broken)
+            print(f"⚠️ 转换进程意外退出，将逐个重试 {len(broken)} 个文件", flush=True)
+        return True
+
+    def stop(self, *_):
+        """停止接收新文件，等转换中的文件完成后退出"""
+        self.stopping = True
+
+    def new_pool(self):
+        """创建进程池（每个工作进程只转换一个文件）"""
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=init_pool_worker, max_tasks_per_child=1)
+
+    def run(self, once=False):
+        """持续监控；once为真时处理完当前已有的文件后退出"""
+        waiter = make_waiter(self.inbox)
+        mode = "inotify" if isinstance(waiter, InotifyWaiter) else f"每 {self.poll_seconds:g} 秒扫描"
+        print(f"👀 正在监控 {self.inbox}（{mode}），结果写入 {self.outbox}", flush=True)
+        pool = self.new_pool()
+        try:
+            while True:
+                if self.collect():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = self.new_pool()
+                if self.stopping:
+                    if not self.running:
+                        break
+                else:
+                    self.dispatch(pool, self.scan(time.monotonic()))
+                    if once and not self.pending and not self.running and not self.retry:
+                        break
+                busy = self.pending or self.running or self.retry
+                waiter.wait(min(self.poll_seconds, self.settle_seconds) if busy else self.poll_seconds)
+        finally:
+            pool.shutdown(wait=True)
+            waiter.close()
+        print("👋 已停止监控", flush=True)
+
+
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="监控目录，自动转换放入的何氏订单总表")
+    parser.add_argument("inbox", help="收件目录，放入的订单总表会被自动转换")
+    parser.add_argument("--outbox", help="结果目录，默认为收件目录下的“转换结果”")
+    parser.add_argument("--error", dest="error_dir", help="出错文件目录，默认为收件目录下的“转换失败”")
+    parser.add_argument("--done", dest="done_dir", help="已处理源文件目录，默认为收件目录下的“已处理”")
+    parser.add_argument("--workers", type=int, default=WATCH_WORKERS, help="同时转换的文件数")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="扫描间隔（秒）")
+    parser.add_argument("--settle", type=float, default=SETTLE_SECONDS,
+                        help="文件大小和修改时间保持不变多少秒后开始转换")
+    parser.add_argument("--format", dest="output_format", choices=("xlsx", "csv", "parquet"), default="xlsx",
+                        help="结果文件格式")
+    parser.add_argument("--writer", dest="writer_name", choices=("auto", "openpyxl", "xlsxwriter", "template"),
+                        help="xlsx的写入方式，默认取YMDD_WRITER")
+    parser.add_argument("--cell-types", dest="cell_type", choices=("text", "typed"),
+                        help="日期写为文本（text，默认）或Excel日期（typed）")
+    parser.add_argument("--max-rows", type=int, help="每份最多工件行数，超过时按生产单号拆分")
+    parser.add_argument("--partition-by", dest="partition_key", choices=("type", "week", "month", "prefix"),
+                        help="按模具类型、交期周、交期月或生产单号前缀分组，每组一套文件")
+    parser.add_argument("--prefix-length", type=int, help="按生产单号前缀分组时取前几位")
+    parser.add_argument("--consolidate", action="store_true", default=None,
+                        help="合并生产任务号、件号、工件编码都相同的工件行，数量相加")
+    parser.add_argument("--catalog", metavar="PATH", help="产品主数据（xlsx/csv/parquet），补全项目编号和工件编码")
+    parser.add_argument("--split-mode", choices=("files", "sheets"), help="拆分为多个文件或多个工作表")
+    parser.add_argument("--once", action="store_true", help="处理完收件目录中现有的文件后退出")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_args = {
+        'output_format': args.output_format,
+        'writer_name': args.writer_name,
+        'max_rows': args.max_rows,
+        'split_mode': args.split_mode,
+        'cell_type': args.cell_type,
+        'partition_key': args.partition_key,
+        'prefix_length': args.prefix_length,
+        'consolidate': args.consolidate,
+        'catalog': os.path.abspath(args.catalog) if args.catalog else None,
+    }
+    watcher = FolderWatcher(args.inbox, args.outbox, args.error_dir, args.done_dir, args.workers,
+                            output_args, args.poll, args.settle)
+    signal.signal(signal.SIGTERM, watcher.stop)
+    signal.signal(signal.SIGINT, watcher.stop)
+    watcher.run(once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,597 @@
+"""
+结果工作簿的写入后端
+openpyxl后端在内存中构建完整工作簿后保存；xlsxwriter后端以constant_memory模式逐行写出，
+大文件时更快且内存占用小。两者输出相同的列宽、行高和隐藏page工作表，
+默认（YMDD_WRITER=auto）在安装了xlsxwriter时通过一次小规模基准测试选择较快的后端；
+template后端直接在模板目录中现成的导入模板包里填入数据行，其余内容原样保留
+"""
+
+import colorsys
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import zipfile
+from io import BytesIO
+
+from openpyxl.styles.colors import COLOR_INDEX
+from openpyxl.utils import column_index_from_string
+
+from converter import (
+    ORDER_COLUMN_WIDTHS, WORKPIECE_COLUMN_WIDTHS, HEADER_ROW_HEIGHT, DATA_ROW_HEIGHT, DATE_NUMBER_FORMAT,
+    build_workbook,
+)
+from partition import part_sheet_names
+from progress import chunk_bounds
+import sheet_xml
+
+try:
+    import xlsxwriter
+except ImportError:  # 未安装xlsxwriter时只能使用openpyxl后端
+    xlsxwriter = None
+
+# 写入后端：auto / openpyxl / xlsxwriter / template
+WRITER_BACKEND = os.environ.get("YMDD_WRITER", "auto")
+# 基准测试的行数及结果保存位置（各进程共用，避免每次转换都重新测试）
+BENCHMARK_ROWS = 2000
+BENCHMARK_FILE = os.path.join(tempfile.gettempdir(), "ymdd_writer_benchmark.json")
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+# 结果文件格式：xlsx带隐藏page工作表供益模导入；csv、parquet只含数据表，供数据仓库和脚本使用
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet")
+
+# (数据表名, 隐藏表格中的page工作表名, 列宽)
+ORDER_LAYOUT = ('订单录入', 'page', ORDER_COLUMN_WIDTHS)
+WORKPIECE_LAYOUT = ('工件信息', 'page2', WORKPIECE_COLUMN_WIDTHS)
+
+
+def _default_template_dir():
+    """exe打包后在解压目录下，源码运行时在仓库的模板目录"""
+    if hasattr(sys, '_MEIPASS'):
+        return os.path.join(sys._MEIPASS, "模板")
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "模板")
+
+
+# 益模导入模板所在目录及各数据表对应的模板文件（template后端使用）
+TEMPLATE_DIR = os.environ.get("YMDD_TEMPLATE_DIR") or _default_template_dir()
+TEMPLATE_PACKAGES = {
+    ORDER_LAYOUT[0]: '何氏订单录入模板.xlsx',
+    WORKPIECE_LAYOUT[0]: '何氏工件导入模板.xlsx',
+}
+
+
+class WorkbookWriter:
+    """
+    写入后端接口：把数据表和隐藏page工作表写入target（文件路径或BytesIO）
+    df为DataFrame时写入一个数据表；为[DataFrame]时依次写入多个编号的数据表（拆分结果）
+    """
+
+    name = None
+    extension = "xlsx"
+    mime = XLSX_MIME
+    # 是否需要隐藏表格（csv、parquet和template后端不需要，可跳过隐藏表格的下载）
+    needs_template = True
+    # 能否把拆分结果写为同一文件中的多个工作表
+    supports_sheets = True
+
+    def write(self, df, layout, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        raise NotImplementedError
+
+    def write_order(self, df, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        """写入订单录入工作簿"""
+        return self.write(df, ORDER_LAYOUT, hidden_wb, target, chunk_rows, on_chunk)
+
+    def write_workpiece(self, df, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        """写入工件导入工作簿"""
+        return self.write(df, WORKPIECE_LAYOUT, hidden_wb, target, chunk_rows, on_chunk)
+
+
+def _data_sheets(df, sheet_name):
+    """统一为[(工作表名, 数据)]"""
+    if not isinstance(df, list):
+        return [(sheet_name, df)]
+    return list(zip(part_sheet_names(sheet_name, len(df)), df))
+
+
+class OpenpyxlWriter(WorkbookWriter):
+    """openpyxl后端（原有写法）"""
+
+    name = "openpyxl"
+
+    def write(self, df, layout, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        sheet_name, page_sheet_name, column_widths = layout
+        wb = build_workbook(_data_sheets(df, sheet_name), sheet_name, hidden_wb, page_sheet_name,
+                            column_widths, chunk_rows, on_chunk)
+        wb.save(target)
+        return target
+
+
+def _column_width(width):
+    """xlsxwriter保存列宽时会加上单元格边距，预先减去，使保存的列宽与openpyxl后端一致"""
+    return width - 5 / 7 if width > 1 else width
+
+
+# 主题色编号对应的配色方案元素（Excel中0、1号和2、3号与主题文件中的顺序相反）
+THEME_COLOR_ORDER = ('lt1', 'dk1', 'lt2', 'dk2', 'accent1', 'accent2', 'accent3',
+                     'accent4', 'accent5', 'accent6', 'hlink', 'folHlink')
+
+
+def theme_colors(wb):
+    """从工作簿的主题中读出配色方案，返回按主题色编号排列的RRGGBB列表"""
+    theme = getattr(wb, 'loaded_theme', None)
+    if not theme:
+        return []
+    if isinstance(theme, bytes):
+        theme = theme.decode('utf-8', 'ignore')
+    colors = {}
+    for name in THEME_COLOR_ORDER:
+        match = re.search(
+            rf'<a:{name}>\s*<a:(?:srgbClr val="([0-9A-Fa-f]{{6}})"|sysClr[^>]*lastClr="([0-9A-Fa-f]{{6}})")', theme)
+        if match:
+            colors[name] = (match.group(1) or match.group(2)).upper()
+    return [colors.get(name) for name in THEME_COLOR_ORDER]
+
+
+def _apply_tint(rgb, tint):
+    """按Excel的规则对颜色应用明暗调整"""
+    if not tint:
+        return rgb
+    r, g, b = (int(rgb[i:i + 2], 16) / 255 for i in (0, 2, 4))
+    h, l, s = colorsys.rgb_to_hls(r, g, b)
+    l = l * (1 + tint) if tint < 0 else l * (1 - tint) + tint
+    r, g, b = colorsys.hls_to_rgb(h, l, s)
+    return "".join(f"{round(v * 255):02X}" for v in (r, g, b))
+
+
+def _rgb(color, themes=()):
+    """把openpyxl颜色转换为#RRGGBB，无法转换的返回None"""
+    if color is None:
+        return None
+    if color.type == "rgb" and isinstance(color.rgb, str) and len(color.rgb) == 8:
+        if color.rgb == "00000000":
+            return None
+        return "#" + color.rgb[2:]
+    if color.type == "indexed" and isinstance(color.indexed, int) and color.indexed < len(COLOR_INDEX):
+        if color.indexed == 64:  # 系统前景色，即默认颜色
+            return None
+        return "#" + COLOR_INDEX[color.indexed][2:]
+    if color.type == "theme" and isinstance(color.theme, int) and color.theme < len(themes):
+        base = themes[color.theme]
+        if base:
+            return "#" + _apply_tint(base, color.tint)
+    return None
+
+
+# openpyxl边框样式名 → xlsxwriter边框编号
+BORDER_STYLES = {
+    'thin': 1, 'medium': 2, 'dashed': 3, 'dotted': 4, 'thick': 5, 'double': 6, 'hair': 7,
+    'mediumDashed': 8, 'dashDot': 9, 'mediumDashDot': 10, 'dashDotDot': 11,
+    'mediumDashDotDot': 12, 'slantDashDot': 13,
+}
+
+
+def _format_properties(cell, themes=()):
+    """把openpyxl单元格样式转换为xlsxwriter格式属性"""
+    props = {}
+    font = cell.font
+    if font is not None:
+        if font.name:
+            props['font_name'] = font.name
+        if font.sz:
+            props['font_size'] = float(font.sz)
+        if font.b:
+            props['bold'] = True
+        if font.i:
+            props['italic'] = True
+        if font.u:
+            props['underline'] = 1
+        if font.strike:
+            props['font_strikeout'] = True
+        font_color = _rgb(font.color, themes)
+        if font_color:
+            props['font_color'] = font_color
+
+    fill = cell.fill
+    if fill is not None and getattr(fill, 'fill_type', None) == 'solid':
+        fill_color = _rgb(fill.fgColor, themes)
+        if fill_color:
+            props['pattern'] = 1
+            props['bg_color'] = fill_color
+
+    border = cell.border
+    if border is not None:
+        for side_name in ('left', 'right', 'top', 'bottom'):
+            side = getattr(border, side_name)
+            if side is not None and side.style in BORDER_STYLES:
+                props[side_name] = BORDER_STYLES[side.style]
+                side_color = _rgb(side.color, themes)
+                if side_color:
+                    props[f'{side_name}_color'] = side_color
+
+    alignment = cell.alignment
+    if alignment is not None:
+        if alignment.horizontal and alignment.horizontal != 'general':
+            props['align'] = alignment.horizontal
+        if alignment.vertical:
+            props['valign'] = 'vcenter' if alignment.vertical == 'center' else alignment.vertical
+        if alignment.wrap_text:
+            props['text_wrap'] = True
+
+    if cell.number_format and cell.number_format != 'General':
+        props['num_format'] = cell.number_format
+    if cell.protection is not None and cell.protection.locked is False:
+        props['locked'] = False
+    return props
+
+
+class XlsxWriterBackend(WorkbookWriter):
+    """xlsxwriter后端（constant_memory模式，逐行写出，不在内存中保留整张表）"""
+
+    name = "xlsxwriter"
+
+    def write(self, df, layout, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        sheet_name, page_sheet_name, column_widths = layout
+        wb = xlsxwriter.Workbook(target, {'constant_memory': True, 'strings_to_urls': False,
+                                          'default_date_format': DATE_NUMBER_FORMAT})
+        try:
+            for name, frame in _data_sheets(df, sheet_name):
+                self._write_data_sheet(wb.add_worksheet(name), frame, column_widths, chunk_rows, on_chunk)
+
+            self._copy_page_sheet(wb, hidden_wb[page_sheet_name], theme_colors(hidden_wb))
+        finally:
+            wb.close()
+        return target
+
+    def _write_data_sheet(self, ws, df, column_widths, chunk_rows=None, on_chunk=None):
+        """逐行写出数据表，设置列宽和行高"""
+        for col_letter, width in column_widths.items():
+            col = column_index_from_string(col_letter) - 1
+            ws.set_column(col, col, _column_width(width))
+
+        ws.set_row(0, HEADER_ROW_HEIGHT)
+        ws.write_row(0, 0, [str(c) for c in df.columns])
+        row_num = 1
+        for start, end in chunk_bounds(len(df), chunk_rows):
+            for values in df.iloc[start:end].itertuples(index=False, name=None):
+                ws.set_row(row_num, DATA_ROW_HEIGHT)
+                ws.write_row(row_num, 0, values)
+                row_num += 1
+            if on_chunk:
+                on_chunk(end - start)
+
+    def _copy_page_sheet(self, wb, source_sheet, themes=()):
+        """按行顺序把隐藏表格的page工作表（内容、样式、列宽、行高、合并单元格）写入并隐藏"""
+        ws = wb.add_worksheet('page')
+        formats = {}
+
+        def get_format(cell):
+            if not cell.has_style:
+                return None
+            props = _format_properties(cell, themes)
+            key = tuple(sorted(props.items()))
+            if key not in formats:
+                formats[key] = wb.add_format(props) if props else None
+            return formats[key]
+
+        for col_letter, dim in source_sheet.column_dimensions.items():
+            if dim.width:
+                col = column_index_from_string(col_letter) - 1
+                ws.set_column(col, col, _column_width(dim.width))
+
+        merged = {}
+        covered = set()
+        for merged_range in source_sheet.merged_cells.ranges:
+            merged[(merged_range.min_row, merged_range.min_col)] = merged_range
+            for row, col in merged_range.cells:
+                if (row, col) != (merged_range.min_row, merged_range.min_col):
+                    covered.add((row, col))
+
+        for row in source_sheet.iter_rows(min_row=1, max_row=source_sheet.max_row,
+                                          min_col=1, max_col=source_sheet.max_column):
+            if not row:
+                continue
+            row_idx = row[0].row
+            dim = source_sheet.row_dimensions.get(row_idx)
+            if dim is not None and dim.height:
+                ws.set_row(row_idx - 1, dim.height)
+            for cell in row:
+                key = (cell.row, cell.column)
+                if key in covered:
+                    continue
+                fmt = get_format(cell)
+                if key in merged:
+                    r = merged[key]
+                    ws.merge_range(r.min_row - 1, r.min_col - 1, r.max_row - 1, r.max_col - 1,
+                                   cell.value, fmt)
+                elif cell.value is not None:
+                    ws.write(cell.row - 1, cell.column - 1, cell.value, fmt)
+                elif fmt is not None:
+                    ws.write_blank(cell.row - 1, cell.column - 1, None, fmt)
+        ws.hide()
+
+
+def _single_frame(df):
+    """csv、parquet没有工作表，拆分为多个工作表的数据按顺序合并为一张表"""
+    if isinstance(df, list):
+        import pandas as pd
+        return pd.concat(df, ignore_index=True)
+    return df
+
+
+class CsvWriter(WorkbookWriter):
+    """CSV输出（UTF-8带BOM，Excel可直接打开不乱码），按块直接由数据表写出"""
+
+    name = "csv"
+    extension = "csv"
+    mime = "text/csv"
+    needs_template = False
+    supports_sheets = False
+
+    def write(self, df, layout, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        df = _single_frame(df)
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, "wb") as f:
+                self._write_chunks(df, f, chunk_rows, on_chunk)
+        else:
+            self._write_chunks(df, target, chunk_rows, on_chunk)
+        return target
+
+    def _write_chunks(self, df, stream, chunk_rows=None, on_chunk=None):
+        stream.write("\ufeff".encode("utf-8"))
+        stream.write(df.iloc[:0].to_csv(index=False).encode("utf-8"))
+        for start, end in chunk_bounds(len(df), chunk_rows):
+            stream.write(df.iloc[start:end].to_csv(index=False, header=False).encode("utf-8"))
+            if on_chunk:
+                on_chunk(end - start)
+
+
+class ParquetWriter(WorkbookWriter):
+    """Parquet输出，每块数据写为一个行组"""
+
+    name = "parquet"
+    extension = "parquet"
+    mime = "application/vnd.apache.parquet"
+    needs_template = False
+    supports_sheets = False
+
+    def write(self, df, layout, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("未安装pyarrow，无法输出Parquet格式")
+
+        df = _single_frame(df)
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        with pq.ParquetWriter(target, schema) as parquet_writer:
+            for start, end in chunk_bounds(len(df), chunk_rows):
+                parquet_writer.write_table(
+                    pa.Table.from_pandas(df.iloc[start:end], schema=schema, preserve_index=False))
+                if on_chunk:
+                    on_chunk(end - start)
+        return target
+
+
+class TemplatePackage:
+    """
+    解析后的导入模板包：数据表XML拆为表头前后两部分，记录表头各列的列字母、
+    示例数据首行的单元格样式，以及需要改动的workbook.xml和page工作表
+    """
+
+    def __init__(self, path):
+        from openpyxl import load_workbook
+
+        with open(path, "rb") as f:
+            self.data = f.read()
+        with sheet_xml.open_package(self.data) as zf:
+            sheets = list(sheet_xml.sheet_paths(zf).items())
+            self.sheet_name, self.sheet_path = sheets[0]
+            head, rows, self.tail = sheet_xml.split_sheet(zf.read(self.sheet_path))
+            # 保留表头行，丢弃示例数据行，新写入的行沿用第一行示例数据的样式和行属性
+            self.header_row = rows[0][1] if rows else b""
+            sample = rows[1][1] if len(rows) > 1 else b""
+            self.styles = sheet_xml.row_cell_styles(sample)
+            self.row_attrs = sheet_xml.row_attributes(sample) if sample else ""
+            # 写出时数据表设为选中的工作表，其余工作表取消选中并隐藏
+            self.head = _select_sheet(head, True)
+            self.patched = {"xl/workbook.xml": _hide_other_sheets(zf.read("xl/workbook.xml"), self.sheet_name)}
+            for _, other_path in sheets[1:]:
+                self.patched[other_path] = _select_sheet(zf.read(other_path), False)
+
+        wb = load_workbook(BytesIO(self.data), read_only=True)
+        header = next(wb[self.sheet_name].iter_rows(min_row=1, max_row=1), ())
+        self.columns = {
+            str(cell.value).strip(): cell.column_letter
+            for cell in header if cell.value is not None and hasattr(cell, 'column_letter')
+        }
+        self.last_column = header[-1].column_letter if header else "A"
+        wb.close()
+
+    def column_letters(self, df_columns):
+        """数据各列在模板中对应的列字母，模板中没有的列抛出ValueError"""
+        missing = [c for c in df_columns if str(c) not in self.columns]
+        if missing:
+            raise ValueError(f"模板 {self.sheet_name} 中没有以下列: {', '.join(map(str, missing))}")
+        return [self.columns[str(c)] for c in df_columns]
+
+
+def _select_sheet(sheet_xml_bytes, selected):
+    """设置或取消工作表的选中状态（tabSelected）"""
+    sheet_xml_bytes = re.sub(rb'\s+tabSelected="[^"]*"', b"", sheet_xml_bytes, count=1)
+    if selected:
+        sheet_xml_bytes = re.sub(rb"<sheetView\b", b'<sheetView tabSelected="1"', sheet_xml_bytes, count=1)
+    return sheet_xml_bytes
+
+
+def _hide_other_sheets(workbook_xml, data_sheet_name):
+    """隐藏数据表以外的工作表，并把打开时显示的工作表设为第一个"""
+    workbook_xml = re.sub(rb'\s+activeTab="\d+"', b"", workbook_xml, count=1)
+    data_name = f'name="{sheet_xml.escape(data_sheet_name)}"'.encode("utf-8")
+
+    def hide(match):
+        tag = match.group(0)
+        if data_name in tag or b'state="' in tag:
+            return tag
+        return tag.replace(b"<sheet ", b'<sheet state="hidden" ', 1)
+
+    return re.sub(rb"<sheet\b[^>]*>", hide, workbook_xml)
+
+
+_template_packages = {}
+
+
+def load_template_package(sheet_name):
+    """读取并解析数据表对应的导入模板，每个进程只解析一次（模板文件修改后重新解析）"""
+    path = os.path.join(TEMPLATE_DIR, TEMPLATE_PACKAGES[sheet_name])
+    if not os.path.exists(path):
+        raise ValueError(f"找不到导入模板: {path}")
+    mtime = os.path.getmtime(path)
+    cached = _template_packages.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, TemplatePackage(path))
+        _template_packages[path] = cached
+    return cached[1]
+
+
+class TemplatePackageWriter(WorkbookWriter):
+    """
+    模板填充后端：打开现成的益模导入模板包，只把数据行流式写入数据表的XML，
+    样式、数据验证、批注和page工作表等其余成员原样复制，不做任何样式处理
+    """
+
+    name = "template"
+    needs_template = False
+    supports_sheets = False
+
+    def write(self, df, layout, hidden_wb, target, chunk_rows=None, on_chunk=None):
+        package = load_template_package(layout[0])
+        df = _single_frame(df)
+        columns = package.column_letters(df.columns)
+        last_row = len(df) + 1
+        with sheet_xml.open_package(package.data) as source, \
+                zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as out:
+            for info in source.infolist():
+                if info.filename == package.sheet_path:
+                    with out.open(info.filename, "w", force_zip64=True) as f:
+                        self._write_sheet(f, package, df, columns, last_row, chunk_rows, on_chunk)
+                elif info.filename in package.patched:
+                    out.writestr(info, package.patched[info.filename], compress_type=info.compress_type)
+                else:
+                    sheet_xml.copy_member(source, out, info)
+        return target
+
+    def _write_sheet(self, f, package, df, columns, last_row, chunk_rows=None, on_chunk=None):
+        """写出数据表XML：模板表头行之后逐块生成数据行"""
+        f.write(sheet_xml.set_dimension(package.head, f"A1:{package.last_column}{last_row}"))
+        f.write(b"<sheetData>" + package.header_row)
+        for start, end in chunk_bounds(len(df), chunk_rows):
+            rows = df.iloc[start:end].itertuples(index=False, name=None)
+            f.write(sheet_xml.rows_xml(rows, start + 2, columns, package.styles, package.row_attrs))
+            if on_chunk:
+                on_chunk(end - start)
+        f.write(b"</sheetData>" + package.tail)
+
+
+BACKENDS = {
+    OpenpyxlWriter.name: OpenpyxlWriter,
+    XlsxWriterBackend.name: XlsxWriterBackend,
+    TemplatePackageWriter.name: TemplatePackageWriter,
+}
+# 非xlsx格式的写入方式，按格式名称选择
+TABLE_WRITERS = {
+    CsvWriter.name: CsvWriter,
+    ParquetWriter.name: ParquetWriter,
+}
+
+
+def available_backends():
+    """当前环境可用的、输出布局相同可互相替换的写入后端名称（参与自动选择）"""
+    names = [OpenpyxlWriter.name]
+    if xlsxwriter is not None:
+        names.append(XlsxWriterBackend.name)
+    return names
+
+
+def sample_frame(rows):
+    """生成与工件导入数据结构相同的模拟数据，用于基准测试"""
+    import pandas as pd
+
+    return pd.DataFrame({
+        '生产任务号': [f'HS{i:06d}_T0' for i in range(rows)],
+        '件号': [f'制品{i}部件{i % 7}' for i in range(rows)],
+        '工件编码': [f'制品{i}' for i in range(rows)],
+        '工件名称': [f'部件{i % 7}' for i in range(rows)],
+        '数量': [i % 5 + 1 for i in range(rows)],
+        '备注': [''] * rows,
+        '生产单号': [f'HS{i:06d}' for i in range(rows)],
+    })
+
+
+def benchmark(hidden_wb, rows=BENCHMARK_ROWS, backends=None):
+    """用模拟的工件数据测试各后端的写入耗时，返回{后端名称: 秒数}"""
+    df = sample_frame(rows)
+    results = {}
+    for name in backends or available_backends():
+        began = time.perf_counter()
+        BACKENDS[name]().write_workpiece(df, hidden_wb, BytesIO())
+        results[name] = time.perf_counter() - began
+    return results
+
+
+def _versions():
+    """各后端库的版本，版本变化后重新测试"""
+    import openpyxl
+    return {
+        'openpyxl': openpyxl.__version__,
+        'xlsxwriter': getattr(xlsxwriter, '__version__', None),
+    }
+
+
+def choose_backend(hidden_wb):
+    """自动选择较快的后端，基准测试结果保存到BENCHMARK_FILE供其他进程复用"""
+    if xlsxwriter is None:
+        return OpenpyxlWriter.name
+    versions = _versions()
+    try:
+        with open(BENCHMARK_FILE, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get('versions') == versions and saved.get('choice') in BACKENDS:
+            return saved['choice']
+    except (OSError, ValueError):
+        pass
+
+    results = benchmark(hidden_wb)
+    choice = min(results, key=results.get)
+    try:
+        tmp_path = f"{BENCHMARK_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({'versions': versions, 'choice': choice, 'seconds': results}, f)
+        os.replace(tmp_path, BENCHMARK_FILE)
+    except OSError:
+        pass
+    return choice
+
+
+def needs_hidden_template(output_format="xlsx", name=None):
+    """该输出方式是否需要隐藏表格，用于在转换前决定是否下载"""
+    if output_format and output_format != "xlsx":
+        return False
+    return (name or WRITER_BACKEND) != TemplatePackageWriter.name
+
+
+def get_writer(hidden_wb, name=None, output_format="xlsx"):
+    """按输出格式返回写入方式；xlsx按名称（默认取YMDD_WRITER）选择后端，auto时自动选择"""
+    if output_format and output_format != "xlsx":
+        name = output_format
+    if name in TABLE_WRITERS:
+        return TABLE_WRITERS[name]()
+    name = name or WRITER_BACKEND
+    if name == "auto":
+        name = choose_backend(hidden_wb)
+    if name not in BACKENDS:
+        raise ValueError(f"未知的写入后端: {name}，可选: {', '.join(BACKENDS)}")
+    if name == XlsxWriterBackend.name and xlsxwriter is None:
+        raise ValueError("未安装xlsxwriter，无法使用xlsxwriter写入后端")
+    return BACKENDS[name]()
@@ -0,0 +1,60 @@
+"""
+桌面版启动耗时测量（Linux/Windows均可运行）
+多次以 --check 方式启动转换工具，统计显示标题、模块就绪、隐藏表格就绪和进程退出的耗时
+用法:
+    python measure_startup.py                       # 测量源码运行 ymdd_exe_app.py
+    python measure_startup.py dist/益模订单转换工具/益模订单转换工具   # 测量打包后的程序
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STAGES = (("显示标题", "益模订单转换工具"), ("模块就绪", "模块就绪"), ("隐藏表格就绪", "隐藏表格就绪"))
+
+
+def measure_once(command):
+    """启动一次，返回各阶段首次出现在输出中的耗时及总耗时"""
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    began = time.perf_counter()
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            env=env, cwd=HERE)
+    seen = {}
+    for raw in proc.stdout:
+        line = raw.decode("utf-8", errors="replace")
+        for stage, marker in STAGES:
+            if stage not in seen and marker in line:
+                seen[stage] = time.perf_counter() - began
+    proc.wait()
+    seen["进程退出"] = time.perf_counter() - began
+    if proc.returncode != 0:
+        raise RuntimeError(f"启动检查失败，退出码 {proc.returncode}")
+    return seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="桌面版启动耗时测量")
+    parser.add_argument("program", nargs="?", help="打包后的可执行文件，不填则测量源码")
+    parser.add_argument("--runs", type=int, default=5, help="测量次数")
+    args = parser.parse_args()
+
+    if args.program:
+        command = [os.path.abspath(args.program), "--check"]
+    else:
+        command = [sys.executable, os.path.join(HERE, "ymdd_exe_app.py"), "--check"]
+
+    results = [measure_once(command) for _ in range(args.runs)]
+    print(f"命令: {' '.join(command)}  （{args.runs} 次）")
+    print(f"{'阶段':<10}{'中位数(秒)':>12}{'最小(秒)':>12}{'最大(秒)':>12}")
+    for stage in [s for s, _ in STAGES] + ["进程退出"]:
+        values = [r[stage] for r in results if stage in r]
+        if values:
+            print(f"{stage:<10}{statistics.median(values):>12.3f}{min(values):>12.3f}{max(values):>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
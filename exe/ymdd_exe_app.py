@@ -1,14 +1,35 @@
-import pandas as pd
 import os
 import sys
+import time
+import argparse
+import multiprocessing
 from datetime import datetime
 import traceback
-import tkinter as tk
-from tkinter import filedialog
-from openpyxl import load_workbook, Workbook
-from openpyxl.utils.dataframe import dataframe_to_rows
-from copy import copy
-from openpyxl.styles import NamedStyle
+
+# 共用的读取、转换模块位于仓库的app目录（打包时通过spec的pathex收入）
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+# pandas、openpyxl、tkinter在用到时才导入，标题先显示，导入在选择文件时于后台进行
+from warmup import start_warmup
+
+# exe用到的重量级模块（不含requests等网页版才需要的模块）
+EXE_MODULES = ("pandas", "openpyxl", "source_reader", "parse_cache", "progress", "converter", "partition",
+               "sheet_xml", "writers", "appender", "catalog", "pipeline")
+
+
+def resource_path(name):
+    """定位随程序打包的资源文件：打包后在解压目录，源码运行时在仓库mnt目录，最后才找当前目录"""
+    candidates = []
+    if hasattr(sys, '_MEIPASS'):
+        candidates.append(os.path.join(sys._MEIPASS, name))
+    candidates.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'mnt', name))
+    candidates.append(name)
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    return name
 
 
 def print_banner():
@@ -17,13 +38,15 @@ def print_banner():
     print("           益模订单转换工具 v1.0")
     print("        非开发人员专用版本")
     print("=" * 60)
-    print()
+    print(flush=True)
 
 
 def select_source_file():
     """选择何氏订单总表文件"""
     print("📁 请选择何氏订单总表文件（Excel格式）...")
 
+    import tkinter as tk
+    from tkinter import filedialog
     root = tk.Tk()
     root.withdraw()  # 隐藏主窗口
 
@@ -42,205 +65,79 @@ def select_source_file():
     print()
     return file_path
 
-from copy import copy
-from openpyxl.styles import NamedStyle
-
-def copy_sheet(source_wb, source_sheet_name, target_wb, new_sheet_name=None):
-    """复制工作表（包含完整格式）"""
-    source_sheet = source_wb[source_sheet_name]
-    new_name = new_sheet_name or source_sheet_name
-    target_sheet = target_wb.create_sheet(new_name)
-
-    # 复制单元格内容和样式
-    for row in source_sheet.iter_rows(min_row=1, max_row=source_sheet.max_row,
-                                     min_col=1, max_col=source_sheet.max_column):
-        for cell in row:
-            new_cell = target_sheet.cell(row=cell.row, column=cell.column, value=cell.value)
-            if cell.has_style:
-                new_cell.font = copy(cell.font)
-                new_cell.border = copy(cell.border)
-                new_cell.fill = copy(cell.fill)
-                new_cell.number_format = copy(cell.number_format)
-                new_cell.protection = copy(cell.protection)
-                new_cell.alignment = copy(cell.alignment)
-            
-    # 复制列宽
-    from openpyxl.utils import get_column_letter
-    for col_idx in range(1, source_sheet.max_column + 1):
-        col_letter = get_column_letter(col_idx)
-        if col_letter in source_sheet.column_dimensions:
-            target_sheet.column_dimensions[col_letter].width = source_sheet.column_dimensions[col_letter].width
-    
-    # 复制行高
-    for row in range(1, source_sheet.max_row + 1):
-        if row in source_sheet.row_dimensions:
-            target_sheet.row_dimensions[row].height = source_sheet.row_dimensions[row].height
-
-    # 复制合并单元格
-    for merged_range in source_sheet.merged_cells.ranges:
-        target_sheet.merged_cells.add(str(merged_range))
-
-    # 复制工作表属性
-    target_sheet.sheet_format = copy(source_sheet.sheet_format)
-    target_sheet.sheet_properties = copy(source_sheet.sheet_properties)
-    target_sheet.page_margins = copy(source_sheet.page_margins)
-    target_sheet.freeze_panes = source_sheet.freeze_panes
-    target_sheet.page_setup = copy(source_sheet.page_setup)
-    target_sheet.conditional_formatting = copy(source_sheet.conditional_formatting)
-
-    # 修正：正确复制命名样式
-    for style in source_wb.named_styles:
-        target_style_names = []
-        for s in target_wb.named_styles:
-            if hasattr(s, 'name'):
-                target_style_names.append(s.name)
-            elif isinstance(s, str):
-                target_style_names.append(s)
-                # 然后检查当前源样式名称是否已存在于目标工作簿的样式名称列表中
-    for style in source_wb.named_styles:
-        # 同样检查源样式是否为有效对象
-        if hasattr(style, 'name'):
-            style_name = style.name
-        elif isinstance(style, str):
-            style_name = style
-        else:
-            continue  # 跳过无效的样式对象
-            
-        if style_name not in target_style_names:
-            new_style = NamedStyle(name=style_name)
-            if hasattr(style, 'font'):
-                new_style.font = copy(style.font)
-            if hasattr(style, 'border'):
-                new_style.border = copy(style.border)
-            if hasattr(style, 'fill'):
-                new_style.fill = copy(style.fill)
-            if hasattr(style, 'number_format'):
-                new_style.number_format = copy(style.number_format)
-            if hasattr(style, 'protection'):
-                new_style.protection = copy(style.protection)
-            if hasattr(style, 'alignment'):
-                new_style.alignment = copy(style.alignment)
-            target_wb.add_named_style(new_style)
-
-    return target_sheet
-
-def convert_files(source_file):
-    """执行文件转换"""
+
+def console_stage(name, total):
+    """返回一个分块阶段的进度回调，在控制台同一行刷新进度"""
+    from progress import ProgressTracker, console_progress
+    return ProgressTracker(name, total, console_progress).advance
+
+
+def console_report(progress, message, width=30):
+    """在控制台同一行刷新整体转换进度，完成时换行"""
+    filled = int(width * progress)
+    bar = "█" * filled + "░" * (width - filled)
+    end = "\n" if progress >= 1 else ""
+    sys.stdout.write(f"\r   [{bar}] {message:<40}{end}")
+    sys.stdout.flush()
+
+
+def save_misses(misses, save_dir, timestamp):
+    """把查不到的键完整保存为csv，便于一次性补录主数据"""
+    from catalog import MISSES_PREFIX, misses_csv
+
+    data = misses_csv(misses)
+    if data is None:
+        return
+    filename = os.path.join(save_dir, f"{MISSES_PREFIX}_{timestamp}.csv")
+    with open(filename, 'wb') as f:
+        f.write(data)
+    print(f"📋 查不到的键已全部保存到 {os.path.basename(filename)}")
+
+
+def convert_files(source_file, row_filter=None, workers=None, chunk_rows=None, writer_name=None,
+                  max_rows=None, split_mode=None, output_format="xlsx", cell_type=None, partition_key=None,
+                  prefix_length=None, consolidate=None, catalog_path=None):
+    """执行文件转换（与网页版共用pipeline.convert_source），转换完成后选择保存位置写出结果文件"""
+    from source_reader import describe_row_filter
+    from catalog import describe_misses
+    from writers import needs_hidden_template
+    from partition import PARTITION_KEYS, part_filename
+    from pipeline import convert_source
+
     try:
-        print("📖 正在读取何氏订单总表...")
-        df_source = pd.read_excel(source_file)
-        print(f"✅ 源文件读取成功，共 {len(df_source)} 行数据")
-
-        # ==================== 生成订单录入文件 ====================
-        print("\n🔄 正在生成订单录入文件...")
-
-        # 按生产单号去重，只保留第一行数据
-        df_unique = df_source.drop_duplicates(subset=['生产单号'], keep='first')
-        print(f"✅ 按生产单号去重完成，共 {len(df_unique)} 条记录")
-
-        # 创建订单录入数据
-        order_data = []
-        for index, row in df_unique.iterrows():
-            new_row = {
-                '项目名称': str(row['制品名称']),
-                '项目编号': str(row['制品名称']),
-                '项目预估交货期': row['下单日期'].strftime('%Y-%m-%d'),
-                '模具名称': str(row['制品名称']),
-                '模具编号': str(row['生产单号']),
-                '预估交货期': row['交期'].strftime('%Y-%m-%d'),
-                '模具类型': str(row['类型']),
-                '模具阶段': str(row['Unnamed: 7']),
-                '数量': 1
-            }
-            order_data.append(new_row)
-
-        df_order_result = pd.DataFrame(order_data)
-
-        # ==================== 生成工件导入文件 ====================
-        print("🔄 正在生成工件导入文件...")
-
-        # 创建工件导入数据（保留所有行，不去重）
-        workpiece_data = []
-        for index, row in df_source.iterrows():
-            # 添加原始工件记录
-            base_row = {
-                '生产任务号': str(row['生产单号']) + '_T0',
-                '件号': str(row['制品名称']) + str(row['部件名称']),
-                '工件编码': str(row['制品名称']),
-                '工件名称': str(row['部件名称']),
-                '数量': int(row['数量']),
-                '备注': '',
-                '生产单号': str(row['生产单号'])
-            }
-            workpiece_data.append(base_row)
-
-            # 处理母型合金列
-            if pd.notna(row.get('母型合金')) and str(row['母型合金']).strip():
-                workpiece_data.append({
-                    '生产任务号': str(row['生产单号']) + '_T0',
-                    '件号': '母型合金',
-                    '工件编码': '母型合金',
-                    '工件名称': '其他配件',
-                    '数量': int(row['数量']),
-                    '备注': '',
-                    '生产单号': str(row['生产单号'])
-                })
-
-            # 处理母型合金板列
-            if pd.notna(row.get('母型合金板')) and str(row['母型合金板']).strip():
-                workpiece_data.append({
-                    '生产任务号': str(row['生产单号']) + '_T0',
-                    '件号': '母型合金板',
-                    '工件编码': '母型合金板',
-                    '工件名称': '其他配件',
-                    '数量': int(row['数量']),
-                    '备注': '',
-                    '生产单号': str(row['生产单号'])
-                })
-
-            # 处理母型套中套列
-            if pd.notna(row.get('母型套中套')) and str(row['母型套中套']).strip():
-                workpiece_data.append({
-                    '生产任务号': str(row['生产单号']) + '_T0',
-                    '件号': '母型套中套',
-                    '工件编码': '母型套中套',
-                    '工件名称': '其他配件',
-                    '数量': int(row['数量']),
-                    '备注': '',
-                    '生产单号': str(row['生产单号'])
-                })
-
-            # 处理合金针列
-            if pd.notna(row.get('合金针')) and str(row['合金针']).strip():
-                workpiece_data.append({
-                    '生产任务号': str(row['生产单号']) + '_T0',
-                    '件号': '合金针',
-                    '工件编码': '合金针',
-                    '工件名称': '其他配件',
-                    '数量': int(row['数量']),
-                    '备注': '',
-                    '生产单号': str(row['生产单号'])
-                })
-
-            # 处理底座列
-            if pd.notna(row.get('底座')) and str(row['底座']).strip():
-                workpiece_data.append({
-                    '生产任务号': str(row['生产单号']) + '_T0',
-                    '件号': f"{row['部件名称']}底座",
-                    '工件编码': f"{row['部件名称']}底座",
-                    '工件名称': '其他配件',
-                    '数量': int(row['数量']),
-                    '备注': '',
-                    '生产单号': str(row['生产单号'])
-                })
-
-        df_workpiece_result = pd.DataFrame(workpiece_data)
-        print(f"✅ 工件导入数据生成完成，共 {len(df_workpiece_result)} 条记录")
+        with open(source_file, 'rb') as f:
+            data = f.read()
+        # 使用随程序打包的隐藏表格，不访问网络
+        hidden_bytes = None
+        if needs_hidden_template(output_format, writer_name):
+            with open(resource_path('隐藏表格.xlsx'), 'rb') as f:
+                hidden_bytes = f.read()
+
+        result = convert_source(
+            data, hidden_bytes, row_filter, console_report, workers=workers, chunk_rows=chunk_rows,
+            max_rows=max_rows, split_mode=split_mode, output_format=output_format, writer_name=writer_name,
+            cell_type=cell_type, partition_key=partition_key, prefix_length=prefix_length,
+            consolidate=consolidate, catalog=catalog_path,
+        )
+        cache_note = "，使用缓存" if result['from_cache'] else ""
+        print(f"✅ 源文件共 {result['rows']} 行数据（{describe_row_filter(row_filter)}{cache_note}）")
+        print(f"✅ 订单录入 {result['order']['count']} 条，工件导入 {result['workpiece']['count']} 条")
+        if result['catalog_misses'] is not None:
+            summary = describe_misses(result['catalog_misses'])
+            print(f"⚠️ 产品主数据补全：{summary}，已保留原值" if summary else "✅ 编码全部补全")
+        parts = len(result['labels'])
+        if result['split_mode'] == "files":
+            basis = f"按{PARTITION_KEYS[result['partition_key']]}分" if result['partition_key'] else "按生产单号拆分"
+            print(f"✂️ 结果{basis}为 {parts} 组文件")
+        elif result['split_mode'] == "sheets":
+            print(f"✂️ 工件数据按生产单号拆分为 {parts} 个工作表")
 
         # ==================== 选择保存位置 ====================
         print("\n💾 请选择保存结果文件的位置...")
 
         # 选择保存目录
+        import tkinter as tk
+        from tkinter import filedialog
         root = tk.Tk()
         root.withdraw()
         save_dir = filedialog.askdirectory(title="选择保存结果文件的目录")
@@ -254,84 +151,19 @@ def convert_files(source_file):
 
         # ==================== 保存文件 ====================
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
-        # 加载隐藏表格文件
-        hidden_wb = load_workbook('隐藏表格.xlsx', data_only=True)
-
-        # 保存订单录入文件
-        order_filename = os.path.join(save_dir, f'订单录入结果_{timestamp}.xlsx')
-        print(f"\n💾 正在保存订单录入结果到 {os.path.basename(order_filename)}...")
-        
-        # 初始化工作簿并确保没有默认空表
-        order_wb = Workbook()
-        # 删除默认创建的Sheet
-        if 'Sheet' in order_wb.sheetnames:
-            del order_wb['Sheet']
-       
-        # 添加订单录入工作表并写入数据
-        order_ws = order_wb.create_sheet('订单录入')
-        for r in dataframe_to_rows(df_order_result, index=False, header=True):
-            order_ws.append(r)
-         
-        # 复制page工作表
-        copy_sheet(hidden_wb, 'page', order_wb, new_sheet_name='page')
-        # 设置订单录入表的列宽和行高
-        column_widths = {
-            'A': 35, 'B': 35, 'C': 15, 'D': 35, 'E': 12,
-            'F': 15, 'G': 20, 'H': 12, 'I': 8
-        }
-        for col_letter, width in column_widths.items():
-            order_ws.column_dimensions[col_letter].width = width
-        order_ws.row_dimensions[1].height = 25
-        for row_num in range(2, len(df_order_result) + 2):
-            order_ws.row_dimensions[row_num].height = 20
-        
-        # 隐藏page工作表
-        order_wb['page'].sheet_state = 'hidden'
-        
-        # 保存订单文件
-        order_wb.save(order_filename)
-        print(f"✅ 订单录入文件保存完成")
-
-
-        # 保存工件导入文件
-        workpiece_filename = os.path.join(save_dir, f'工件导入结果_{timestamp}.xlsx')
-        print(f"💾 正在保存工件导入结果到 {os.path.basename(workpiece_filename)}...")
-
-        # 初始化工作簿并确保没有默认空表
-        workpiece_wb = Workbook()
-        if 'Sheet' in workpiece_wb.sheetnames:
-            del workpiece_wb['Sheet']
-        
-        # 添加工件信息工作表并写入数据
-        workpiece_ws = workpiece_wb.create_sheet('工件信息')
-        for r in dataframe_to_rows(df_workpiece_result, index=False, header=True):
-            workpiece_ws.append(r)
-        # 复制page工作表
-        copy_sheet(hidden_wb, 'page2', workpiece_wb, new_sheet_name='page')
-        # 设置工件信息表的列宽和行高
-        workpiece_column_widths = {
-            'A': 15, 'B': 50, 'C': 35, 'D': 20, 'E': 8, 'F': 10, 'G': 12
-        }
-        for col_letter, width in workpiece_column_widths.items():
-            workpiece_ws.column_dimensions[col_letter].width = width
-        workpiece_ws.row_dimensions[1].height = 25
-        for row_num in range(2, len(df_workpiece_result) + 2):
-            workpiece_ws.row_dimensions[row_num].height = 20
-        
-        # 隐藏page工作表
-        workpiece_wb['page'].sheet_state = 'hidden'
-        
-        # 保存工件文件
-        workpiece_wb.save(workpiece_filename)
-        print(f"✅ 工件导入文件保存完成")
+        save_misses(result['catalog_misses'], save_dir, timestamp)
+        for prefix, key in (('订单录入结果', 'order'), ('工件导入结果', 'workpiece')):
+            files = result[key]['parts']
+            for index, content in enumerate(files):
+                filename = part_filename(prefix, timestamp, index, len(files), result['extension'],
+                                         result['labels'][index])
+                with open(os.path.join(save_dir, filename), 'wb') as f:
+                    f.write(content)
+                print(f"📊 已保存 {filename}")
 
         # ==================== 输出结果统计 ====================
-        print(f"\n🎉 转换完成！")
-        print(f"📊 订单录入文件：{os.path.basename(order_filename)}，共 {len(df_order_result)} 条记录")
-        print(f"📊 工件导入文件：{os.path.basename(workpiece_filename)}，共 {len(df_workpiece_result)} 条记录")
+        print(f"\n🎉 转换完成！订单共 {result['order']['count']} 条，工件共 {result['workpiece']['count']} 条")
         print(f"📁 文件保存在：{save_dir}")
-
         return True
 
     except Exception as e:
@@ -342,10 +174,156 @@ def convert_files(source_file):
         return False
 
 
+def append_files(source_file, order_path=None, workpiece_path=None, row_filter=None, workers=None,
+                 chunk_rows=None, cell_type=None, consolidate=None, catalog_path=None):
+    """把转换结果追加到已有的订单录入结果、工件导入结果文件末尾（不弹出保存对话框）"""
+    from source_reader import describe_row_filter
+    from parse_cache import load_order_total
+    from converter import build_order_frame, build_workpiece_frame
+    from catalog import describe_misses, enrich_order, enrich_workpiece, resolve_catalog
+    from appender import append_order, append_workpiece
+
+    try:
+        print("📖 正在读取何氏订单总表...")
+        df_source, from_cache = load_order_total(source_file, row_filter, workers=workers)
+        cache_note = "，使用缓存" if from_cache else ""
+        print(f"✅ 源文件读取成功，共 {len(df_source)} 行数据（{describe_row_filter(row_filter)}{cache_note}）")
+        if df_source.empty:
+            print("❌ 筛选范围内没有订单数据，请调整筛选条件")
+            return False
+
+        catalog = resolve_catalog(catalog_path)
+        if order_path:
+            df_order_result = build_order_frame(
+                df_source, chunk_rows, console_stage("去重", df_source['生产单号'].nunique(dropna=False)), cell_type)
+            if catalog is not None:
+                df_order_result, misses = enrich_order(df_order_result, catalog)
+                if misses:
+                    print(f"⚠️ {describe_misses({'projects': misses})}，已保留原值")
+            print(f"\n💾 正在追加 {len(df_order_result)} 条订单到 {os.path.basename(order_path)}...")
+            total = append_order(order_path, df_order_result, chunk_rows,
+                                 console_stage("追加", len(df_order_result)))
+            print(f"✅ 订单录入文件追加完成，现共 {total} 条记录")
+        if workpiece_path:
+            df_workpiece_result = build_workpiece_frame(
+                df_source, chunk_rows, console_stage("生成工件", len(df_source)), consolidate)
+            if catalog is not None:
+                df_workpiece_result, misses = enrich_workpiece(df_workpiece_result, catalog)
+                if misses:
+                    print(f"⚠️ {describe_misses({'parts': misses})}，已保留原值")
+            print(f"\n💾 正在追加 {len(df_workpiece_result)} 条工件到 {os.path.basename(workpiece_path)}...")
+            total = append_workpiece(workpiece_path, df_workpiece_result, chunk_rows,
+                                     console_stage("追加", len(df_workpiece_result)))
+            print(f"✅ 工件导入文件追加完成，现共 {total} 条记录")
+        return True
+
+    except Exception as e:
+        print(f"\n❌ 追加过程中出现错误: {str(e)}")
+        traceback.print_exc()
+        return False
+
+
+def count_files(source_file, row_filter=None, workers=None, consolidate=None):
+    """试运行：只统计订单数、工件数、各配件数和数据问题，不生成结果文件；consolidate时工件数按合并后统计"""
+    from source_reader import describe_row_filter
+    from parse_cache import load_order_total
+    from converter import count_conversion
+
+    try:
+        print("📖 正在读取何氏订单总表...")
+        df_source, from_cache = load_order_total(source_file, row_filter, workers=workers)
+        cache_note = "，使用缓存" if from_cache else ""
+        print(f"✅ 源文件读取成功，共 {len(df_source)} 行数据（{describe_row_filter(row_filter)}{cache_note}）")
+        counts = count_conversion(df_source, consolidate)
+    except Exception as e:
+        print(f"\n❌ 统计过程中出现错误: {str(e)}")
+        traceback.print_exc()
+        return False
+
+    print("\n🔢 试运行统计：")
+    print(f"📊 订单录入：{counts['orders']} 条")
+    accessory_count = sum(counts['accessories'].values())
+    if counts['merged']:
+        print(f"📊 工件导入：{counts['workpieces']} 条（合并前 {counts['workpieces'] + counts['merged']} 条，"
+              f"其中配件 {accessory_count} 条）")
+    else:
+        print(f"📊 工件导入：{counts['workpieces']} 条（其中配件 {accessory_count} 条）")
+    for name, count in counts['accessories'].items():
+        print(f"   {name}：{count}")
+    if counts['errors']:
+        print(f"\n⚠️ 发现 {len(counts['errors'])} 类数据问题，转换前请先修正：")
+        for error in counts['errors']:
+            examples = f"，如 {error['示例生产单号']}" if error['示例生产单号'] else ""
+            print(f"   {error['问题']}：{error['行数']} 行{examples}")
+        return False
+    print("\n✅ 未发现数据问题")
+    return True
+
+
+def parse_args(argv=None):
+    """解析命令行参数（不带参数时保持原有的交互方式）"""
+    parser = argparse.ArgumentParser(description="益模订单转换工具")
+    parser.add_argument("source", nargs="?", help="何氏订单总表文件路径，不填则弹窗选择")
+    parser.add_argument("--date-field", choices=("下单日期", "交期"), help="按哪一列的日期筛选")
+    parser.add_argument("--start", help="起始日期（含），如 2025-08-01")
+    parser.add_argument("--end", help="结束日期（含），如 2025-08-31")
+    parser.add_argument("--prefix", action="append", default=[], help="生产单号前缀，可重复指定")
+    parser.add_argument("--workers", type=int, help="大文件并行解析的进程数，默认等于CPU核数")
+    parser.add_argument("--chunk-rows", type=int, help="转换和写入时每块处理的行数，影响进度刷新频率")
+    parser.add_argument("--format", dest="output_format", choices=("xlsx", "csv", "parquet"), default="xlsx",
+                        help="结果文件格式：xlsx（默认，可导入益模）、csv（UTF-8-BOM）或parquet")
+    parser.add_argument("--writer", choices=("auto", "openpyxl", "xlsxwriter", "template"),
+                        help="结果文件的写入方式，默认auto（自动选择较快的方式）；template直接填入益模导入模板")
+    parser.add_argument("--cell-types", dest="cell_type", choices=("text", "typed"),
+                        help="日期写为“YYYY-MM-DD”文本（text，默认）或Excel日期（typed）")
+    parser.add_argument("--max-rows", type=int,
+                        help="每份最多工件行数，超过时按生产单号拆分（默认只在超过Excel上限时拆分）")
+    parser.add_argument("--partition-by", dest="partition_key", choices=("type", "week", "month", "prefix"),
+                        help="按模具类型、交期周、交期月或生产单号前缀分组，每组一套文件")
+    parser.add_argument("--prefix-length", type=int, help="按生产单号前缀分组时取前几位（默认2）")
+    parser.add_argument("--consolidate", action="store_true", default=None,
+                        help="合并生产任务号、件号、工件编码都相同的工件行，数量相加")
+    parser.add_argument("--catalog", metavar="PATH",
+                        help="产品主数据（xlsx/csv/parquet），按制品名称、部件名称补全项目编号和工件编码，默认取YMDD_CATALOG")
+    parser.add_argument("--split-mode", choices=("files", "sheets"),
+                        help="拆分为多个文件（files，默认）或同一文件中的多个工作表（sheets）")
+    parser.add_argument("--append-order", metavar="PATH",
+                        help="把订单录入数据追加到已有的订单录入结果文件末尾，不生成新文件")
+    parser.add_argument("--append-workpiece", metavar="PATH",
+                        help="把工件导入数据追加到已有的工件导入结果文件末尾，不生成新文件")
+    parser.add_argument("--dry-run", action="store_true", help="只统计订单数、工件数和数据问题，不生成结果文件")
+    parser.add_argument("--check", action="store_true", help="检查运行环境（模块、隐藏表格）后退出，用于测量启动耗时")
+    return parser.parse_args(argv)
+
+
+def check_environment(started):
+    """导入转换所需模块并确认隐藏表格可用，打印各阶段耗时"""
+    print(f"⏱️ 显示标题: {time.perf_counter() - started:.2f} 秒", flush=True)
+    for name in EXE_MODULES:
+        __import__(name)
+    print(f"⏱️ 模块就绪: {time.perf_counter() - started:.2f} 秒", flush=True)
+
+    template = resource_path('隐藏表格.xlsx')
+    if not os.path.exists(template):
+        print(f"❌ 找不到隐藏表格: {template}")
+        return False
+    from openpyxl import load_workbook
+    load_workbook(template, data_only=True).close()
+    print(f"⏱️ 隐藏表格就绪: {time.perf_counter() - started:.2f} 秒", flush=True)
+    return True
+
+
 def main():
     """主函数"""
+    started = time.perf_counter()
     try:
+        args = parse_args()
         print_banner()
+        if args.check:
+            sys.exit(0 if check_environment(started) else 1)
+
+        # 用户选择文件的同时在后台导入pandas、openpyxl
+        start_warmup(EXE_MODULES, prefetch_template=False, verbose=False)
 
         print("📋 程序说明：")
         print("本工具将何氏订单总表的数据转换为两个文件：")
@@ -354,15 +332,46 @@ def main():
         print()
 
         # 选择源文件
-        source_file = select_source_file()
+        source_file = args.source or select_source_file()
         if not source_file:
             return
 
+        from source_reader import make_row_filter, describe_row_filter
+        row_filter = make_row_filter(
+            date_field=args.date_field,
+            start_date=args.start,
+            end_date=args.end,
+            order_prefixes=args.prefix,
+        )
+
+        if row_filter:
+            print(f"🔍 筛选条件：{describe_row_filter(row_filter)}")
+
+        if args.dry_run:
+            count_files(source_file, row_filter, workers=args.workers, consolidate=args.consolidate)
+            print()
+            input("按回车键退出...")
+            return
+
+        if args.append_order or args.append_workpiece:
+            success = append_files(source_file, args.append_order, args.append_workpiece, row_filter,
+                                   workers=args.workers, chunk_rows=args.chunk_rows, cell_type=args.cell_type,
+                                   consolidate=args.consolidate, catalog_path=args.catalog)
+            print("\n✅ 程序执行成功！" if success else "\n❌ 程序执行失败！")
+            print()
+            input("按回车键退出...")
+            return
+
         print("🚀 开始转换...")
         print()
 
         # 执行转换
-        success = convert_files(source_file)
+        success = convert_files(source_file, row_filter, workers=args.workers, chunk_rows=args.chunk_rows,
+                                writer_name=args.writer, max_rows=args.max_rows,
+                                split_mode=args.split_mode, output_format=args.output_format,
+                                cell_type=args.cell_type, partition_key=args.partition_key,
+                                prefix_length=args.prefix_length, consolidate=args.consolidate,
+                                catalog_path=args.catalog)
 
         if success:
             print("\n✅ 程序执行成功！")
@@ -384,4 +393,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # 打包后的exe在Windows上启动解析子进程需要先调用freeze_support
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -3,7 +3,7 @@
 
 a = Analysis(
     ['ymdd_exe_app.py'],
-    pathex=[],
+    pathex=[os.path.join(SPECPATH, '..', 'app')],
     binaries=[],
     datas=[],
     hiddenimports=[],
@@ -0,0 +1,89 @@
+# -*- mode: python ; coding: utf-8 -*-
+# 精简快速启动版构建配置
+# 默认生成onedir目录（启动时无需把整个程序解压到临时目录），
+# 设置环境变量 YMDD_ONEFILE=1 可生成单文件exe
+# 用法: pyinstaller 益模订单转换工具_slim.spec
+
+import os
+
+ONEFILE = os.environ.get('YMDD_ONEFILE') == '1'
+APP_NAME = '益模订单转换工具'
+
+# 转换工具用不到的模块：可视化、科学计算、测试框架、网页版依赖、打包工具等
+EXCLUDES = [
+    'matplotlib', 'scipy', 'IPython', 'jupyter', 'notebook', 'PIL', 'sqlalchemy',
+    'pytest', 'setuptools', 'pip', 'distutils', 'lib2to3', 'pydoc_data',
+    'streamlit', 'requests', 'urllib3', 'dotenv', 'tornado', 'altair', 'pydeck',
+    'pyarrow', 'numexpr', 'bottleneck', 'jinja2', 'lxml', 'xlrd', 'yaml',
+    'numpy.f2py', 'numpy.distutils', 'pandas.tests', 'pandas.io.formats.style',
+    'template_client', 'run_server',
+]
+
+a = Analysis(
+    ['ymdd_exe_app.py'],
+    pathex=[os.path.join(SPECPATH, '..', 'app')],
+    binaries=[],
+    # 隐藏表格作为数据资源打包，程序通过resource_path定位，不再依赖当前目录
+    datas=[
+        (os.path.join(SPECPATH, '..', 'mnt', '隐藏表格.xlsx'), '.'),
+        (os.path.join(SPECPATH, '..', '模板', '何氏订单录入模板.xlsx'), '模板'),
+        (os.path.join(SPECPATH, '..', '模板', '何氏工件导入模板.xlsx'), '模板'),
+    ],
+    hiddenimports=['source_reader', 'sharded_reader', 'parse_cache', 'progress', 'converter', 'partition',
+                   'sheet_xml', 'writers', 'appender', 'catalog', 'settings', 'pipeline', 'warmup'],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=EXCLUDES,
+    noarchive=False,
+    optimize=1,
+)
+pyz = PYZ(a.pure)
+
+if ONEFILE:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        a.binaries,
+        a.datas,
+        [],
+        name=APP_NAME,
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        # UPX压缩会增加每次启动的解压时间
+        upx=False,
+        runtime_tmpdir=None,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+else:
+    exe = EXE(
+        pyz,
+        a.scripts,
+        [],
+        exclude_binaries=True,
+        name=APP_NAME,
+        debug=False,
+        bootloader_ignore_signals=False,
+        strip=False,
+        upx=False,
+        console=True,
+        disable_windowed_traceback=False,
+        argv_emulation=False,
+        target_arch=None,
+        codesign_identity=None,
+        entitlements_file=None,
+    )
+    coll = COLLECT(
+        exe,
+        a.binaries,
+        a.datas,
+        strip=False,
+        upx=False,
+        name=APP_NAME,
+    )
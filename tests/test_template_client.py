@@ -0,0 +1,162 @@
+"""
+隐藏表格下载客户端的测试
+用本机HTTP服务代替GitHub（同tools/template_stub.py），覆盖超时、重试退避、大小上限、熔断和回退顺序
+运行: python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
+sys.path.insert(0, os.path.join(ROOT_DIR, "tools"))
+
+from template_client import TemplateClient, TemplateFetchError  # noqa: E402
+from template_stub import HIDDEN_TEMPLATE, serve_template  # noqa: E402
+
+with open(HIDDEN_TEMPLATE, "rb") as _f:
+    TEMPLATE = _f.read()
+
+
+def serve_responses(responses):
+    """
+    在后台线程中启动服务，按顺序返回预设的响应（用完后重复最后一个），返回(下载地址, 服务对象, 请求记录)
+    每个响应为dict: status状态码、body内容、delay发送前等待秒数、length是否发送Content-Length
+    """
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            response = responses[min(len(requests_seen), len(responses) - 1)]
+            requests_seen.append(time.monotonic())
+            time.sleep(response.get('delay', 0))
+            body = response.get('body', TEMPLATE)
+            self.send_response(response.get('status', 200))
+            if response.get('length', True):
+                self.send_header("Content-Length", str(len(body)))
+            else:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/hidden.xlsx", server, requests_seen
+
+
+class TemplateClientTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "cache", "隐藏表格.xlsx")
+        self.bundled_path = os.path.join(self.tmp.name, "bundled.xlsx")
+        with open(self.bundled_path, "wb") as f:
+            f.write(b"bundled")
+        self.servers = []
+
+    def tearDown(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.tmp.cleanup()
+
+    def serve(self, *responses):
+        url, server, seen = serve_responses(list(responses))
+        self.servers.append(server)
+        return url, seen
+
+    def client(self, url, **kwargs):
+        kwargs.setdefault("retries", 1)
+        kwargs.setdefault("backoff", 0.01)
+        return TemplateClient(url, cache_path=self.cache_path, bundled_path=self.bundled_path, **kwargs)
+
+    def test_network_then_memory(self):
+        url, server = serve_template()
+        self.servers.append(server)
+        client = self.client(url)
+        self.assertEqual(client.fetch(), (TEMPLATE, "network"))
+        self.assertEqual(client.fetch(), (TEMPLATE, "memory"))
+        with open(self.cache_path, "rb") as f:
+            self.assertEqual(f.read(), TEMPLATE)
+
+    def test_read_timeout_falls_back(self):
+        url, seen = self.serve({'delay': 1.0})
+        client = self.client(url, read_timeout=0.2)
+        started = time.monotonic()
+        self.assertEqual(client.fetch(), (b"bundled", "bundled"))
+        self.assertLess(time.monotonic() - started, 0.9)
+        self.assertEqual(len(seen), 1)
+
+    def test_retry_with_backoff(self):
+        url, seen = self.serve({'status': 503, 'body': b""}, {'status': 503, 'body': b""}, {})
+        client = self.client(url, retries=3, backoff=0.1)
+        self.assertEqual(client.fetch(), (TEMPLATE, "network"))
+        self.assertEqual(len(seen), 3)
+        # 两次等待分别为backoff和2倍backoff
+        self.assertGreaterEqual(seen[1] - seen[0], 0.1)
+        self.assertGreaterEqual(seen[2] - seen[1], 0.2)
+
+    def test_client_error_is_not_retried(self):
+        url, seen = self.serve({'status': 404, 'body': b""})
+        client = self.client(url, retries=3)
+        self.assertEqual(client.fetch(), (b"bundled", "bundled"))
+        self.assertEqual(len(seen), 1)
+
+    def test_size_cap(self):
+        too_big = b"x" * (5 * 1024 * 1024 + 1)
+        for length in (True, False):
+            with self.subTest(content_length=length):
+                url, seen = self.serve({'body': too_big, 'length': length})
+                client = self.client(url, retries=3)
+                self.assertEqual(client.fetch(), (b"bundled", "bundled"))
+                # 超过上限不重试
+                self.assertEqual(len(seen), 1)
+
+    def test_circuit_opens_after_failures(self):
+        url, seen = self.serve({'status': 500, 'body': b""})
+        client = self.client(url, failure_threshold=2, cooldown=0.3)
+        client.fetch()
+        self.assertFalse(client.circuit_open())
+        client.fetch()
+        self.assertTrue(client.circuit_open())
+        self.assertEqual(client.fetch(), (b"bundled", "bundled"))
+        self.assertEqual(len(seen), 2)
+        # 冷却时间过后放行一次试探请求，再次失败立即重新熔断
+        time.sleep(0.35)
+        client.fetch()
+        self.assertEqual(len(seen), 3)
+        self.assertTrue(client.circuit_open())
+
+    def test_fallback_order(self):
+        url, _ = self.serve({'status': 500, 'body': b""})
+        client = self.client(url, max_age=0)
+        # 没有缓存时用仓库自带文件
+        self.assertEqual(client.fetch(), (b"bundled", "bundled"))
+        # 磁盘缓存优先于仓库自带文件
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, "wb") as f:
+            f.write(b"disk")
+        self.assertEqual(client.fetch(), (b"disk", "cache"))
+        # 本进程上次下载成功的内容优先于磁盘缓存
+        client._record_success(b"last good")
+        self.assertEqual(client.fetch(), (b"last good", "cache"))
+
+    def test_no_fallback_raises(self):
+        url, _ = self.serve({'status': 500, 'body': b""})
+        client = TemplateClient(url, retries=1, cache_path=None, bundled_path=None)
+        with self.assertRaises(TemplateFetchError):
+            client.fetch()
+
+
+if __name__ == "__main__":
+    unittest.main()
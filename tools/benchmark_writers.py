@@ -0,0 +1,81 @@
+"""
+写入后端测速
+用模拟的工件数据分别测试openpyxl、xlsxwriter和template写入后端的耗时和峰值内存（各自在全新子进程中运行），
+并显示YMDD_WRITER=auto时自动选择的后端（template输出的是导入模板布局，不参与自动选择）
+用法: python tools/benchmark_writers.py [--rows 20000 100000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+APP_DIR = os.path.join(ROOT_DIR, "app")
+HIDDEN_TEMPLATE = os.path.join(ROOT_DIR, "mnt", "隐藏表格.xlsx")
+
+
+def measure_in_process(backend, rows):
+    """在当前（全新）进程中写入一次结果文件，返回耗时、内存增长和文件大小"""
+    import resource
+    import tempfile
+    import time
+
+    sys.path.insert(0, APP_DIR)
+    from openpyxl import load_workbook
+    from writers import get_writer, sample_frame
+
+    hidden_wb = load_workbook(HIDDEN_TEMPLATE, data_only=True)
+    df = sample_frame(rows)
+    writer = get_writer(hidden_wb, backend)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "out.xlsx")
+        began = time.perf_counter()
+        writer.write_workpiece(df, hidden_wb, path)
+        seconds = time.perf_counter() - began
+        size = os.path.getsize(path)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'backend': backend,
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rss_growth_mb': round((peak - baseline) / 1024, 1),
+        'file_kb': size // 1024,
+    }
+
+
+def run_child(backend, rows):
+    """在全新子进程中测一次，避免两个后端的内存占用互相影响"""
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", backend, "--rows", str(rows)],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="写入后端测速")
+    parser.add_argument("--rows", type=int, nargs="+", default=[20000, 100000])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_in_process(args.child, args.rows[0])))
+        return
+
+    sys.path.insert(0, APP_DIR)
+    from openpyxl import load_workbook
+    from writers import TemplatePackageWriter, available_backends, choose_backend
+
+    print(f"{'后端':<12}{'行数':>10}{'耗时(秒)':>12}{'内存增长(MB)':>14}{'文件(KB)':>10}")
+    for rows in args.rows:
+        for backend in available_backends() + [TemplatePackageWriter.name]:
+            r = run_child(backend, rows)
+            print(f"{backend:<12}{rows:>10}{r['seconds']:>12}{r['rss_growth_mb']:>14}{r['file_kb']:>10}")
+    print(f"\nYMDD_WRITER=auto 时选择: {choose_backend(load_workbook(HIDDEN_TEMPLATE, data_only=True))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,394 @@
+"""
+网页版压力测试
+启动一个真实的网页版服务（python app/run_server.py），用脚本模拟N个浏览器会话同时访问：
+每个会话打开页面、上传一份模拟生成的订单总表、点击开始转换，再下载订单文件和工件文件。
+会话通过Streamlit的websocket协议驱动页面，上传、下载走服务的HTTP接口，与浏览器的操作一致；
+隐藏表格由本地服务提供，不访问GitHub。
+结束后报告吞吐量、各阶段耗时的p50/p95/p99，以及服务进程（含转换子进程）的峰值内存
+用法: python tools/load_test.py [--sessions 8] [--concurrency 4] [--rows 2000]
+依赖: websockets（pip install -r tools/requirements.txt）
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timedelta
+from io import BytesIO
+
+from measure_startup import RUN_SERVER, ROOT_DIR, XLSX_MIME, free_port
+
+# 与何氏订单总表相同的表头（第8列为新模/修模，没有列名）
+SOURCE_HEADER = ('下单日期', '客户', '制品名称', '部件名称', '生产单号', '交期', '类型', None, '数量',
+                 '母型合金', '母型合金板', '母型套中套', '底座', '合金针', '系统录入')
+PART_NAMES = ('下型', '上型', '中型', '芯棒')
+CONVERT_LABEL = "开始转换"
+DOWNLOAD_LABELS = ("下载订单文件", "下载工件文件")
+# 各阶段耗时在报告中的顺序和名称
+STAGES = (('page', '打开页面'), ('upload', '上传'), ('convert', '转换'), ('download', '下载'), ('total', '合计'))
+# 采样服务内存的间隔秒数
+RSS_INTERVAL = 0.2
+
+
+def make_source(rows, seed):
+    """生成约rows行的模拟订单总表（xlsx字节内容），seed不同时内容不同，避免命中解析缓存"""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append(SOURCE_HEADER)
+    ordered = datetime(2025, 8, 1) + timedelta(days=seed % 28)
+    written, order_no = 0, 0
+    while written < rows:
+        order_no += 1
+        customer = f"A{rng.randint(1, 80):03d}"
+        product = f"T{rng.randint(100, 999)}"
+        number = f"HS{seed % 100:02d}{order_no:05d}"
+        due = ordered + timedelta(days=rng.randint(3, 30))
+        kind = rng.choice(("新模", "修模"))
+        quantity = rng.randint(1, 10)
+        ws.append((ordered, customer, product, '母型', number, due, '粉末冶金模具', kind, quantity,
+                   1, 1, 1, None, None, '是'))
+        written += 1
+        for part in rng.sample(PART_NAMES, rng.randint(1, len(PART_NAMES))):
+            base, pin = rng.choice(((1, None), (None, 1), (None, None)))
+            ws.append((ordered, customer, product, part, number, due, '粉末冶金模具', kind, quantity,
+                       None, None, None, base, pin, '是'))
+            written += 1
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def process_rss_kb(pid):
+    """进程及其所有子孙进程的常驻内存之和（KB），读取/proc，进程已退出时返回0"""
+    total = 0
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    total += int(line.split()[1])
+                    break
+        for tid in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{tid}/children") as f:
+                total += sum(process_rss_kb(int(child)) for child in f.read().split())
+    except (FileNotFoundError, ProcessLookupError):
+        pass
+    return total
+
+
+class RssSampler(threading.Thread):
+    """后台定时采样服务进程的内存，记录峰值"""
+
+    def __init__(self, pid, interval=RSS_INTERVAL):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_kb = max(self.peak_kb, process_rss_kb(self.pid))
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak_kb
+
+
+def start_server(port, template_url, timeout=120):
+    """启动网页版服务并等待健康检查通过，返回进程对象"""
+    env = dict(os.environ, YMDD_TEMPLATE_URL=template_url)
+    proc = subprocess.Popen(
+        [sys.executable, RUN_SERVER, "--server.headless", "true", "--server.port", str(port),
+         "--server.enableXsrfProtection", "false", "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=ROOT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    began = time.perf_counter()
+    while time.perf_counter() - began < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"服务启动失败，退出码 {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                if r.status == 200:
+                    return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("服务启动超时")
+
+
+def http_request(url, data=None, method="GET", headers=None, timeout=600):
+    """发出一个HTTP请求，返回响应内容"""
+    request = urllib.request.Request(url, data=data, method=method, headers=headers or {})
+    with urllib.request.urlopen(request, timeout=timeout) as r:
+        return r.read()
+
+
+def multipart_body(name, data, mime):
+    """按浏览器上传文件的格式生成multipart请求体，返回(请求体, Content-Type)"""
+    boundary = uuid.uuid4().hex
+    head = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+            f'Content-Type: {mime}\r\n\r\n').encode("utf-8")
+    return head + data + f"\r\n--{boundary}--\r\n".encode("ascii"), f"multipart/form-data; boundary={boundary}"
+
+
+class BrowserSession:
+    """一个模拟的浏览器会话：通过websocket收发页面消息，通过HTTP上传和下载文件"""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.ws = None
+        self.session_id = None
+        self.elements = []
+        # 页面登记的定时重新运行的片段: {片段编号: 间隔秒数}
+        self.auto_reruns = {}
+        self._request_id = 0
+
+    async def connect(self):
+        from websockets.asyncio.client import connect
+
+        ws_url = self.base_url.replace("http://", "ws://") + "/_stcore/stream"
+        self.ws = await connect(ws_url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def _send(self, **fields):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+
+        await self.ws.send(BackMsg(**fields).SerializeToString())
+
+    async def _receive(self):
+        """接收并解析下一条消息；页面报错时抛出RuntimeError"""
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = ForwardMsg()
+        msg.ParseFromString(await asyncio.wait_for(self.ws.recv(), self.timeout))
+        kind = msg.WhichOneof("type")
+        if kind == "new_session":
+            self.session_id = msg.new_session.initialize.session_id
+            self.elements = []
+            # 完整运行页面时片段的定时运行由本次运行重新登记（只运行片段时保留）
+            if not msg.new_session.fragment_ids_this_run:
+                self.auto_reruns = {}
+        elif kind == "auto_rerun":
+            self.auto_reruns[msg.auto_rerun.fragment_id] = msg.auto_rerun.interval
+        elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+            element = msg.delta.new_element
+            element_type = element.WhichOneof("type")
+            if element_type == "exception":
+                raise RuntimeError(f"页面出错: {element.exception.type}: {element.exception.message}")
+            if element_type == "alert" and element.alert.format == element.alert.ERROR:
+                raise RuntimeError(f"页面提示错误: {element.alert.body}")
+            self.elements.append(element)
+        return msg
+
+    async def rerun(self, widget_states=(), fragment_id=None):
+        """
+        带上控件取值重新运行页面（指定fragment_id时只运行该片段，同浏览器的定时运行），
+        等待运行结束（片段中触发的整页重新运行也一并等待），返回显示的元素
+        """
+        from streamlit.proto.ClientState_pb2 import ClientState
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from streamlit.proto.WidgetStates_pb2 import WidgetStates
+
+        state = ClientState(widget_states=WidgetStates(widgets=list(widget_states)),
+                            fragment_id=fragment_id or "", is_auto_rerun=fragment_id is not None)
+        await self._send(rerun_script=state)
+        while True:
+            msg = await self._receive()
+            if msg.WhichOneof("type") != "script_finished":
+                continue
+            if msg.script_finished in (ForwardMsg.FINISHED_SUCCESSFULLY, ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY):
+                return self.elements
+            if msg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                raise RuntimeError(f"页面运行失败（{ForwardMsg.ScriptFinishedStatus.Name(msg.script_finished)}）")
+
+    async def wait_for(self, element_type, labels, widget_states=()):
+        """
+        等待页面显示所有指定标签的控件：后台任务进行中时进度由片段定时刷新，
+        像浏览器一样按登记的间隔重新运行这些片段，直到任务结束、页面显示结果
+        """
+        while True:
+            try:
+                return [self.find(element_type, label) for label in labels]
+            except RuntimeError:
+                if not self.auto_reruns:
+                    raise
+            fragment_id, interval = next(iter(self.auto_reruns.items()))
+            await asyncio.sleep(interval)
+            await self.rerun(widget_states, fragment_id)
+
+    def find(self, element_type, label):
+        """按类型和标签（包含即可）查找本次显示的控件"""
+        for element in self.elements:
+            if element.WhichOneof("type") == element_type and label in getattr(element, element_type).label:
+                return getattr(element, element_type)
+        raise RuntimeError(f"页面中没有找到 {label}")
+
+    def _next_request_id(self):
+        self._request_id += 1
+        return str(self._request_id)
+
+    async def upload(self, uploader_id, name, data):
+        """像浏览器一样先申请上传地址再上传文件，返回上传控件的取值"""
+        from streamlit.proto.Common_pb2 import FileUploaderState, FileURLsRequest, UploadedFileInfo
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        request_id = self._next_request_id()
+        await self._send(file_urls_request=FileURLsRequest(
+            request_id=request_id, file_names=[name], session_id=self.session_id))
+        while True:
+            msg = await self._receive()
+            if msg.WhichOneof("type") == "file_urls_response" and msg.file_urls_response.response_id == request_id:
+                break
+        if msg.file_urls_response.error_msg:
+            raise RuntimeError(f"申请上传地址失败: {msg.file_urls_response.error_msg}")
+        urls = msg.file_urls_response.file_urls[0]
+        body, content_type = multipart_body(name, data, XLSX_MIME)
+        await asyncio.to_thread(http_request, self.base_url + urls.upload_url, body, "PUT",
+                                {"Content-Type": content_type}, self.timeout)
+        info = UploadedFileInfo(name=name, size=len(data), file_id=urls.file_id, file_urls=urls)
+        return WidgetState(id=uploader_id, file_uploader_state_value=FileUploaderState(uploaded_file_info=[info]))
+
+    async def download(self, button):
+        """点击下载按钮：点击时才生成的下载先请求服务生成下载地址，返回下载的字节数"""
+        from streamlit.proto.BackMsg_pb2 import BackendOperationRequest, DeferredFileRequestPayload
+
+        url = button.url
+        if button.deferred_file_id:
+            request_id = self._next_request_id()
+            await self._send(backend_operation_request=BackendOperationRequest(
+                request_id=request_id, session_id=self.session_id,
+                deferred_file=DeferredFileRequestPayload(file_id=button.deferred_file_id)))
+            while True:
+                msg = await self._receive()
+                response = msg.backend_operation_response
+                if msg.WhichOneof("type") == "backend_operation_response" and response.request_id == request_id:
+                    break
+            if response.error_msg:
+                raise RuntimeError(f"生成下载文件失败: {response.error_msg}")
+            url = response.deferred_file.url
+        data = await asyncio.to_thread(http_request, self.base_url + url, None, "GET", None, self.timeout)
+        return len(data)
+
+
+async def run_session(base_url, name, source, timeout):
+    """模拟一个用户完成一次转换，返回各阶段耗时{阶段: 秒数}"""
+    from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+    session = BrowserSession(base_url, timeout)
+    timings = {}
+    began = time.perf_counter()
+    try:
+        await session.connect()
+        await session.rerun()
+        timings['page'] = time.perf_counter() - began
+
+        stage = time.perf_counter()
+        uploaded = await session.upload(session.find("file_uploader", "").id, name, source)
+        await session.rerun([uploaded])
+        timings['upload'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        click = WidgetState(id=session.find("button", CONVERT_LABEL).id, trigger_value=True)
+        await session.rerun([uploaded, click])
+        buttons = await session.wait_for("download_button", DOWNLOAD_LABELS, [uploaded])
+        timings['convert'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        for button in buttons:
+            if not await session.download(button):
+                raise RuntimeError(f"{button.label} 下载的内容为空")
+        timings['download'] = time.perf_counter() - stage
+    finally:
+        await session.close()
+    timings['total'] = time.perf_counter() - began
+    return timings
+
+
+async def run_load(base_url, sources, concurrency, timeout):
+    """最多concurrency个会话同时进行，返回(各会话的耗时, 各会话的错误)"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index, source):
+        async with semaphore:
+            try:
+                return await run_session(base_url, f"订单总表_{index}.xlsx", source, timeout), None
+            except Exception as e:
+                return None, f"会话 {index}: {type(e).__name__}: {e}"
+
+    results = await asyncio.gather(*(one(i, source) for i, source in enumerate(sources, 1)))
+    return [r for r, _ in results if r], [e for _, e in results if e]
+
+
+def percentile(values, q):
+    """最近秩法的百分位数"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def report(timings, errors, wall_seconds, peak_kb, sessions):
+    """打印吞吐量、各阶段耗时分位数和峰值内存"""
+    print(f"\n完成 {len(timings)}/{sessions} 个会话，总耗时 {wall_seconds:.1f} 秒，"
+          f"吞吐量 {len(timings) / wall_seconds * 60:.1f} 次转换/分钟")
+    for error in errors:
+        print(f"❌ {error}")
+    if timings:
+        print(f"{'阶段':<8}{'p50(秒)':>10}{'p95(秒)':>10}{'p99(秒)':>10}{'最大(秒)':>10}")
+        for key, label in STAGES:
+            values = [t[key] for t in timings]
+            print(f"{label:<8}" + "".join(f"{percentile(values, q):>10.2f}" for q in (50, 95, 99))
+                  + f"{max(values):>10.2f}")
+    print(f"服务峰值内存（含转换子进程）: {peak_kb / 1024:.0f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网页版压力测试")
+    parser.add_argument("--sessions", type=int, default=8, help="模拟的会话总数")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时进行的会话数")
+    parser.add_argument("--rows", type=int, default=2000, help="每份模拟订单总表的行数")
+    parser.add_argument("--timeout", type=float, default=600, help="每一步等待服务响应的最长秒数")
+    args = parser.parse_args()
+
+    from template_stub import serve_template
+
+    print(f"📄 生成 {args.sessions} 份模拟订单总表（每份约 {args.rows} 行）...", flush=True)
+    sources = [make_source(args.rows, seed) for seed in range(1, args.sessions + 1)]
+
+    template_url, template_server = serve_template()
+    port = free_port()
+    print("🚀 启动网页版服务...", flush=True)
+    server = start_server(port, template_url)
+    sampler = RssSampler(server.pid)
+    sampler.start()
+    try:
+        print(f"👥 {args.sessions} 个会话，最多 {args.concurrency} 个同时进行...", flush=True)
+        began = time.perf_counter()
+        timings, errors = asyncio.run(run_load(f"http://127.0.0.1:{port}", sources,
+                                               max(1, args.concurrency), args.timeout))
+        wall_seconds = time.perf_counter() - began
+    finally:
+        peak_kb = sampler.stop()
+        server.terminate()
+        server.wait(timeout=30)
+        template_server.shutdown()
+    report(timings, errors, wall_seconds, peak_kb, args.sessions)
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+网页版冷启动测速
+分别在开启/关闭预热的全新进程中测量：
+1. 首次渲染耗时（首次执行app/main.py直到页面渲染完成）
+2. 首次转换耗时（页面渲染后等待think秒，再上传示例订单总表并点击开始转换）
+3. 服务启动到健康检查通过的耗时（python app/run_server.py）
+隐藏表格由本地服务提供，不访问GitHub
+用法: python tools/measure_startup.py [--think 2] [--source mnt/何氏订单总表.xlsx]
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+MAIN_SCRIPT = os.path.join(ROOT_DIR, "app", "main.py")
+RUN_SERVER = os.path.join(ROOT_DIR, "app", "run_server.py")
+DEFAULT_SOURCE = os.path.join(ROOT_DIR, "mnt", "何氏订单总表.xlsx")
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def measure_in_process(source, think):
+    """在当前（全新）进程中用AppTest驱动页面，返回各阶段耗时"""
+    started = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(MAIN_SCRIPT, default_timeout=600)
+    at.run()
+    first_paint = time.perf_counter() - started
+
+    time.sleep(think)
+    with open(source, "rb") as f:
+        at.file_uploader[0].set_value((os.path.basename(source), f.read(), XLSX_MIME))
+    began = time.perf_counter()
+    at.button[0].click().run()
+    conversion = time.perf_counter() - began
+    ok = "conversion_results" in at.session_state
+    return {"first_paint": first_paint, "first_conversion": conversion, "ok": ok}
+
+
+def run_child(source, think, warm):
+    """在子进程中测量，保证每次都是冷启动"""
+    env = dict(os.environ, YMDD_WARMUP="1" if warm else "0", YMDD_CACHE_MAX_BYTES="0")
+    output = subprocess.run(
+        [sys.executable, __file__, "--child", "--source", source, "--think", str(think)],
+        env=env, cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    # 预热线程的日志可能与结果交错，只取JSON行
+    line = next(l for l in reversed(output.splitlines()) if l.startswith("{"))
+    return json.loads(line)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_server_boot(timeout=60):
+    """启动带预热的服务，测量到健康检查通过的耗时"""
+    port = free_port()
+    began = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, RUN_SERVER, "--server.headless", "true", "--server.port", str(port)],
+        cwd=ROOT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - began < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - began
+            except OSError:
+                time.sleep(0.1)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网页版冷启动测速")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="用于首次转换的订单总表")
+    parser.add_argument("--think", type=float, default=2.0, help="首次渲染后到点击转换之间的等待秒数")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_in_process(args.source, args.think)))
+        return
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from template_stub import serve_template
+    url, server = serve_template()
+    os.environ["YMDD_TEMPLATE_URL"] = url
+
+    print(f"{'模式':<8}{'首次渲染(秒)':>14}{'首次转换(秒)':>14}{'结果':>6}")
+    for warm in (False, True):
+        result = run_child(args.source, args.think, warm)
+        label = "预热" if warm else "无预热"
+        status = "成功" if result["ok"] else "失败"
+        print(f"{label:<8}{result['first_paint']:>14.2f}{result['first_conversion']:>14.2f}{status:>6}")
+
+    boot = measure_server_boot()
+    print(f"服务启动到健康检查通过: {boot:.2f} 秒" if boot else "服务启动超时")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
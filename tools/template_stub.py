@@ -0,0 +1,32 @@
+"""
+本地隐藏表格服务
+在本机起一个HTTP服务代替GitHub，供测速、压测脚本通过YMDD_TEMPLATE_URL使用
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HIDDEN_TEMPLATE = os.path.join(ROOT_DIR, "mnt", "隐藏表格.xlsx")
+
+
+def serve_template(path=HIDDEN_TEMPLATE, host="127.0.0.1", port=0):
+    """在后台线程中启动服务，返回(下载地址, 服务对象)"""
+    with open(path, "rb") as f:
+        content = f.read()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://{host}:{server.server_port}/hidden.xlsx", server